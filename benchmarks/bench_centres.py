@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""
+Compares per-city calc_centre loop with vectorized calc_centres.
+Run from project root: python -m benchmarks.bench_centres --rows 1000000 --countries 500
+"""
+
+from time import perf_counter
+
+import click
+import numpy as np
+
+from benchmarks.synthetic import make_hotels_df
+from src.api_utils.geodata_api import calc_centre, calc_centres
+
+
+@click.command()
+@click.option("--rows", default=1_000_000, help="Rows to generate.")
+@click.option("--countries", default=500, help="Number of distinct countries.")
+@click.option("--cities", default=1, help="Number of cities in every country.")
+def main(rows, countries, cities):
+    df = make_hotels_df(rows, countries, cities)
+
+    start = perf_counter()
+    loop_centres = [calc_centre(df[df["City"] == city]) for city in df["City"].unique()]
+    loop_time = perf_counter() - start
+    print(f"calc_centre loop:      {loop_time:8.3f}s")
+
+    for method in ["planar", "spherical"]:
+        start = perf_counter()
+        centres = calc_centres(df[["City", "Latitude", "Longitude"]], method)
+        method_time = perf_counter() - start
+        print(f"calc_centres {method:>9}: {method_time:8.3f}s speedup={loop_time / method_time:6.1f}x")
+
+        if method == "planar":
+            assert np.array_equal(centres[["Latitude", "Longitude"]].values, np.array(loop_centres))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Compares throughput (rows/s) of the single-mask df_cleaner with the former
+copy/coerce/dropna/drop implementation on dirty csv-like input (object
+coordinates) and on input with numeric coordinates.
+Run from project root: python -m benchmarks.bench_cleaner --rows 1000000 --rows 5000000
+"""
+
+from time import perf_counter
+
+import click
+import pandas as pd
+
+from benchmarks.synthetic import make_dirty_hotels_df
+from src.processing.pre_process import COMPACT_DTYPES, df_cleaner
+
+
+def df_cleaner_legacy(df: pd.DataFrame, coordinates_dtype: str = "float64") -> pd.DataFrame:
+    """
+    Former implementation of df_cleaner, kept as a baseline
+    """
+
+    new_df = df.copy()
+
+    new_df.Latitude = pd.to_numeric(new_df.Latitude, errors="coerce")
+    new_df.Longitude = pd.to_numeric(new_df.Longitude, errors="coerce")
+    new_df.dropna(inplace=True)
+
+    new_df.drop(new_df[(new_df.Latitude > 90.0) | (new_df.Latitude < -90.0)].index, inplace=True)
+    new_df.drop(new_df[(new_df.Longitude > 180.0) | (new_df.Longitude < -180.0)].index, inplace=True)
+
+    if coordinates_dtype != "float64":
+        new_df = new_df.astype({"Latitude": coordinates_dtype, "Longitude": coordinates_dtype})
+
+    return new_df
+
+
+def best_time(func, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = perf_counter()
+        func()
+        times.append(perf_counter() - start)
+
+    return min(times)
+
+
+@click.command()
+@click.option("--rows", "rows_list", multiple=True, type=int, default=[1_000_000, 5_000_000], help="Rows to generate.")
+@click.option("--dirty_ratio", default=0.05, help="Share of invalid rows.")
+@click.option("--repeat", default=3, help="Number of runs. The best time is kept.")
+def main(rows_list, dirty_ratio, repeat):
+    for rows in rows_list:
+        df_dirty = make_dirty_hotels_df(rows, dirty_ratio=dirty_ratio).drop(columns="Id").astype(COMPACT_DTYPES)
+        # As read_csv parses files without non-numeric coordinates
+        df_numeric = df_cleaner_legacy(df_dirty).reset_index(drop=True)
+        inputs = {"object coordinates": df_dirty, "numeric coordinates": df_numeric}
+
+        for input_name, df in inputs.items():
+            pd.testing.assert_frame_equal(df_cleaner(df), df_cleaner_legacy(df))
+            legacy_time = best_time(lambda: df_cleaner_legacy(df), repeat)
+            single_mask_time = best_time(lambda: df_cleaner(df), repeat)
+            quarantine_time = best_time(lambda: df_cleaner(df, quarantine=[]), repeat)
+            print(
+                f"rows={rows:>9} {input_name:>19}: legacy={rows / legacy_time:>12,.0f} rows/s "
+                f"single mask={rows / single_mask_time:>12,.0f} rows/s "
+                f"with quarantine={rows / quarantine_time:>12,.0f} rows/s "
+                f"speedup={legacy_time / single_mask_time:5.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""
+Compares memory usage and per-city filtering time of hotels DataFrame
+with object/float64 columns and with compact schema.
+Run from project root: python -m benchmarks.bench_compact_dtypes --rows 1000000
+"""
+
+from time import perf_counter
+
+import click
+
+from benchmarks.synthetic import make_hotels_df
+from src.processing.pre_process import COMPACT_DTYPES
+
+
+@click.command()
+@click.option("--rows", default=1_000_000, help="Rows to generate.")
+@click.option("--countries", default=200, help="Number of distinct countries.")
+@click.option("--cities", default=10, help="Number of cities in every country.")
+def main(rows, countries, cities):
+    df_plain = make_hotels_df(rows, countries, cities)
+    schemas = {
+        "object/float64": df_plain,
+        "category/float64": df_plain.astype(COMPACT_DTYPES),
+        "category/float32": df_plain.astype({**COMPACT_DTYPES, "Latitude": "float32", "Longitude": "float32"}),
+    }
+    probe_cities = df_plain["City"].unique()[:50]
+
+    for schema, df in schemas.items():
+        memory_mb = df.memory_usage(deep=True).sum() / 2**20
+
+        start = perf_counter()
+        for city in probe_cities:
+            df[df["City"] == city]
+        filter_time = (perf_counter() - start) / len(probe_cities)
+
+        print(f"{schema:>17}: memory={memory_mb:9.2f} MB city filter={filter_time * 1000:8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+Compares reading of hotels archive by pandas and pyarrow csv engines:
+whole files and chunks of streaming mode, clean and dirty (with non-numeric
+coordinates) archives. Reading includes df_cleaner, as its cost depends on
+dtypes the reader gives.
+Run from project root: python -m benchmarks.bench_csv_engine --rows 1000000 --files 5
+"""
+
+import tempfile
+from pathlib import Path
+from time import perf_counter
+from typing import Optional
+
+import click
+
+from benchmarks.synthetic import make_hotels_archive
+from src.processing import CSV_ENGINES
+from src.processing.pre_process import df_cleaner, df_generator
+
+
+def read_archive(path: Path, engine: str, chunksize: Optional[int]) -> float:
+    """
+    :return: Time of reading and cleaning all rows of archive, seconds
+    """
+
+    start = perf_counter()
+    for df in df_generator(str(path), chunksize, engine=engine):
+        df_cleaner(df)
+
+    return perf_counter() - start
+
+
+@click.command()
+@click.option("--rows", default=1_000_000, help="Rows of synthetic archive.")
+@click.option("--files", default=5, help="Number of csv files in archive.")
+@click.option("--chunksize", default=100_000, help="Rows count of chunks of streaming mode.")
+@click.option("--repeat", default=3, help="Number of runs. The best time is kept.")
+def main(rows, files, chunksize, repeat):
+    with tempfile.TemporaryDirectory() as work_dir:
+        archives = {
+            "clean": make_hotels_archive(Path(work_dir) / "clean.zip", rows, dirty_ratio=0.0, files=files),
+            "dirty": make_hotels_archive(Path(work_dir) / "dirty.zip", rows, dirty_ratio=0.05, files=files),
+        }
+
+        for archive_name, path in archives.items():
+            for chunks in [None, chunksize]:
+                times = {
+                    engine: min(read_archive(path, engine, chunks) for _ in range(repeat)) for engine in CSV_ENGINES
+                }
+                rates = " ".join(f"{engine}={rows / time:>12,.0f} rows/s" for engine, time in times.items())
+                print(
+                    f"{archive_name} archive, chunksize={chunks or '-':>8}: {rates} "
+                    f"speedup={times['pandas'] / times['pyarrow']:5.2f}x"
+                )
+
+
+if __name__ == "__main__":
+    main()
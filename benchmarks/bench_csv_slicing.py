@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+Compares per-city filtering and slicing of hotels csv files with the bulk writer.
+Run from project root: python -m benchmarks.bench_csv_slicing --rows 500000 --countries 2000 --threads 4
+"""
+
+import tempfile
+from time import perf_counter
+
+import click
+import pandas as pd
+
+from benchmarks.synthetic import make_hotels_df
+from src.processing.city_index import build_city_index
+from src.save_results.data_saving_utils import (
+    initialise_dir_structure,
+    save_hotels_data,
+)
+
+
+def legacy_slice_and_save(basedir: str, hotels_df: pd.DataFrame, city: str):
+    """
+    Slicing before the bulk writer: full scan per city, to_csv per file
+    (with the 100 rows fix, to write the same files)
+    """
+
+    hotels_df = hotels_df[hotels_df["City"] == city]
+    country = hotels_df["Country"].values[0]
+    df_len = len(hotels_df)
+
+    for file_num, start in enumerate(range(0, df_len, 100), start=1):
+        file_name = f"{city.lower()}_hotels_{file_num:03}.csv"
+        hotels_df.iloc[start:][:100].to_csv(
+            f"{basedir}/{country}/{city}/hotels/{file_name}", index=False, encoding="utf-8"
+        )
+
+
+@click.command()
+@click.option("--rows", default=500_000, help="Rows to generate.")
+@click.option("--countries", default=2000, help="Number of distinct countries (one city in every country).")
+@click.option("--threads", default=4, help="Number of writer threads.")
+def main(rows, countries, threads):
+    hotels_df = make_hotels_df(rows, countries, 1)
+    hotels_df["Address"] = "Some street 1, Some city, Some country"
+    index = build_city_index(hotels_df)
+    print(f"{len(index.cities)} cities, {rows} rows")
+
+    with tempfile.TemporaryDirectory() as base_dir:
+        initialise_dir_structure(base_dir, hotels_df, index)
+
+        start = perf_counter()
+        for city in index.cities:
+            legacy_slice_and_save(base_dir, hotels_df, city)
+        legacy_time = perf_counter() - start
+        print(f"legacy per-city:   {legacy_time:8.3f}s")
+
+        for threads_count in [1, threads]:
+            start = perf_counter()
+            save_hotels_data(base_dir, hotels_df, index, threads_count=threads_count)
+            bulk_time = perf_counter() - start
+            print(f"bulk threads={threads_count}:  {bulk_time:8.3f}s speedup={legacy_time / bulk_time:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Compares the vectorized df_group_and_filter with the former per-country loop.
+Run from project root: python -m benchmarks.bench_group_and_filter --rows 1000000 --rows 10000000
+"""
+
+from time import perf_counter
+
+import click
+import pandas as pd
+
+from benchmarks.synthetic import make_hotels_df
+from src.processing.pre_process import df_group_and_filter
+
+
+def df_group_and_filter_iterative(iterable) -> pd.DataFrame:
+    """
+    Former implementation of df_group_and_filter, kept as a baseline.
+    Sorting is made stable here, so ties are resolved the same way on every
+    numpy build (SIMD quicksort of newer numpy releases does not keep order)
+    """
+
+    df_complete = pd.concat(iterable, sort=False, ignore_index=True)
+
+    country_list = df_complete["Country"].unique()
+    country_city_mapping = {}
+    country_city_df = df_complete[["Country", "City"]]
+
+    for country in country_list:
+        this_country_cities = country_city_df[country_city_df["Country"] == country]
+        best_city = (
+            this_country_cities.groupby("City", sort=False)["Country"]
+            .count()
+            .sort_values(ascending=False, kind="mergesort")
+            .index[0]
+        )
+
+        country_city_mapping[country] = best_city
+
+    for map_country, map_city in country_city_mapping.items():
+        df_complete.drop(
+            df_complete[(df_complete.Country == map_country) & (df_complete.City != map_city)].index, inplace=True
+        )
+    df_complete = df_complete.reset_index(drop=True)
+
+    return df_complete
+
+
+@click.command()
+@click.option("--rows", "rows_list", multiple=True, type=int, default=[1_000_000, 10_000_000], help="Rows to generate.")
+@click.option("--countries", default=200, help="Number of distinct countries.")
+@click.option("--cities", default=10, help="Number of cities in every country.")
+def main(rows_list, countries, cities):
+    for rows in rows_list:
+        df = make_hotels_df(rows, countries, cities)
+
+        start = perf_counter()
+        vectorized = df_group_and_filter([df])
+        vectorized_time = perf_counter() - start
+
+        start = perf_counter()
+        iterative = df_group_and_filter_iterative([df])
+        iterative_time = perf_counter() - start
+
+        pd.testing.assert_frame_equal(vectorized, iterative)
+        print(
+            f"rows={rows:>10} iterative={iterative_time:8.3f}s vectorized={vectorized_time:8.3f}s "
+            f"speedup={iterative_time / vectorized_time:6.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+Measures offline reverse geocoding throughput on random gazetteer and queries.
+Run from project root: python -m benchmarks.bench_offline_geocoding --points 100000 --queries 1000000
+"""
+
+from time import perf_counter
+
+import click
+import numpy as np
+
+from src.api_utils.offline_geocoding import OfflineGeocoder
+
+
+@click.command()
+@click.option("--points", default=100_000, help="Gazetteer size.")
+@click.option("--queries", default=1_000_000, help="Number of coordinates to geocode.")
+@click.option("--max_km", default=0.05, help="Max distance to the nearest gazetteer address, km.")
+def main(points, queries, max_km):
+    rng = np.random.default_rng(0)
+    latitudes = rng.uniform(-60.0, 70.0, points)
+    longitudes = rng.uniform(-180.0, 180.0, points)
+    addresses = [f"Address {i}" for i in range(points)]
+
+    start = perf_counter()
+    geocoder = OfflineGeocoder(latitudes, longitudes, addresses, max_km)
+    build_time = perf_counter() - start
+
+    # Half of queries are near gazetteer points, half are random
+    near = rng.integers(0, points, queries // 2)
+    query_lats = np.concatenate([latitudes[near] + rng.normal(0, 1e-5, len(near)), rng.uniform(-60, 70, queries // 2)])
+    query_lons = np.concatenate(
+        [longitudes[near] + rng.normal(0, 1e-5, len(near)), rng.uniform(-180, 180, queries // 2)]
+    )
+
+    start = perf_counter()
+    geocoder.lookup(query_lats, query_lons)
+    lookup_time = perf_counter() - start
+
+    print(f"build: {build_time:.3f}s for {points} points")
+    print(f"lookup: {lookup_time:.3f}s for {queries} queries ({queries / lookup_time:,.0f} rows/s)")
+    print(f"hits: {geocoder.hits} misses: {geocoder.misses}")
+
+
+if __name__ == "__main__":
+    main()
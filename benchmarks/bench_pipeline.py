@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+End-to-end benchmark of weather_app.main on a synthetic archive against
+local stub APIs. Times the whole run and every stage (from the run report),
+appends results to a JSON lines file and compares them with the previous
+result of the same parameters (usually - of another commit).
+Run from project root: python -m benchmarks.bench_pipeline --rows 100000 --countries 20 --latency 0.05
+"""
+
+import datetime
+import json
+import logging
+import os
+import shlex
+import subprocess
+import tempfile
+from pathlib import Path
+from time import perf_counter
+from typing import List, Optional
+from unittest.mock import patch
+
+import click
+
+import weather_app
+from benchmarks.stub_api import StubApiServer
+from benchmarks.synthetic import make_hotels_archive
+from src.api_utils import weather_api
+from src.instrumentation import API_STATS
+
+
+def git_commit() -> Optional[str]:
+    """
+    :return: Short hash of current commit with "+" mark for uncommitted changes, None out of git repo
+    """
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, check=True, text=True)
+        status = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+    return commit.stdout.strip() + ("+" if status.stdout.strip() else "")
+
+
+def run_pipeline(archive: Path, work_dir: Path, server: StubApiServer, app_args: List[str]) -> dict:
+    """
+    Runs weather_app.main once with all APIs redirected to stub server.
+    positionstack worker has hardcoded http URL, so it goes through the
+    stub as HTTP proxy. Fresh SQLite geocoding cache replaces joblib
+    memoization, so project cache in src/cache is neither used nor changed
+
+    :param archive: Path to hotels archive
+    :param work_dir: Dir for output and caches of the run
+    :param server: Started stub server
+    :param app_args: Extra weather_app options
+    :return: Total time and run report
+    """
+
+    output_path = work_dir / "output"
+    report_path = work_dir / "report.json"
+    geocache_path = work_dir / "geocache.sqlite"
+    if geocache_path.exists():
+        geocache_path.unlink()
+    args = [
+        "--data_path",
+        str(archive),
+        "--output_path",
+        str(output_path),
+        "--geocache_path",
+        str(geocache_path),
+        "--run_report",
+        str(report_path),
+    ] + app_args
+
+    API_STATS.reset()
+    proxies = {"HTTP_PROXY": server.url, "http_proxy": server.url, "NO_PROXY": "127.0.0.1", "no_proxy": "127.0.0.1"}
+    with patch.dict(os.environ, proxies), patch.object(weather_api, "WEATHER_API_URL", f"{server.url}/data/2.5"):
+        start = perf_counter()
+        weather_app.main(args, standalone_mode=False)
+        total_time = perf_counter() - start
+
+    return {"total_s": total_time, "report": json.loads(report_path.read_text())}
+
+
+def best_result(runs: List[dict]) -> dict:
+    """
+    :param runs: Results of repeated runs
+    :return: Best (minimal) total and stage times of runs, API stats of the best run
+    """
+
+    best_run = min(runs, key=lambda run: run["total_s"])
+    stages = {}
+    for run in runs:
+        for stage in run["report"]["stages"]:
+            stages[stage["name"]] = min(stages.get(stage["name"], float("inf")), stage["wall_s"])
+
+    return {"total_s": best_run["total_s"], "stages": stages, "api": best_run["report"]["api"]}
+
+
+def previous_result(results_path: Path, params: dict) -> Optional[dict]:
+    """
+    :param results_path: JSON lines file of results
+    :param params: Benchmark parameters
+    :return: The last result of the same parameters or None
+    """
+
+    if not results_path.exists():
+        return None
+
+    previous = None
+    for line in results_path.read_text(encoding="utf-8").splitlines():
+        result = json.loads(line)
+        if result["params"] == params:
+            previous = result
+
+    return previous
+
+
+def print_comparison(result: dict, previous: Optional[dict]):
+    header = f"{'Stage':<16}{'Time, s':>10}"
+    if previous is not None:
+        header += f"{previous['commit'] or '-':>14}{'Ratio':>8}"
+    print(header)
+
+    rows = list(result["stages"].items()) + [("total", result["total_s"])]
+    for name, stage_time in rows:
+        line = f"{name:<16}{stage_time:>10.3f}"
+        if previous is not None:
+            previous_time = previous["total_s"] if name == "total" else previous["stages"].get(name)
+            if previous_time:
+                line += f"{previous_time:>14.3f}{stage_time / previous_time:>8.2f}"
+        print(line)
+
+    for name, api in result["api"].items():
+        print(f"API {name}: {api['calls']} calls, p50={api['p50_s'] * 1000:.1f}ms p99={api['p99_s'] * 1000:.1f}ms")
+
+
+@click.command()
+@click.option("--rows", default=100_000, help="Rows of synthetic archive, including dirty ones.")
+@click.option("--countries", default=20, help="Number of distinct countries (one city of every country is kept).")
+@click.option("--cities_per_country", default=10, help="Number of distinct cities in every country.")
+@click.option("--dirty_ratio", default=0.05, help="Share of invalid rows.")
+@click.option("--files", default=5, help="Number of csv files in archive.")
+@click.option("--latency", default=0.05, help="Latency of stub API responses, seconds.")
+@click.option("--jitter", default=0.0, help="Max random addition to latency, seconds.")
+@click.option("--repeat", default=1, help="Number of runs. The best time of every stage is kept.")
+@click.option("--app_args", default="", help='Extra weather_app options, e.g. "--threads_count 20 --plot_workers 4".')
+@click.option("--label", default="", help="Free text note stored with results.")
+@click.option("--results", default="benchmarks/results/pipeline.jsonl", help="JSON lines file to append results to.")
+def main(rows, countries, cities_per_country, dirty_ratio, files, latency, jitter, repeat, app_args, label, results):
+    logging.getLogger().setLevel(logging.WARNING)
+    params = {
+        "rows": rows,
+        "countries": countries,
+        "cities_per_country": cities_per_country,
+        "dirty_ratio": dirty_ratio,
+        "files": files,
+        "latency": latency,
+        "jitter": jitter,
+        "app_args": app_args,
+    }
+
+    with tempfile.TemporaryDirectory() as work_dir, StubApiServer(latency, jitter) as server:
+        work_dir = Path(work_dir)
+        archive = make_hotels_archive(work_dir / "hotels.zip", rows, countries, cities_per_country, dirty_ratio, files)
+        runs = [run_pipeline(archive, work_dir, server, shlex.split(app_args)) for _ in range(repeat)]
+
+    result = {
+        "commit": git_commit(),
+        "time": datetime.datetime.now().isoformat(timespec="seconds"),
+        "label": label,
+        "params": params,
+        **best_result(runs),
+    }
+
+    results_path = Path(results)
+    print_comparison(result, previous_result(results_path, params))
+
+    results_path.parent.mkdir(parents=True, exist_ok=True)
+    with results_path.open("a", encoding="utf-8") as results_file:
+        results_file.write(json.dumps(result) + "\n")
+
+
+if __name__ == "__main__":
+    main()
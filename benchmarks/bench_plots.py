@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+Compares legacy pyplot rendering with template rendering (serial and in
+process pool) of synthetic city weather.
+Run from project root: python -m benchmarks.bench_plots --cities 200 --workers 4
+"""
+
+import datetime
+import tempfile
+from time import perf_counter
+
+import click
+import matplotlib
+
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt  # noqa: E402
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from src.processing.city_index import build_city_index  # noqa: E402
+from src.save_results.data_saving_utils import (  # noqa: E402
+    generate_and_save_plots,
+    initialise_dir_structure,
+)
+
+
+def make_weather_df(cities: int, days: int = 11, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    first_date = datetime.date(2022, 1, 20)
+    dates = [first_date + datetime.timedelta(day) for day in range(days)]
+    min_temps = rng.normal(0, 5, cities * days)
+
+    return pd.DataFrame(
+        {
+            "Date": dates * cities,
+            "City": np.repeat([f"City {i}" for i in range(cities)], days),
+            "Country": np.repeat([f"C{i}" for i in range(cities)], days),
+            "MinTemp": min_temps,
+            "MaxTemp": min_temps + rng.uniform(2, 10, cities * days),
+        }
+    )
+
+
+def legacy_plot(city_centre_df: pd.DataFrame, column: str, title: str, path: str):
+    """
+    Plot rendering before figure templates: pyplot state machine, new figure every time
+    """
+
+    temps_vector = city_centre_df[column]
+    delta = (max(temps_vector) - min(temps_vector)) // 2
+
+    plt.plot(city_centre_df["Date"], temps_vector, linewidth=2, color="green")
+    plt.xlabel("Date")
+    plt.ylabel("Temperature, Celsius")
+    plt.title(title)
+    plt.grid()
+    plt.ylim(top=max(temps_vector) + delta)
+    plt.ylim(bottom=min(temps_vector) - delta)
+    plt.xticks(rotation=90)
+    plt.savefig(path)
+    plt.close()
+
+
+@click.command()
+@click.option("--cities", default=200, help="Number of cities to plot.")
+@click.option("--workers", default=4, help="Number of processes for parallel rendering.")
+def main(cities, workers):
+    weather_df = make_weather_df(cities)
+    index = build_city_index(weather_df)
+
+    with tempfile.TemporaryDirectory() as base_dir:
+        start = perf_counter()
+        for city in index.cities:
+            city_centre_df = index.rows(weather_df, city)
+            legacy_plot(city_centre_df, "MinTemp", f"Min temperatures in centre of {city}", f"{base_dir}/min.png")
+            legacy_plot(city_centre_df, "MaxTemp", f"Max temperatures in centre of {city}", f"{base_dir}/max.png")
+        print(f"legacy:    {perf_counter() - start:8.3f}s for {2 * cities} plots")
+
+    for mode_workers in [1, workers]:
+        with tempfile.TemporaryDirectory() as base_dir:
+            initialise_dir_structure(base_dir, weather_df, index)
+            start = perf_counter()
+            generate_and_save_plots(weather_df, weather_df, base_dir, index, index, workers=mode_workers)
+            print(f"workers={mode_workers}: {perf_counter() - start:8.3f}s for {2 * cities} plots")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+
+import json
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from random import Random
+from time import sleep
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
+
+from src.service_utils import project_root
+
+SAMPLES_DIR = project_root() / "tests" / "test_data"
+
+
+class StubApiServer:
+    """
+    Local fake of positionstack, Nominatim and openweathermap endpoints with
+    configurable latency. Accepts plain requests and proxy requests
+    (absolute URLs), so clients with hardcoded http URLs can be redirected
+    to it with HTTP_PROXY environment variable. Weather responses are
+    samples from tests/test_data
+    """
+
+    def __init__(self, latency: float = 0.05, jitter: float = 0.0, seed: int = 0):
+        """
+        :param latency: Delay of every response in seconds
+        :param jitter: Max random addition to delay in seconds
+        :param seed: Random seed of jitter
+        """
+
+        self.latency = latency
+        self.jitter = jitter
+        self.counts = Counter()
+        self._random = Random(seed)
+        self._lock = threading.Lock()
+        self._forecast = json.loads((SAMPLES_DIR / "weather_api_worker_sample_resp.json").read_text())
+        self._historical = json.loads((SAMPLES_DIR / "weather_api_historical_worker_sample_resp.json").read_text())
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def respond(self, path: str, query: dict) -> Optional[dict]:
+        """
+        :param path: Requested path
+        :param query: Parsed query parameters
+        :return: Response of endpoint or None for unknown path
+        """
+
+        if path.endswith("/v1/reverse"):
+            latitude, longitude = query["query"][0].split(",")
+            return {
+                "data": [
+                    {
+                        "name": f"Stub hotel {latitude}",
+                        "number": "1",
+                        "street": f"Stub street {longitude}",
+                        "region": "Stub region",
+                        "postal_code": "00000",
+                        "country": "Stubland",
+                        "label": f"Stub hotel {latitude}, Stub street {longitude}",
+                    }
+                ]
+            }
+        if path.endswith("/reverse"):
+            return {"display_name": f"Stub street {query['lat'][0]}, {query['lon'][0]}, Stubland"}
+        if path.endswith("/onecall/timemachine"):
+            # Keep requested day, so historical dates differ
+            return dict(self._historical, current=dict(self._historical["current"], dt=int(query["dt"][0])))
+        if path.endswith("/onecall"):
+            return self._forecast
+
+        return None
+
+    def delay(self) -> float:
+        with self._lock:
+            return self.latency + self._random.uniform(0, self.jitter)
+
+    def start(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlsplit(self.path)
+                sleep(stub.delay())
+                response = stub.respond(url.path, parse_qs(url.query))
+                with stub._lock:
+                    stub.counts[url.path if response is not None else "unknown"] += 1
+
+                body = json.dumps(response if response is not None else {"error": "Not found"}).encode()
+                self.send_response(200 if response is not None else 404)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        class Server(ThreadingHTTPServer):
+            daemon_threads = True
+            # Default backlog of 5 connections drops (and delays by seconds) bursts of concurrent clients
+            request_queue_size = 256
+
+        self._server = Server(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def __enter__(self) -> "StubApiServer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+from pathlib import Path
+from typing import Union
+from zipfile import ZIP_DEFLATED, ZipFile
+
+import numpy as np
+import pandas as pd
+
+
+def make_hotels_df(rows: int, countries: int = 200, cities_per_country: int = 10, seed: int = 0) -> pd.DataFrame:
+    """
+    Generates synthetic hotels DataFrame with the same columns as
+    the cleaned archive data. City sizes are skewed, so every country
+    has a clear leader and a long tail of small cities
+
+    :param rows: Number of rows to generate
+    :param countries: Number of distinct countries
+    :param cities_per_country: Number of distinct cities in every country
+    :param seed: Random seed for reproducible data
+    :return: pandas DataFrame of synthetic hotels
+    """
+
+    rng = np.random.default_rng(seed)
+
+    country_codes = rng.integers(0, countries, rows)
+    # Geometric distribution makes low city numbers more frequent
+    city_codes = np.minimum(rng.geometric(0.3, rows) - 1, cities_per_country - 1)
+
+    country_names = np.array([f"C{code:03}" for code in range(countries)], dtype=object)
+    city_names = np.array(
+        [[f"City {country}-{city}" for city in range(cities_per_country)] for country in range(countries)],
+        dtype=object,
+    )
+
+    return pd.DataFrame(
+        {
+            "Name": np.array([f"Hotel {i}" for i in range(rows)], dtype=object),
+            "Country": country_names[country_codes],
+            "City": city_names[country_codes, city_codes],
+            "Latitude": rng.uniform(-90.0, 90.0, rows),
+            "Longitude": rng.uniform(-180.0, 180.0, rows),
+        }
+    )
+
+
+def make_dirty_hotels_df(
+    rows: int, countries: int = 20, cities_per_country: int = 10, dirty_ratio: float = 0.05, seed: int = 0
+) -> pd.DataFrame:
+    """
+    Generates synthetic hotels DataFrame as read from archive csv files.
+    Dirty rows have one of problems df_cleaner drops: missing value,
+    non-numeric coordinate, latitude or longitude out of range
+
+    :param rows: Number of rows, including dirty ones
+    :param countries: Number of distinct countries
+    :param cities_per_country: Number of distinct cities in every country
+    :param dirty_ratio: Share of dirty rows
+    :param seed: Random seed for reproducible data
+    :return: pandas DataFrame with Id column and object coordinate columns
+    """
+
+    rng = np.random.default_rng(seed)
+    df = make_hotels_df(rows, countries, cities_per_country, seed)
+    df.insert(0, "Id", np.arange(rows) * 8589934592)
+
+    # Coordinates become object columns to hold non-numeric values
+    latitudes = df["Latitude"].values.astype(object)
+    longitudes = df["Longitude"].values.astype(object)
+    dirty_positions = rng.choice(rows, int(rows * dirty_ratio), replace=False)
+    for position, problem in zip(dirty_positions, rng.integers(0, 4, len(dirty_positions))):
+        if problem == 0:
+            df.iat[position, 1] = None
+        elif problem == 1:
+            latitudes[position] = f"abd{latitudes[position]}"
+        elif problem == 2:
+            latitudes[position] += 200.0
+        else:
+            longitudes[position] -= 400.0
+    df["Latitude"] = latitudes
+    df["Longitude"] = longitudes
+
+    return df
+
+
+def make_hotels_archive(
+    path: Union[str, Path],
+    rows: int,
+    countries: int = 20,
+    cities_per_country: int = 10,
+    dirty_ratio: float = 0.05,
+    files: int = 5,
+    seed: int = 0,
+) -> Path:
+    """
+    Writes synthetic zip archive of hotels csv files, like data/hotels.zip.
+    Rows are generated by make_dirty_hotels_df
+
+    :param path: Path to zip file to write
+    :param rows: Number of rows, including dirty ones
+    :param countries: Number of distinct countries
+    :param cities_per_country: Number of distinct cities in every country
+    :param dirty_ratio: Share of dirty rows
+    :param files: Number of csv files in archive
+    :param seed: Random seed for reproducible data
+    :return: Path to written archive
+    """
+
+    df = make_dirty_hotels_df(rows, countries, cities_per_country, dirty_ratio, seed)
+
+    path = Path(path)
+    with ZipFile(path, "w", ZIP_DEFLATED) as zip_dst:
+        for file_num, part in enumerate(np.array_split(np.arange(rows), files)):
+            zip_dst.writestr(f"part-{file_num:05}-synthetic-c000.csv", df.iloc[part].to_csv(index=False))
+
+    return path
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from random import uniform
+from time import monotonic
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
+
+from src.instrumentation import API_STATS
+
+if TYPE_CHECKING:
+    import requests
+
+POSITIONSTACK_URL = "http://api.positionstack.com/v1/reverse"
+NOMINATIM_URL = "https://nominatim.openstreetmap.org/reverse"
+
+
+class PositionstackProvider:
+    """
+    Reverse geocoding with positionstack.com API.
+    API key in .env required
+    """
+
+    name = "positionstack"
+    headers: Dict[str, str] = {}
+
+    def __init__(self, url: str = POSITIONSTACK_URL, key: Optional[str] = None, rate: float = 10.0):
+        """
+        :param url: Reverse geocoding endpoint
+        :param key: API key, GEO_API_KEY from .env if not given
+        :param rate: Max requests per second
+        """
+
+        if key is None:
+            # Imported on use - PROVIDERS are listed by CLI on startup
+            from dotenv import load_dotenv
+
+            load_dotenv()
+            key = os.getenv("GEO_API_KEY")
+
+        self.url = url
+        self.key = key
+        self.rate = rate
+
+    def params(self, coordinate: str) -> Dict[str, str]:
+        return {"access_key": self.key, "query": coordinate}
+
+    def parse(self, info: dict) -> Optional[str]:
+        """
+        Builds address from response fields, like get_address_worker_v2 does
+
+        :param info: Response json
+        :return: Address or None for empty response
+        """
+
+        if not info.get("data") or not info["data"][0]:
+            return None
+
+        fields = info["data"][0]
+        address_parts = [
+            fields.get(field)
+            for field in ["name", "number", "street", "region", "postal_code", "country"]
+            if fields.get(field) is not None
+        ]
+
+        # Pick the best address definition
+        if len(address_parts) <= 1 and fields.get("label") is not None:
+            return fields["label"]
+
+        return ", ".join(str(part) for part in address_parts) or None
+
+
+class NominatimProvider:
+    """
+    Reverse geocoding with OpenStreetMap Nominatim API.
+    Usage policy allows one request per second
+    """
+
+    name = "nominatim"
+    headers = {"User-Agent": "weather_hotels_1206"}
+
+    def __init__(self, url: str = NOMINATIM_URL, rate: float = 1.0):
+        """
+        :param url: Reverse geocoding endpoint
+        :param rate: Max requests per second
+        """
+
+        self.url = url
+        self.rate = rate
+
+    def params(self, coordinate: str) -> Dict[str, str]:
+        latitude, longitude = coordinate.split(",")
+        return {"format": "jsonv2", "lat": latitude.strip(), "lon": longitude.strip(), "accept-language": "en"}
+
+    def parse(self, info: dict) -> Optional[str]:
+        return info.get("display_name")
+
+
+PROVIDERS = {"positionstack": PositionstackProvider, "nominatim": NominatimProvider}
+
+
+class TokenBucket:
+    """
+    Rate limiter: a token is added every 1/rate seconds, up to capacity.
+    Every request takes one token or waits for it
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        """
+        :param rate: Tokens per second
+        :param capacity: Max tokens accumulated - max burst of requests
+        """
+
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class AsyncGeocoder:
+    """
+    Asynchronous reverse geocoding client. All requests share one HTTP
+    connection pool and a token bucket limiter with provider's rate. Failed
+    requests are retried with exponential backoff and jitter
+    """
+
+    def __init__(
+        self,
+        provider,
+        concurrency: int = 10,
+        max_retries: int = 2,
+        backoff: float = 0.5,
+        timeout: float = 10.0,
+    ):
+        """
+        :param provider: PositionstackProvider or NominatimProvider
+        :param concurrency: Max requests in flight
+        :param max_retries: Retries of failed or empty responses
+        :param backoff: Base delay of retries in seconds, doubled every retry
+        :param timeout: Timeout of one request in seconds
+        """
+
+        self.provider = provider
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+
+    def geocode(self, coordinates: List[str], on_result: Optional[Callable] = None) -> List[Optional[str]]:
+        """
+        Gets addresses of given coordinates. Blocks until all are done
+
+        :param coordinates: Concatenated Latitude and Longitude. example: ["45.7865,-56.9483"]
+        :param on_result: Called with position of coordinate, address and error (None
+        or exception of unexpected failure) as every coordinate is done
+        :return: List of addresses in order of coordinates, None for failed ones
+        """
+
+        if not coordinates:
+            return []
+
+        return asyncio.run(self._geocode_all(coordinates, on_result))
+
+    async def _geocode_all(self, coordinates: List[str], on_result: Optional[Callable] = None) -> List[Optional[str]]:
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        limiter = TokenBucket(self.provider.rate)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        with requests.Session() as session, ThreadPoolExecutor(self.concurrency) as executor:
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers.update(self.provider.headers)
+
+            async def geocode_one(position: int, coordinate: str) -> Optional[str]:
+                address, error = None, None
+                try:
+                    address = await self._geocode_one(coordinate, session, executor, limiter, semaphore)
+                except Exception as e:
+                    # One failed coordinate doesn't cancel the others
+                    error = e
+                if on_result is not None:
+                    on_result(position, address, error)
+                return address
+
+            return await asyncio.gather(*[geocode_one(*item) for item in enumerate(coordinates)])
+
+    async def _geocode_one(
+        self,
+        coordinate: str,
+        session: "requests.Session",
+        executor: ThreadPoolExecutor,
+        limiter: TokenBucket,
+        semaphore: asyncio.Semaphore,
+    ) -> Optional[str]:
+        import requests
+
+        loop = asyncio.get_event_loop()
+        request = partial(session.get, self.provider.url, params=self.provider.params(coordinate), timeout=self.timeout)
+        request = API_STATS.timed(f"geocoding_{self.provider.name}", request)
+
+        async with semaphore:
+            for attempt in range(self.max_retries + 1):
+                await limiter.acquire()
+                try:
+                    resp = await loop.run_in_executor(executor, request)
+                    if resp.status_code == 200:
+                        address = self.provider.parse(resp.json())
+                        if address is not None:
+                            return address
+                except (requests.RequestException, ValueError):
+                    pass
+
+                if attempt < self.max_retries:
+                    await asyncio.sleep(self.backoff * 2**attempt + uniform(0, self.backoff))
+
+        logging.warning(f"API error for {coordinate}")
+        return None
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+import pickle
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+from zipfile import ZipFile
+
+import numpy as np
+
+# joblib stores every call in "<function name>/<args hash>/" directory.
+# positionstack worker results go first - they are preferred over Nominatim ones
+JOBLIB_WORKERS = ["get_address_worker_v2", "get_address_worker"]
+
+
+class GeocodeCache:
+    """
+    Single-file SQLite cache of geographical addresses. Coordinates are
+    rounded to given number of decimal places and stored as integers, so
+    coordinates differing only in last float digits share one entry.
+    Counts cache hits and misses of lookups
+    """
+
+    def __init__(self, path: Union[str, Path], precision: Optional[int] = 5):
+        """
+        :param path: Path to SQLite database file. Created if not exists
+        :param precision: Number of decimal places to round coordinates to.
+        Can't be changed for existing database. None - use precision of
+        existing database (5 for a new one)
+        """
+
+        self.path = Path(path)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(str(self.path), check_same_thread=False)
+
+        with self._connection:
+            self._connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS addresses "
+                "(lat INTEGER, lon INTEGER, address TEXT NOT NULL, PRIMARY KEY (lat, lon)) WITHOUT ROWID"
+            )
+            self._connection.execute(
+                "INSERT OR IGNORE INTO meta VALUES ('precision', ?)", (str(5 if precision is None else precision),)
+            )
+
+        stored_precision = int(self._connection.execute("SELECT value FROM meta WHERE key = 'precision'").fetchone()[0])
+        self.precision = stored_precision if precision is None else precision
+        if stored_precision != self.precision:
+            raise ValueError(f"Cache {self.path} keeps coordinates with precision {stored_precision}, not {precision}")
+
+    def keys(self, latitudes: Sequence[float], longitudes: Sequence[float]) -> List[Tuple[int, int]]:
+        """
+        Converts coordinates to integer cache keys
+
+        :param latitudes: Latitude values
+        :param longitudes: Longitude values
+        :return: List of (latitude, longitude) keys
+        """
+
+        scale = 10**self.precision
+        lat_keys = np.round(np.asarray(latitudes, dtype="float64") * scale).astype("int64")
+        lon_keys = np.round(np.asarray(longitudes, dtype="float64") * scale).astype("int64")
+
+        return list(zip(lat_keys.tolist(), lon_keys.tolist()))
+
+    def lookup(self, latitudes: Sequence[float], longitudes: Sequence[float]) -> List[Optional[str]]:
+        """
+        Looks up addresses of all given coordinates with one query
+
+        :param latitudes: Latitude values
+        :param longitudes: Longitude values
+        :return: List of cached addresses, None for missed coordinates
+        """
+
+        keys = self.keys(latitudes, longitudes)
+
+        with self._lock, self._connection:
+            self._connection.execute("CREATE TEMP TABLE IF NOT EXISTS lookup_keys (lat INTEGER, lon INTEGER)")
+            self._connection.execute("DELETE FROM lookup_keys")
+            self._connection.executemany("INSERT INTO lookup_keys VALUES (?, ?)", set(keys))
+            found = {
+                (lat, lon): address
+                for lat, lon, address in self._connection.execute(
+                    "SELECT lat, lon, address FROM lookup_keys JOIN addresses USING (lat, lon)"
+                )
+            }
+
+        addresses = [found.get(key) for key in keys]
+        hits = sum(address is not None for address in addresses)
+        self.hits += hits
+        self.misses += len(addresses) - hits
+
+        return addresses
+
+    def store(self, latitudes: Sequence[float], longitudes: Sequence[float], addresses: Sequence[Optional[str]]):
+        """
+        Stores addresses of given coordinates. None addresses (API errors)
+        are not stored, so they are requested again next time
+
+        :param latitudes: Latitude values
+        :param longitudes: Longitude values
+        :param addresses: Addresses of coordinates
+        """
+
+        rows = [
+            (lat, lon, address)
+            for (lat, lon), address in zip(self.keys(latitudes, longitudes), addresses)
+            if address is not None
+        ]
+
+        with self._lock, self._connection:
+            self._connection.executemany("INSERT OR REPLACE INTO addresses VALUES (?, ?, ?)", rows)
+
+    def entries(self) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+        """
+        :return: Latitudes, longitudes (rounded to cache precision) and addresses of all cached coordinates
+        """
+
+        with self._lock:
+            rows = self._connection.execute("SELECT lat, lon, address FROM addresses").fetchall()
+
+        scale = 10**self.precision
+        lat_keys, lon_keys, addresses = zip(*rows) if rows else ((), (), ())
+
+        return np.array(lat_keys, dtype="float64") / scale, np.array(lon_keys, dtype="float64") / scale, list(addresses)
+
+    def __len__(self) -> int:
+        return self._connection.execute("SELECT COUNT(*) FROM addresses").fetchone()[0]
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        """
+        :return: Dict of lookup hits, misses and hit rate
+        """
+
+        total = self.hits + self.misses
+
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0}
+
+    def import_joblib_cache(self, source: Union[str, Path]) -> int:
+        """
+        Imports results of joblib-memoized address workers. Already cached
+        coordinates are kept as is
+
+        :param source: joblib cache directory or zip archive of it (like data/cached_geocoding.zip)
+        :return: Number of imported addresses
+        """
+
+        latitudes, longitudes, addresses = [], [], []
+        for coordinate, address in read_joblib_entries(Path(source)):
+            latitude, longitude = coordinate
+            latitudes.append(latitude)
+            longitudes.append(longitude)
+            addresses.append(address)
+
+        rows = [
+            (lat, lon, address)
+            for (lat, lon), address in zip(self.keys(latitudes, longitudes), addresses)
+            if address is not None
+        ]
+
+        with self._lock, self._connection:
+            before = self._connection.total_changes
+            self._connection.executemany("INSERT OR IGNORE INTO addresses VALUES (?, ?, ?)", rows)
+            imported = self._connection.total_changes - before
+
+        logging.info(f"Imported {imported} geocoding results from {source}")
+
+        return imported
+
+    def close(self):
+        self._connection.close()
+
+
+def _parse_coordinate(coordinate_repr: str) -> Tuple[float, float]:
+    """
+    Parses coordinate argument, stored by joblib. Workers were called with
+    strings and numpy arrays, examples: "'45.7865,-56.9483'", "array([45.7865, -56.9483])"
+
+    :param coordinate_repr: repr of coordinate argument
+    :return: Latitude and Longitude
+    """
+
+    latitude, longitude = re.findall(r"[-+]?\d+(?:\.\d*)?(?:[eE][-+]?\d+)?", coordinate_repr)
+
+    return float(latitude), float(longitude)
+
+
+def read_joblib_entries(source: Path) -> Iterator[Tuple[Tuple[float, float], Optional[str]]]:
+    """
+    Reads (coordinate, address) pairs from joblib cache directory or zip archive of it
+
+    :param source: joblib cache directory or zip archive
+    :return: Generator of coordinates and addresses
+    """
+
+    if source.suffix == ".zip":
+        with ZipFile(source) as zip_src:
+            names = set(zip_src.namelist())
+            for worker in JOBLIB_WORKERS:
+                metadata_pattern = re.compile(rf"(?:^|/){worker}/[0-9a-f]+/metadata\.json$")
+                for name in sorted(name for name in names if metadata_pattern.search(name)):
+                    output_name = name[: -len("metadata.json")] + "output.pkl"
+                    if output_name in names:
+                        metadata = json.loads(zip_src.read(name))
+                        address = pickle.loads(zip_src.read(output_name))
+                        yield _parse_coordinate(metadata["input_args"]["coordinate"]), address
+    else:
+        for worker in JOBLIB_WORKERS:
+            for metadata_path in sorted(source.rglob(f"{worker}/*/metadata.json")):
+                output_path = metadata_path.parent / "output.pkl"
+                if output_path.exists():
+                    metadata = json.loads(metadata_path.read_text())
+                    address = pickle.loads(output_path.read_bytes())
+                    yield _parse_coordinate(metadata["input_args"]["coordinate"]), address
+
+
+if __name__ == "__main__":
+    pass
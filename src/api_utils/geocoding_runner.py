@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import threading
+from time import perf_counter
+from typing import Callable, List, Optional, Sequence
+
+import numpy as np
+
+# Callback of request function: position of coordinate, address and error of the request
+ResultCallback = Callable[[int, Optional[str], Optional[BaseException]], None]
+# Requests addresses of coordinates at given positions, calls callback as every one completes
+RequestFunction = Callable[[List[int], ResultCallback], None]
+
+# Checkpoint is a GeocodeCache file in output dir, removed after successful run.
+# Its keys are precise enough to not merge distinct float32 coordinates
+CHECKPOINT_NAME = "geocoding_checkpoint.sqlite"
+CHECKPOINT_PRECISION = 7
+
+
+class GeocodingCancelled(Exception):
+    pass
+
+
+class GeocodingRunner:
+    """
+    Consumes geocoding results as they complete. Addresses are saved to
+    stores (SQLite cache, checkpoint) by batches, so an interrupted run
+    loses one batch at most. Coordinates whose requests raised are put
+    to retry queue and requested again after all others, so one failure
+    doesn't abort the rest. Progress with ETA is logged periodically
+    """
+
+    def __init__(
+        self,
+        coordinates: Sequence[str],
+        latitudes: np.ndarray,
+        longitudes: np.ndarray,
+        stores: Sequence = (),
+        batch_size: int = 100,
+        retries: int = 1,
+        log_interval: float = 10.0,
+        cancelled: Optional[threading.Event] = None,
+    ):
+        """
+        :param coordinates: Concatenated Latitude and Longitude. example: ["45.7865,-56.9483"]
+        :param latitudes: Latitudes of coordinates
+        :param longitudes: Longitudes of coordinates
+        :param stores: Objects with GeocodeCache.store method to save addresses to
+        :param batch_size: Number of results to save at once
+        :param retries: Number of rounds of requesting failed coordinates again
+        :param log_interval: Min time between progress messages, seconds
+        :param cancelled: Event to stop requesting on. Results got so far are saved
+        and GeocodingCancelled is raised
+        """
+
+        self.coordinates = list(coordinates)
+        self.latitudes = np.asarray(latitudes)
+        self.longitudes = np.asarray(longitudes)
+        self.stores = list(stores)
+        self.batch_size = batch_size
+        self.retries = retries
+        self.log_interval = log_interval
+        self.cancelled = cancelled
+
+        self.addresses: List[Optional[str]] = [None] * len(self.coordinates)
+        self.failed: List[int] = []
+        self.done = 0
+        self.total = len(self.coordinates)
+        self._batch: List[int] = []
+        self._lock = threading.Lock()
+        self._started = perf_counter()
+        self._logged = self._started
+
+    def on_result(self, position: int, address: Optional[str], error: Optional[BaseException] = None):
+        """
+        Result callback of request function. Can be called from any thread
+
+        :param position: Position of coordinate
+        :param address: Address or None for API errors
+        :param error: Exception raised by request, address is ignored then
+        """
+
+        with self._lock:
+            self.done += 1
+            if error is not None:
+                self.failed.append(position)
+                logging.debug(f"Geocoding of {self.coordinates[position]} failed: {error!r}")
+            else:
+                self.addresses[position] = address
+                self._batch.append(position)
+
+            batch_full = len(self._batch) >= self.batch_size
+            log_progress = perf_counter() - self._logged >= self.log_interval
+            if log_progress:
+                self._logged = perf_counter()
+
+        if batch_full:
+            self.flush()
+        if log_progress:
+            logging.info(self.progress())
+        if self.cancelled is not None and self.cancelled.is_set():
+            raise GeocodingCancelled(self.progress())
+
+    def flush(self):
+        """
+        Saves addresses of unsaved results to stores. None addresses are skipped by stores
+        """
+
+        with self._lock:
+            positions, self._batch = self._batch, []
+        if not positions:
+            return
+
+        addresses = [self.addresses[position] for position in positions]
+        for store in self.stores:
+            store.store(self.latitudes[positions], self.longitudes[positions], addresses)
+
+    def progress(self) -> str:
+        """
+        :return: Message with done count, rate and ETA
+        """
+
+        elapsed = perf_counter() - self._started
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        eta = f"{(self.total - self.done) / rate:.0f}s" if rate > 0 else "-"
+
+        return (
+            f"Geocoding: {self.done}/{self.total} ({self.done / max(self.total, 1):.1%}), "
+            f"{rate:.1f}/s, ETA {eta}, {len(self.failed)} failed"
+        )
+
+    def run(self, request: RequestFunction) -> List[Optional[str]]:
+        """
+        Requests all coordinates, then retries failed ones. Results are
+        saved even if request function is interrupted
+
+        :param request: Function to request addresses of coordinates at given positions
+        :return: List of addresses in order of coordinates, None for failed ones
+        """
+
+        pending = list(range(len(self.coordinates)))
+        for attempt in range(self.retries + 1):
+            if attempt > 0:
+                logging.info(f"Retrying {len(pending)} failed coordinates")
+                self.total += len(pending)
+            self.failed = []
+            try:
+                request(pending, self.on_result)
+            finally:
+                self.flush()
+            pending = self.failed
+            if not pending:
+                break
+
+        logging.info(self.progress())
+        if self.failed:
+            logging.warning(f"Geocoding failed for {len(self.failed)} coordinates after {self.retries} retries")
+
+        return self.addresses
+
+
+if __name__ == "__main__":
+    pass
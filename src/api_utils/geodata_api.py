@@ -3,11 +3,13 @@
 import json
 import logging
 import os
-from multiprocessing.pool import ThreadPool
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from random import randint
 from time import sleep
-from typing import List, Union
+from typing import List, Optional, Tuple, Union
 
+import numpy as np
 import pandas as pd
 import requests
 from dotenv import load_dotenv
@@ -15,6 +17,15 @@ from geopy.extra.rate_limiter import RateLimiter
 from geopy.geocoders import Nominatim
 from joblib import Memory
 
+from src.api_utils.async_geocoding import AsyncGeocoder
+from src.api_utils.geocache import GeocodeCache
+from src.api_utils.geocoding_runner import GeocodingRunner, ResultCallback
+from src.api_utils.offline_geocoding import OfflineGeocoder
+from src.instrumentation import API_STATS
+from src.processing.centres import (  # noqa: F401 (moved, kept for imports)
+    calc_centre,
+    calc_centres,
+)
 from src.service_utils import project_root
 
 load_dotenv()
@@ -105,43 +116,147 @@ def get_address_worker_v2(coordinate: str) -> Union[str, None]:
 get_address_worker_v2 = memory.cache(get_address_worker_v2)
 
 
-def collect_geo_data(coordinates: pd.DataFrame, threads_count: int = 10) -> List:
+def unique_coordinates(coordinates: pd.DataFrame, precision: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Groups equal coordinates, optionally rounded to given precision
+
+    :param coordinates: pandas DataFrame[["Latitude", "Longitude"]]
+    :param precision: Number of decimal places to round coordinates to before
+    comparison. Exact values are compared if not set
+    :return: Group number of every row and position of the first row of every group
+    """
+
+    latitudes = coordinates.iloc[:, 0].values
+    longitudes = coordinates.iloc[:, 1].values
+    if precision is not None:
+        latitudes = np.round(latitudes, precision)
+        longitudes = np.round(longitudes, precision)
+
+    groups = pd.DataFrame({"Latitude": latitudes, "Longitude": longitudes}).groupby(
+        ["Latitude", "Longitude"], sort=False
+    )
+    group_codes = groups.ngroup().values
+    first_positions = groups.cumcount().values == 0
+
+    return group_codes, np.flatnonzero(first_positions)
+
+
+def collect_geo_data(
+    coordinates: pd.DataFrame,
+    threads_count: int = 10,
+    cache: Optional[GeocodeCache] = None,
+    dedup_precision: Optional[int] = None,
+    geocoder: Optional[AsyncGeocoder] = None,
+    offline: Optional[OfflineGeocoder] = None,
+    checkpoint: Optional[GeocodeCache] = None,
+    batch_size: int = 100,
+    retries: int = 1,
+    cancelled: Optional[threading.Event] = None,
+) -> List:
     """
     Uses get_address_worker to form list of geographical addresses by given
-    DataFrame coordinates
+    DataFrame coordinates. Every unique coordinate is requested once.
+    Results are consumed as they complete by GeocodingRunner: saved to cache
+    and checkpoint by batches, failed requests are retried
 
     :param coordinates: pandas DataFrame
     :param threads_count: count of threads to request API
+    :param cache: SQLite geocoding cache. If given, all coordinates are looked up
+    in it with one query and only missed ones are requested from API
+    :param dedup_precision: Number of decimal places to round coordinates to
+    before deduplication. Only exactly equal coordinates share a request if not set
+    :param geocoder: Asynchronous geocoding client to request API with instead
+    of threads of get_address_worker_v2. Its results are not memoized by joblib
+    :param offline: Local gazetteer to resolve coordinates with before cache and API
+    :param checkpoint: Addresses of an interrupted run. Found coordinates are not
+    requested, requested ones are saved to it
+    :param batch_size: Number of results to save to cache and checkpoint at once
+    :param retries: Number of rounds of requesting coordinates, whose requests raised, again
+    :param cancelled: Event to stop requesting on, see GeocodingRunner
     :return: List of addresses for given DataFrame of coordinates
     """
 
+    group_codes, first_positions = unique_coordinates(coordinates, dedup_precision)
+    unique_df = coordinates.iloc[first_positions]
+    logging.info(
+        f"Geocoding {len(unique_df)} unique coordinates of {len(coordinates)} rows: "
+        f"{len(coordinates) - len(unique_df)} API calls saved"
+    )
+
     coordinates_list = []
 
-    for coordinate in coordinates.values:
+    for coordinate in unique_df.values:
         list(coordinate)
         coordinates_list.append(",".join([str(coordinate[0]), str(coordinate[1])]))
 
-    with ThreadPool(threads_count) as tp:
-        address_list = tp.map(get_address_worker_v2, coordinates_list)
-
-    return address_list
+    latitudes = unique_df.iloc[:, 0].values
+    longitudes = unique_df.iloc[:, 1].values
+    unique_addresses = [None] * len(unique_df)
+    missed = list(range(len(unique_df)))
 
+    # Resolve as much as possible locally, request API only for the rest
+    if offline is not None:
+        unique_addresses = offline.lookup(latitudes, longitudes)
+        missed = [i for i in missed if unique_addresses[i] is None]
+        logging.info(f"Offline geocoding: {len(unique_df) - len(missed)} found, {len(missed)} missed")
 
-def calc_centre(coordinates: pd.DataFrame) -> List[float]:
-    """
-    Finds the centre of given DataFrame of coordinates.
-    Treats given coordinates as planar and calculates average
-    of them. That's why given coordinates should be from one
-    city
-
-    :param coordinates: pandas DataFrame[["Latitude", "Longitude"]], containing data for one city
-    :return: calculated centre coordinates
-    """
-
-    latitude_values = list(coordinates["Latitude"].values)
-    longitude_values = list(coordinates["Longitude"].values)
+    if cache is None:
+        worker = get_address_worker_v2
+    else:
+        for i, address in zip(missed, cache.lookup(latitudes[missed], longitudes[missed])):
+            unique_addresses[i] = address
+        missed = [i for i in missed if unique_addresses[i] is None]
+        # SQLite cache replaces joblib memoization - call undecorated worker
+        worker = getattr(get_address_worker_v2, "func", get_address_worker_v2)
+
+    if checkpoint is not None:
+        for i, address in zip(missed, checkpoint.lookup(latitudes[missed], longitudes[missed])):
+            unique_addresses[i] = address
+        resumed_count = len(missed)
+        missed = [i for i in missed if unique_addresses[i] is None]
+        resumed_count -= len(missed)
+        if resumed_count:
+            logging.info(f"Resuming geocoding: {resumed_count} addresses from checkpoint, {len(missed)} left")
+
+    missed_coordinates = [coordinates_list[i] for i in missed]
+
+    def request_addresses(positions: List[int], on_result: ResultCallback):
+        if geocoder is not None:
+            geocoder.geocode(
+                [missed_coordinates[position] for position in positions],
+                lambda j, address, error: on_result(positions[j], address, error),
+            )
+            return
+
+        timed_worker = API_STATS.timed("geocoding", worker)
+        with ThreadPoolExecutor(threads_count) as executor:
+            futures = {executor.submit(timed_worker, missed_coordinates[position]): position for position in positions}
+            try:
+                for future in as_completed(futures):
+                    error = future.exception()
+                    on_result(futures[future], None if error is not None else future.result(), error)
+            finally:
+                # Interrupted run doesn't wait for queued requests
+                for future in futures:
+                    future.cancel()
+
+    if missed:
+        runner = GeocodingRunner(
+            missed_coordinates,
+            latitudes[missed],
+            longitudes[missed],
+            stores=[store for store in [cache, checkpoint] if store is not None],
+            batch_size=batch_size,
+            retries=retries,
+            cancelled=cancelled,
+        )
+        for i, address in zip(missed, runner.run(request_addresses)):
+            unique_addresses[i] = address
+
+    # Scatter addresses of unique coordinates back to every row
+    address_list = [unique_addresses[code] for code in group_codes]
 
-    return [sum(latitude_values) / len(latitude_values), sum(longitude_values) / len(longitude_values)]
+    return address_list
 
 
 if __name__ == "__main__":
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+from src.api_utils.geocache import GeocodeCache, read_joblib_entries
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def _unit_vectors(latitudes: Sequence[float], longitudes: Sequence[float]) -> np.ndarray:
+    """
+    Converts coordinates to 3D unit vectors - straight-line distance between
+    them grows monotonically with great-circle distance everywhere on the globe
+
+    :param latitudes: Latitude values
+    :param longitudes: Longitude values
+    :return: Array of shape (n, 3)
+    """
+
+    lat_radians = np.radians(np.asarray(latitudes, dtype="float64"))
+    lon_radians = np.radians(np.asarray(longitudes, dtype="float64"))
+
+    return np.column_stack(
+        [np.cos(lat_radians) * np.cos(lon_radians), np.cos(lat_radians) * np.sin(lon_radians), np.sin(lat_radians)]
+    )
+
+
+class OfflineGeocoder:
+    """
+    Reverse geocoding without network: address of the nearest known point
+    of gazetteer, if it is not further than max distance. Gazetteer points
+    are stored in a KD-tree, so every lookup takes O(log n)
+    """
+
+    def __init__(
+        self,
+        latitudes: Sequence[float],
+        longitudes: Sequence[float],
+        addresses: Sequence[str],
+        max_distance_km: float = 0.05,
+    ):
+        """
+        :param latitudes: Latitudes of gazetteer points
+        :param longitudes: Longitudes of gazetteer points
+        :param addresses: Addresses of gazetteer points
+        :param max_distance_km: Max great-circle distance to the nearest point
+        """
+
+        self.addresses = np.asarray(addresses, dtype=object)
+        self.max_distance_km = max_distance_km
+        self._tree = cKDTree(_unit_vectors(latitudes, longitudes))
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.addresses)
+
+    def lookup(self, latitudes: Sequence[float], longitudes: Sequence[float]) -> List[Optional[str]]:
+        """
+        Finds addresses of nearest gazetteer points for all given coordinates
+
+        :param latitudes: Latitude values
+        :param longitudes: Longitude values
+        :return: List of addresses, None for coordinates without close enough points
+        """
+
+        if len(self.addresses) == 0 or len(latitudes) == 0:
+            self.misses += len(latitudes)
+            return [None] * len(latitudes)
+
+        # Chord length of max great-circle distance on unit sphere
+        max_chord = 2 * np.sin(self.max_distance_km / EARTH_RADIUS_KM / 2)
+        distances, positions = self._tree.query(_unit_vectors(latitudes, longitudes), distance_upper_bound=max_chord)
+
+        found = np.isfinite(distances)
+        self.hits += int(found.sum())
+        self.misses += int((~found).sum())
+
+        # Missed queries get out-of-range position - replace it before taking addresses
+        nearest_addresses = self.addresses[np.where(found, positions, 0)]
+
+        return [address if is_found else None for address, is_found in zip(nearest_addresses, found)]
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        """
+        :return: Dict of lookup hits, misses and hit rate
+        """
+
+        total = self.hits + self.misses
+
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0}
+
+
+def load_offline_geocoder(path: Union[str, Path], max_distance_km: float = 0.05) -> OfflineGeocoder:
+    """
+    Builds OfflineGeocoder from a gazetteer file. Supported sources:
+        -csv file with Latitude, Longitude and Address columns
+        -SQLite geocoding cache (.sqlite, .db)
+        -joblib geocoding cache dir or zip archive of it (like data/cached_geocoding.zip)
+
+    :param path: Path to gazetteer
+    :param max_distance_km: Max great-circle distance to the nearest point
+    :return: OfflineGeocoder
+    """
+
+    path = Path(path)
+
+    if path.suffix == ".csv":
+        gazetteer = pd.read_csv(path, usecols=["Latitude", "Longitude", "Address"]).dropna()
+        latitudes, longitudes, addresses = gazetteer["Latitude"], gazetteer["Longitude"], gazetteer["Address"]
+    elif path.suffix in [".sqlite", ".db"]:
+        cache = GeocodeCache(path, precision=None)
+        latitudes, longitudes, addresses = cache.entries()
+        cache.close()
+    else:
+        # Several workers could cache one coordinate - keep the first (preferred) one
+        entries = {}
+        for coordinate, address in read_joblib_entries(path):
+            if address is not None:
+                entries.setdefault(coordinate, address)
+        latitudes = [coordinate[0] for coordinate in entries]
+        longitudes = [coordinate[1] for coordinate in entries]
+        addresses = list(entries.values())
+
+    logging.info(f"Loaded {len(addresses)} gazetteer points from {path}")
+
+    return OfflineGeocoder(latitudes, longitudes, addresses, max_distance_km)
+
+
+if __name__ == "__main__":
+    pass
@@ -3,15 +3,24 @@
 import datetime
 import json
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from multiprocessing.pool import ThreadPool
-from typing import List
+from typing import Dict, List, Optional, Sequence
 
 import pandas as pd
 import requests
 from dotenv import load_dotenv
 
+from src.api_utils.weather_cache import WeatherCache
+from src.instrumentation import API_STATS
+
 load_dotenv()
 KEY = os.getenv("WEATHER_API_KEY")
+# Can be pointed to another server (a local stub for benchmarks, for example)
+WEATHER_API_URL = os.getenv("WEATHER_API_URL", "https://api.openweathermap.org/data/2.5")
+# Max requests in flight to every endpoint
+ENDPOINT_LIMITS = {"historical": 5, "forecast": 5}
 
 
 def weather_api_worker(lat: float, lon: float) -> dict:
@@ -24,7 +33,7 @@ def weather_api_worker(lat: float, lon: float) -> dict:
     :return: Dictionary of json data
     """
 
-    resp = requests.get(f"https://api.openweathermap.org/data/2.5/onecall?lat={lat}&lon={lon}&appid={KEY}&units=metric")
+    resp = requests.get(f"{WEATHER_API_URL}/onecall?lat={lat}&lon={lon}&appid={KEY}&units=metric")
 
     return json.loads(resp.text)
 
@@ -41,10 +50,7 @@ def weather_api_historical_worker(lat: float, lon: float, utc_time: int) -> dict
     """
 
     resp = requests.get(
-        (
-            f"https://api.openweathermap.org/data/2.5/onecall/timemachine"
-            f"?lat={lat}&lon={lon}&dt={utc_time}&appid={KEY}&units=metric"
-        )
+        f"{WEATHER_API_URL}/onecall/timemachine?lat={lat}&lon={lon}&dt={utc_time}&appid={KEY}&units=metric"
     )
 
     return json.loads(resp.text)
@@ -118,6 +124,19 @@ def extract_hist_weather_data(json_resp: List[dict], latitude: float, longitude:
     return center_data_dict
 
 
+def historical_timestamps(days: int = 5) -> List[int]:
+    """
+    :param days: Number of past days
+    :return: UTC timestamps of the same time of past days, yesterday first
+    """
+
+    # Converting datetime to utc timestamp
+    current_time = datetime.datetime.now(datetime.timezone.utc)
+    dt_to_request = [current_time - datetime.timedelta(t) for t in range(1, days + 1)]
+
+    return [int(utc_time.timestamp()) for utc_time in dt_to_request]
+
+
 def get_centre_current_forecast_weather(latitude: float, longitude: float, city_name: str) -> pd.DataFrame:
     """
     Gathers weather information for given city coordinates from openweathermap.org API
@@ -148,11 +167,7 @@ def get_centre_historical_weather(latitude: float, longitude: float, city_name:
     :return: List of dicts, containing response information
     """
 
-    # Time values preparation
-    # Converting datetime to utc timestamp
-    current_time = datetime.datetime.now(datetime.timezone.utc)
-    dt_to_request = [current_time - datetime.timedelta(t) for t in range(1, 6)]
-    timestamps_to_request = [int(utc_time.timestamp()) for utc_time in dt_to_request]
+    timestamps_to_request = historical_timestamps()
 
     # Five requests for five days data
     threads_count = len(timestamps_to_request)
@@ -173,5 +188,71 @@ def get_centre_historical_weather(latitude: float, longitude: float, city_name:
     return pd.DataFrame.from_dict(center_weather_dict)
 
 
+def fetch_centres_weather(
+    latitudes: Sequence[float],
+    longitudes: Sequence[float],
+    cities: Sequence[str],
+    threads_count: int = 10,
+    limits: Optional[Dict[str, int]] = None,
+    cache: Optional[WeatherCache] = None,
+) -> List[pd.DataFrame]:
+    """
+    Gets historical and forecast weather of all given city centres. All
+    requests are enqueued at once into one thread pool, requests in flight
+    to every endpoint are bounded by its limit
+
+    :param latitudes: Latitudes of city centres
+    :param longitudes: Longitudes of city centres
+    :param cities: City names - markers for DataFrames
+    :param threads_count: Size of thread pool
+    :param limits: Max requests in flight per endpoint, ENDPOINT_LIMITS if not given
+    :param cache: Weather responses cache. If given, only missed or expired
+    responses are requested from API
+    :return: List of DataFrames in the same order as of get_centre_historical_weather
+    and get_centre_current_forecast_weather called for every city one by one
+    """
+
+    limits = ENDPOINT_LIMITS if limits is None else limits
+    semaphores = {endpoint: threading.BoundedSemaphore(limit) for endpoint, limit in limits.items()}
+    timestamps = historical_timestamps()
+
+    # Workers are looked up at call time, so they can be replaced (mocked)
+    def request_historical(lat: float, lon: float, utc_time: int) -> dict:
+        response = None if cache is None else cache.get("historical", lat, lon, utc_time)
+        if response is None:
+            with semaphores["historical"], API_STATS.timer("weather_historical"):
+                response = weather_api_historical_worker(lat, lon, utc_time)
+            # Error responses have no weather data - don't keep them
+            if cache is not None and "hourly" in response:
+                cache.put("historical", lat, lon, response, utc_time)
+        return response
+
+    def request_forecast(lat: float, lon: float) -> dict:
+        response = None if cache is None else cache.get("forecast", lat, lon)
+        if response is None:
+            with semaphores["forecast"], API_STATS.timer("weather_forecast"):
+                response = weather_api_worker(lat, lon)
+            if cache is not None and "daily" in response:
+                cache.put("forecast", lat, lon, response)
+        return response
+
+    with ThreadPoolExecutor(threads_count) as executor:
+        requests_by_city = [
+            (
+                [executor.submit(request_historical, lat, lon, utc_time) for utc_time in timestamps],
+                executor.submit(request_forecast, lat, lon),
+            )
+            for lat, lon in zip(latitudes, longitudes)
+        ]
+
+        weather_dfs = []
+        for lat, lon, city, (historical, forecast) in zip(latitudes, longitudes, cities, requests_by_city):
+            hist_data = [future.result() for future in historical]
+            weather_dfs.append(pd.DataFrame.from_dict(extract_hist_weather_data(hist_data, lat, lon, city)))
+            weather_dfs.append(pd.DataFrame.from_dict(extract_weather_data(forecast.result(), lat, lon, city)))
+
+    return weather_dfs
+
+
 if __name__ == "__main__":
     pass
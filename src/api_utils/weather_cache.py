@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from time import time
+from typing import Dict, Optional, Tuple, Union
+
+SECONDS_PER_DAY = 24 * 60 * 60
+# Forecast is fetched again if cached response is older than this
+DEFAULT_FORECAST_TTL = 60 * 60
+
+
+class WeatherCache:
+    """
+    Single-file SQLite cache of weather API responses, keyed by endpoint,
+    rounded coordinates and UTC day. Historical weather never changes, so
+    it is cached permanently. Forecast responses expire after TTL.
+    Counts cache hits and misses
+    """
+
+    def __init__(self, path: Union[str, Path], precision: int = 2, forecast_ttl: float = DEFAULT_FORECAST_TTL):
+        """
+        :param path: Path to SQLite database file. Created if not exists
+        :param precision: Number of decimal places to round coordinates to
+        :param forecast_ttl: Lifetime of cached forecast responses in seconds
+        """
+
+        self.path = Path(path)
+        self.precision = precision
+        self.forecast_ttl = forecast_ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(str(self.path), check_same_thread=False)
+
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(endpoint TEXT, lat INTEGER, lon INTEGER, day INTEGER, fetched_at REAL, response TEXT NOT NULL, "
+                "PRIMARY KEY (endpoint, lat, lon, day)) WITHOUT ROWID"
+            )
+
+    def key(self, endpoint: str, latitude: float, longitude: float, utc_time: int) -> Tuple[str, int, int, int]:
+        """
+        :param endpoint: "historical" or "forecast"
+        :param latitude: Latitude
+        :param longitude: Longitude
+        :param utc_time: Timestamp of requested datetime
+        :return: Cache key of response
+        """
+
+        scale = 10**self.precision
+
+        return endpoint, round(latitude * scale), round(longitude * scale), int(utc_time) // SECONDS_PER_DAY
+
+    def get(self, endpoint: str, latitude: float, longitude: float, utc_time: Optional[int] = None) -> Optional[dict]:
+        """
+        Gets cached response. Forecast is requested for current day if time is not given
+
+        :param endpoint: "historical" or "forecast"
+        :param latitude: Latitude
+        :param longitude: Longitude
+        :param utc_time: Timestamp of requested datetime
+        :return: Response or None if it is not cached or expired
+        """
+
+        now = time()
+        key = self.key(endpoint, latitude, longitude, now if utc_time is None else utc_time)
+
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT fetched_at, response FROM responses WHERE endpoint = ? AND lat = ? AND lon = ? AND day = ?",
+                key,
+            ).fetchone()
+
+            if row is None or (endpoint == "forecast" and now - row[0] > self.forecast_ttl):
+                self.misses += 1
+                return None
+
+            self.hits += 1
+
+        return json.loads(row[1])
+
+    def put(self, endpoint: str, latitude: float, longitude: float, response: dict, utc_time: Optional[int] = None):
+        """
+        Stores response. Forecast is stored for current day if time is not given
+
+        :param endpoint: "historical" or "forecast"
+        :param latitude: Latitude
+        :param longitude: Longitude
+        :param response: API response, converted to dict
+        :param utc_time: Timestamp of requested datetime
+        """
+
+        now = time()
+        key = self.key(endpoint, latitude, longitude, now if utc_time is None else utc_time)
+
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)", key + (now, json.dumps(response))
+            )
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        """
+        :return: Dict of lookup hits, misses and hit rate
+        """
+
+        total = self.hits + self.misses
+
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0}
+
+    def close(self):
+        self._connection.close()
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Union
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb() -> Optional[float]:
+    """
+    :return: Peak resident memory of current process in MB, None if not available
+    """
+
+    if resource is None:
+        return None
+
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS - bytes
+    return max_rss / 2**20 if sys.platform == "darwin" else max_rss / 2**10
+
+
+def cpu_time(children: bool = False) -> float:
+    """
+    Stages run concurrently in threads, so process time would count CPU of
+    overlapping stages. Worker threads, started by the calling one, are not counted.
+    Finished child processes are counted for the whole process, so only a stage,
+    owning a process pool, should ask for them
+
+    :param children: Add CPU time of finished child processes (process pools)
+    :return: CPU time of calling thread in seconds
+    """
+
+    if not children or resource is None:
+        return time.thread_time()
+
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    return time.thread_time() + usage.ru_utime + usage.ru_stime
+
+
+class ApiStats:
+    """
+    Thread-safe collector of API calls latency, grouped by API name
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latencies: Dict[str, List[float]] = {}
+        self._errors: Dict[str, int] = {}
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        """
+        Measures one API call. Raised exceptions are counted as errors
+
+        :param name: API name
+        """
+
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            with self._lock:
+                self._errors[name] = self._errors.get(name, 0) + 1
+            raise
+        finally:
+            latency = time.perf_counter() - start
+            with self._lock:
+                self._latencies.setdefault(name, []).append(latency)
+
+    def timed(self, name: str, worker: Callable) -> Callable:
+        """
+        :param name: API name
+        :param worker: Function calling API
+        :return: Function, measuring every call of worker
+        """
+
+        def timed_worker(*args, **kwargs):
+            with self.timer(name):
+                return worker(*args, **kwargs)
+
+        return timed_worker
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        :return: Calls count, errors count and latency percentiles in seconds of every API
+        """
+
+        # Workers report from modules importing numpy anyway, CLI startup doesn't need it
+        import numpy as np
+
+        with self._lock:
+            latencies = {name: np.array(values) for name, values in self._latencies.items()}
+            errors = dict(self._errors)
+
+        return {
+            name: {
+                "calls": len(values),
+                "errors": errors.get(name, 0),
+                "p50_s": float(np.percentile(values, 50)),
+                "p90_s": float(np.percentile(values, 90)),
+                "p99_s": float(np.percentile(values, 99)),
+                "max_s": float(values.max()),
+            }
+            for name, values in latencies.items()
+        }
+
+    def reset(self):
+        with self._lock:
+            self._latencies.clear()
+            self._errors.clear()
+
+
+# API workers of all modules report here
+API_STATS = ApiStats()
+
+
+@dataclass
+class StageStats:
+    """
+    Resources used by one pipeline stage. A stage can be entered several
+    times, its times are summed up then
+
+    :param name: Stage name
+    :param wall_s: Wall time in seconds
+    :param cpu_s: CPU time of the thread, running stage, in seconds, including child processes of its pool
+    :param peak_rss_growth_mb: Growth of peak resident memory of the process during stage,
+    zero if stage didn't exceed the peak reached before it. Memory is process-wide: if stage
+    overlapped other ones, the growth can't be attributed to it and is reported by all of them
+    :param rows: Number of rows, produced by stage
+    :param overlapped: Stage ran at the same time with another stage at least once
+    """
+
+    name: str
+    wall_s: float = 0.0
+    cpu_s: float = 0.0
+    peak_rss_growth_mb: Optional[float] = None
+    rows: Optional[int] = None
+    overlapped: bool = False
+
+    @property
+    def rows_per_s(self) -> Optional[float]:
+        """
+        :return: Throughput of stage or None if rows are not counted
+        """
+
+        if self.rows is None or self.wall_s <= 0:
+            return None
+
+        return self.rows / self.wall_s
+
+
+@dataclass
+class RunReport:
+    """
+    Collects resources used by pipeline stages, API calls latency
+    and cache statistics of one run
+    """
+
+    stages: Dict[str, StageStats] = field(default_factory=dict)
+    caches: Dict[str, Dict[str, Union[int, float]]] = field(default_factory=dict)
+    api_stats: ApiStats = field(default=API_STATS, repr=False)
+    # Stages can overlap, so run time is measured separately
+    started: float = field(default_factory=time.perf_counter, repr=False)
+    # Entries count of running stages, to mark overlapping ones
+    _running: Dict[str, int] = field(default_factory=dict, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def get_stage(self, name: str) -> StageStats:
+        if name not in self.stages:
+            self.stages[name] = StageStats(name)
+
+        return self.stages[name]
+
+    @contextmanager
+    def stage(self, name: str, rows: Optional[int] = None, children: bool = False) -> Iterator[StageStats]:
+        """
+        Measures code block as pipeline stage. Rows count can be set
+        on yielded StageStats inside the block
+
+        :param name: Stage name
+        :param rows: Number of rows, produced by stage
+        :param children: Stage runs a process pool, CPU time of child processes,
+        finished meanwhile, is counted. See cpu_time
+        """
+
+        stats = self.get_stage(name)
+        if rows is not None:
+            stats.rows = rows
+
+        with self._lock:
+            # Stages running now overlap the new one and vice versa
+            if any(running != name for running in self._running):
+                stats.overlapped = True
+                for running in self._running:
+                    self.stages[running].overlapped = True
+            self._running[name] = self._running.get(name, 0) + 1
+
+        wall_start = time.perf_counter()
+        cpu_start = cpu_time(children)
+        rss_start = peak_rss_mb()
+        try:
+            yield stats
+        finally:
+            stats.wall_s += time.perf_counter() - wall_start
+            stats.cpu_s += cpu_time(children) - cpu_start
+            if rss_start is not None:
+                stats.peak_rss_growth_mb = (stats.peak_rss_growth_mb or 0.0) + peak_rss_mb() - rss_start
+            with self._lock:
+                self._running[name] -= 1
+                if self._running[name] == 0:
+                    del self._running[name]
+
+    def timed_iter(self, name: str, iterable: Iterable) -> Iterator:
+        """
+        Measures time spent on getting items of iterable (reading, for example)
+        as pipeline stage. Rows of yielded DataFrames are counted
+
+        :param name: Stage name
+        :param iterable: Iterable to measure
+        :return: Generator of the same items
+        """
+
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name) as stats:
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                stats.rows = (stats.rows or 0) + len(item)
+            yield item
+
+    def to_dict(self) -> dict:
+        return {
+            "elapsed_s": time.perf_counter() - self.started,
+            "stages": [dict(asdict(stats), rows_per_s=stats.rows_per_s) for stats in self.stages.values()],
+            "api": self.api_stats.summary(),
+            "caches": self.caches,
+        }
+
+    def save(self, path: Union[str, Path]):
+        """
+        :param path: Path to JSON report file
+        """
+
+        Path(path).write_text(json.dumps(self.to_dict(), indent=2), encoding="utf-8")
+
+    def summary(self) -> str:
+        """
+        :return: Human-readable table of stages, API calls and caches
+        """
+
+        lines = [f"{'Stage':<16}{'Wall, s':>10}{'CPU, s':>10}{'Peak RSS +MB':>14}{'Rows':>12}{'Rows/s':>14}"]
+        for stats in self.stages.values():
+            rss = "-" if stats.peak_rss_growth_mb is None else f"{stats.peak_rss_growth_mb:.1f}"
+            if stats.overlapped:
+                rss += "*"
+            rows = "-" if stats.rows is None else str(stats.rows)
+            rows_per_s = "-" if stats.rows_per_s is None else f"{stats.rows_per_s:,.0f}"
+            lines.append(
+                f"{stats.name:<16}{stats.wall_s:>10.3f}{stats.cpu_s:>10.3f}{rss:>14}{rows:>12}{rows_per_s:>14}"
+            )
+        lines.append(f"{'elapsed':<16}{time.perf_counter() - self.started:>10.3f}")
+        if any(stats.overlapped for stats in self.stages.values()):
+            lines.append("* stage overlapped other stages, peak RSS growth of the process is shared by them")
+
+        for name, api in self.api_stats.summary().items():
+            lines.append(
+                f"API {name}: {api['calls']} calls, {api['errors']} errors, "
+                f"p50={api['p50_s'] * 1000:.1f}ms p90={api['p90_s'] * 1000:.1f}ms p99={api['p99_s'] * 1000:.1f}ms"
+            )
+        for name, cache in self.caches.items():
+            lines.append(
+                f"Cache {name}: {cache['hits']} hits, {cache['misses']} misses, hit rate {cache['hit_rate']:.1%}"
+            )
+
+        return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    pass
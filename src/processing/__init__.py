@@ -0,0 +1,4 @@
+# -*- coding: utf-8 -*-
+
+# Kept out of pre_process, so CLI lists engines without importing pandas
+CSV_ENGINES = ["pandas", "pyarrow"]
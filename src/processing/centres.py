@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+
+def calc_centre(coordinates: pd.DataFrame) -> List[float]:
+    """
+    Finds the centre of given DataFrame of coordinates.
+    Treats given coordinates as planar and calculates average
+    of them. That's why given coordinates should be from one
+    city
+
+    :param coordinates: pandas DataFrame[["Latitude", "Longitude"]], containing data for one city
+    :return: calculated centre coordinates
+    """
+
+    latitude_values = list(coordinates["Latitude"].values)
+    longitude_values = list(coordinates["Longitude"].values)
+
+    return [sum(latitude_values) / len(latitude_values), sum(longitude_values) / len(longitude_values)]
+
+
+def calc_centres(coordinates: pd.DataFrame, method: str = "planar") -> pd.DataFrame:
+    """
+    Finds centres of all cities of given DataFrame in one pass.
+    "planar" method averages coordinates like calc_centre does.
+    "spherical" method averages 3D unit vectors of coordinates and projects
+    the result back to the sphere - correct for cities near the antimeridian
+    or poles
+
+    :param coordinates: pandas DataFrame[["City", "Latitude", "Longitude"]]
+    :param method: "planar" or "spherical"
+    :return: DataFrame of Cities (in order of first appearance) and their centre coordinates
+    """
+
+    city_codes, cities = pd.factorize(coordinates["City"])
+    counts = np.bincount(city_codes, minlength=len(cities))
+
+    # bincount sums values sequentially in rows order, so planar centres are
+    # exactly the same as of calc_centre
+    def group_means(values: np.ndarray) -> np.ndarray:
+        return np.bincount(city_codes, weights=values, minlength=len(cities)) / counts
+
+    if method == "planar":
+        latitudes = group_means(coordinates["Latitude"].values)
+        longitudes = group_means(coordinates["Longitude"].values)
+    elif method == "spherical":
+        lat_radians = np.radians(coordinates["Latitude"].values.astype("float64"))
+        lon_radians = np.radians(coordinates["Longitude"].values.astype("float64"))
+        x = group_means(np.cos(lat_radians) * np.cos(lon_radians))
+        y = group_means(np.cos(lat_radians) * np.sin(lon_radians))
+        z = group_means(np.sin(lat_radians))
+        latitudes = np.degrees(np.arctan2(z, np.hypot(x, y)))
+        longitudes = np.degrees(np.arctan2(y, x))
+    else:
+        raise ValueError(f"Unknown centre calculation method: {method}")
+
+    return pd.DataFrame({"City": np.asarray(cities), "Latitude": latitudes, "Longitude": longitudes})
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+
+from dataclasses import dataclass
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass
+class CityIndex:
+    """
+    Partition of a DataFrame by City. Built once, it replaces repeated
+    df[df["City"] == city] scans with dictionary lookups
+
+    :param positions: Row positions of every city, in order of first appearance
+    :param countries: Country of every city (empty if DataFrame has no Country column)
+    """
+
+    positions: Dict[str, np.ndarray]
+    countries: Dict[str, str]
+
+    @property
+    def cities(self) -> List[str]:
+        return list(self.positions)
+
+    def rows(self, df: pd.DataFrame, city: str) -> pd.DataFrame:
+        """
+        Picks rows of given city from DataFrame, index was built for
+
+        :param df: pandas DataFrame, index was built for
+        :param city: City to pick rows of
+        :return: DataFrame slice with rows of given city
+        """
+
+        return df.iloc[self.positions[city]]
+
+
+def build_city_index(df: pd.DataFrame) -> CityIndex:
+    """
+    Builds CityIndex of given DataFrame in one pass
+
+    :param df: pandas DataFrame with City column
+    :return: CityIndex of given DataFrame
+    """
+
+    indices = df.groupby("City", sort=False, observed=True).indices
+    positions = {city: indices[city] for city in df["City"].unique()}
+
+    countries = {}
+    if "Country" in df.columns:
+        country_values = df["Country"].values
+        countries = {city: country_values[city_positions[0]] for city, city_positions in positions.items()}
+
+    return CityIndex(positions, countries)
+
+
+if __name__ == "__main__":
+    pass
@@ -1,15 +1,31 @@
 # -*- coding: utf-8 -*-
 
+import threading
+from typing import TYPE_CHECKING, Optional
+
 import pandas as pd
 
-from src.api_utils.geodata_api import collect_geo_data
-from src.api_utils.weather_api import (
-    get_centre_current_forecast_weather,
-    get_centre_historical_weather,
-)
+from src.api_utils.weather_api import fetch_centres_weather
+from src.api_utils.weather_cache import WeatherCache
+
+if TYPE_CHECKING:
+    from src.api_utils.async_geocoding import AsyncGeocoder
+    from src.api_utils.geocache import GeocodeCache
+    from src.api_utils.offline_geocoding import OfflineGeocoder
 
 
-def enrich_with_geo_data(df: pd.DataFrame, threads_count: int = 10):
+def enrich_with_geo_data(
+    df: pd.DataFrame,
+    threads_count: int = 10,
+    cache: Optional["GeocodeCache"] = None,
+    dedup_precision: Optional[int] = None,
+    geocoder: Optional["AsyncGeocoder"] = None,
+    offline: Optional["OfflineGeocoder"] = None,
+    checkpoint: Optional["GeocodeCache"] = None,
+    batch_size: int = 100,
+    retries: int = 1,
+    cancelled: Optional[threading.Event] = None,
+):
     """
     Enrich given DataFrame with geographical addresses requested from
     external API of local cache using coordinates, presented in DataFrame
@@ -17,30 +33,53 @@ def enrich_with_geo_data(df: pd.DataFrame, threads_count: int = 10):
 
     :param df: pandas DataFrame with hotels data
     :param threads_count: count of threads to request API
+    :param cache: SQLite geocoding cache, joblib cache is used if not given
+    :param dedup_precision: Number of decimal places to round coordinates to
+    before deduplication. See collect_geo_data
+    :param geocoder: Asynchronous geocoding client, threads of joblib-cached
+    worker are used if not given
+    :param offline: Local gazetteer to resolve coordinates with before cache and API
+    :param checkpoint: Addresses of an interrupted run, see collect_geo_data
+    :param batch_size: Number of results to save to cache and checkpoint at once
+    :param retries: Number of rounds of requesting failed coordinates again
+    :param cancelled: Event to stop requesting on, results got so far are saved
     """
 
+    # Geocoding providers (geopy, joblib) are loaded only when geocoding runs
+    from src.api_utils.geodata_api import collect_geo_data
+
     df_lat_lon = df[["Latitude", "Longitude"]]
-    addr_lst = collect_geo_data(df_lat_lon, threads_count=threads_count)
+    addr_lst = collect_geo_data(
+        df_lat_lon,
+        threads_count=threads_count,
+        cache=cache,
+        dedup_precision=dedup_precision,
+        geocoder=geocoder,
+        offline=offline,
+        checkpoint=checkpoint,
+        batch_size=batch_size,
+        retries=retries,
+        cancelled=cancelled,
+    )
     df["Address"] = addr_lst
 
 
-def enrich_with_weather_data(centre_df: pd.DataFrame):
+def enrich_with_weather_data(centre_df: pd.DataFrame, threads_count: int = 10, cache: Optional[WeatherCache] = None):
     """
     Enrich given centres DataFrame with weather data from external
     API. Returns new DataFrame, based on given
 
     :param centre_df: pandas DataFrame of city centres
+    :param threads_count: Size of thread pool, shared by requests of all cities
+    :param cache: Weather responses cache, all responses are requested from API if not given
     :return: Sorted centres DataFrame, enriched with weather data
     """
 
     lats = centre_df["Latitude"].values
     lons = centre_df["Longitude"].values
     cities = centre_df["City"].values
-    weather_dfs = []
 
-    for lat, lon, city in zip(lats, lons, cities):
-        weather_dfs.append(get_centre_historical_weather(lat, lon, city))
-        weather_dfs.append(get_centre_current_forecast_weather(lat, lon, city))
+    weather_dfs = fetch_centres_weather(lats, lons, cities, threads_count, cache=cache)
 
     complete_weather_df = pd.concat(weather_dfs, ignore_index=True)
     complete_weather_df = complete_weather_df.sort_values("Date", ignore_index=True)
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+import pathlib
+import shutil
+from typing import Dict, Iterable, List, Optional, Union
+from zipfile import ZipFile
+
+import numpy as np
+import pandas as pd
+
+from src.processing.city_index import CityIndex
+from src.processing.pre_process import HOTELS_COLUMNS
+
+# Both files are kept in output directory
+MANIFEST_NAME = "manifest.json"
+HOTELS_SNAPSHOT_NAME = "hotels_snapshot.pkl"
+
+
+def archive_fingerprint(path: Union[str, pathlib.Path]) -> Dict[str, int]:
+    """
+    Fingerprints every member of zip archive with CRC from its directory,
+    so nothing has to be decompressed
+
+    :param path: Path to zip file with csv files
+    :return: Dict of CRC of every archive member
+    """
+
+    with ZipFile(path) as zip_src:
+        return {info.filename: info.CRC for info in zip_src.infolist()}
+
+
+def city_fingerprints(df: pd.DataFrame, city_index: CityIndex, columns: List[str]) -> Dict[str, str]:
+    """
+    Fingerprints rows of every city - changed value, order or count
+    of rows changes fingerprint
+
+    :param df: pandas DataFrame, index was built for
+    :param city_index: CityIndex of df
+    :param columns: Columns to fingerprint
+    :return: Dict of hex digest of every city
+    """
+
+    # Hash all rows at once, then digest hashes of every city
+    row_hashes = pd.util.hash_pandas_object(df[columns], index=False).values
+
+    return {
+        city: hashlib.md5(row_hashes[positions].tobytes()).hexdigest()
+        for city, positions in city_index.positions.items()
+    }
+
+
+def hotels_fingerprints(hotels_df: pd.DataFrame, hotels_index: CityIndex) -> Dict[str, str]:
+    """
+    Fingerprints inputs of every city - cleaned hotels data before enrichment
+
+    :param hotels_df: pandas DataFrame with hotels data
+    :param hotels_index: CityIndex of hotels_df
+    :return: Dict of hex digest of every city
+    """
+
+    return city_fingerprints(hotels_df, hotels_index, HOTELS_COLUMNS)
+
+
+def weather_fingerprints(weather_df: pd.DataFrame, weather_index: CityIndex) -> Dict[str, str]:
+    """
+    :param weather_df: pandas DataFrame with weather data of city centres
+    :param weather_index: CityIndex of weather_df
+    :return: Dict of hex digest of every city
+    """
+
+    return city_fingerprints(weather_df, weather_index, list(weather_df.columns))
+
+
+def load_manifest(output_path: Union[str, pathlib.Path]) -> dict:
+    """
+    :param output_path: Output directory of previous run
+    :return: Manifest of previous run, empty dict if there is no one
+    """
+
+    manifest_path = pathlib.Path(output_path) / MANIFEST_NAME
+    if not manifest_path.exists():
+        return {}
+
+    return json.loads(manifest_path.read_text(encoding="utf-8"))
+
+
+def save_manifest(output_path: Union[str, pathlib.Path], manifest: dict):
+    """
+    Saves manifest of finished run. Written last, so interrupted run
+    leaves manifest of the previous complete one
+
+    :param output_path: Output directory
+    :param manifest: Dict with archive, options and cities fingerprints
+    """
+
+    manifest_path = pathlib.Path(output_path) / MANIFEST_NAME
+    temp_path = manifest_path.with_suffix(".tmp")
+    temp_path.write_text(json.dumps(manifest, indent=2, ensure_ascii=False), encoding="utf-8")
+    temp_path.replace(manifest_path)
+
+
+def load_hotels_snapshot(output_path: Union[str, pathlib.Path]) -> Union[pd.DataFrame, None]:
+    """
+    :param output_path: Output directory of previous run
+    :return: Enriched hotels DataFrame of previous run or None
+    """
+
+    snapshot_path = pathlib.Path(output_path) / HOTELS_SNAPSHOT_NAME
+    if not snapshot_path.exists():
+        return None
+
+    return pd.read_pickle(snapshot_path)
+
+
+def save_hotels_snapshot(output_path: Union[str, pathlib.Path], hotels_df: pd.DataFrame):
+    """
+    :param output_path: Output directory
+    :param hotels_df: Enriched hotels DataFrame
+    """
+
+    hotels_df.to_pickle(pathlib.Path(output_path) / HOTELS_SNAPSHOT_NAME)
+
+
+def reuse_addresses(
+    hotels_df: pd.DataFrame,
+    hotels_index: CityIndex,
+    previous_df: Optional[pd.DataFrame],
+    previous_index: Optional[CityIndex],
+    cities: List[str],
+) -> np.ndarray:
+    """
+    Copies addresses of given cities from previous run. Rows of unchanged
+    city are the same in the same order, so addresses are copied by position
+
+    :param hotels_df: pandas DataFrame with hotels data
+    :param hotels_index: CityIndex of hotels_df
+    :param previous_df: Enriched hotels DataFrame of previous run. Not used if cities are empty
+    :param previous_index: CityIndex of previous_df
+    :param cities: Unchanged cities
+    :return: Mask of rows with copied addresses
+    """
+
+    addresses = np.full(len(hotels_df), None, dtype=object)
+    reused = np.zeros(len(hotels_df), dtype=bool)
+
+    for city in cities:
+        positions = hotels_index.positions[city]
+        addresses[positions] = previous_df["Address"].values[previous_index.positions[city]]
+        reused[positions] = True
+
+    hotels_df["Address"] = addresses
+
+    return reused
+
+
+def remove_city_outputs(
+    output_path: Union[str, pathlib.Path], previous_countries: Dict[str, str], cities: Iterable[str]
+):
+    """
+    Removes output directories of given cities of previous run
+
+    :param output_path: Output directory
+    :param previous_countries: Country of every city of previous run
+    :param cities: Cities to remove outputs of. Cities missing in previous run are skipped
+    """
+
+    for city in cities:
+        if city in previous_countries:
+            shutil.rmtree(pathlib.Path(output_path) / previous_countries[city] / city, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    pass
@@ -1,29 +1,111 @@
 # -*- coding: utf-8 -*-
 
+import numpy as np
 import pandas as pd
 
-from src.api_utils.geodata_api import calc_centre
+from src.processing.centres import calc_centres
 
 
-def generate_centres_df(cities_df: pd.DataFrame) -> pd.DataFrame:
+def generate_centres_df(cities_df: pd.DataFrame, method: str = "planar") -> pd.DataFrame:
     """
     Generates DataFrame of city centres and their coordinates
 
     :param cities_df: pandas DataFrame of City/Hotels data
+    :param method: Centre calculation method - "planar" or "spherical".
+    See calc_centres
     :return: DataFrame of Cities and their centre coordinates
     """
 
-    data_dict = {"City": list(cities_df["City"].unique())}
-    centre_list = []
+    return calc_centres(cities_df[["City", "Latitude", "Longitude"]], method)
 
-    for city in data_dict["City"]:
-        centre_list.append(calc_centre(cities_df[cities_df["City"] == city]))
 
-    data_dict["Latitude"] = [centre[0] for centre in centre_list]
-    data_dict["Longitude"] = [centre[1] for centre in centre_list]
-    df_centres = pd.DataFrame.from_dict(data_dict)
+TOP_METRICS = [
+    "City with max temperature",
+    "City with max delta of max temp",
+    "City with min temperature",
+    "City with max delta of max and min temp",
+]
 
-    return df_centres
+
+def city_statistics(centres_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Calculates values of all TOP_METRICS for every city with one groupby.
+    Every metric has a value and a row position, the value was reached at:
+        -max temperature - max of MaxTemp
+        -delta of max temp - max minus min of MaxTemp, reached at the max of MaxTemp
+        -min temperature - min of MinTemp
+        -delta of max and min temp - max of MaxTemp minus MinTemp of one day
+    Does not modify given DataFrame
+
+    :param centres_df: pandas DataFrame with weather data for city centres
+    :return: DataFrame of metric values and row positions indexed by City
+    """
+
+    weather_df = pd.DataFrame(
+        {
+            "City": centres_df["City"].values,
+            "MaxTemp": centres_df["MaxTemp"].values,
+            "MinTemp": centres_df["MinTemp"].values,
+            "Delta": centres_df["MaxTemp"].values - centres_df["MinTemp"].values,
+        }
+    )
+
+    # idxmax/idxmin return the first row of equal values, index is positional
+    stats = weather_df.groupby("City", sort=False, observed=True).agg(
+        max_temp=("MaxTemp", "max"),
+        max_temp_row=("MaxTemp", "idxmax"),
+        min_max_temp=("MaxTemp", "min"),
+        min_temp=("MinTemp", "min"),
+        min_temp_row=("MinTemp", "idxmin"),
+        delta=("Delta", "max"),
+        delta_row=("Delta", "idxmax"),
+    )
+    stats["max_temp_delta"] = stats["max_temp"] - stats["min_max_temp"]
+
+    return stats
+
+
+def generate_rankings(centres_df: pd.DataFrame, top_n: int = 1) -> pd.DataFrame:
+    """
+    Ranks cities by every metric of TOP_METRICS. Equal values are ranked by
+    position of the row they were reached at, so ties are resolved in favour
+    of the earlier row, like idxmax does
+
+    :param centres_df: pandas DataFrame with weather data for city centres
+    :param top_n: Number of best cities of every metric
+    :return: DataFrame of Metric, Rank, City, Date and Value columns
+    """
+
+    stats = city_statistics(centres_df)
+    dates = centres_df["Date"].values
+
+    # Metric: (values column, row positions column, True if greater is better)
+    metric_columns = {
+        TOP_METRICS[0]: ("max_temp", "max_temp_row", True),
+        TOP_METRICS[1]: ("max_temp_delta", "max_temp_row", True),
+        TOP_METRICS[2]: ("min_temp", "min_temp_row", False),
+        TOP_METRICS[3]: ("delta", "delta_row", True),
+    }
+
+    rankings = []
+    for metric, (values_column, rows_column, descending) in metric_columns.items():
+        values = stats[values_column].values
+        rows = stats[rows_column].values
+        # Last key of lexsort is the primary one
+        order = np.lexsort((rows, -values if descending else values))[:top_n]
+        rankings.append(
+            pd.DataFrame(
+                {
+                    "Metric": metric,
+                    "Rank": np.arange(1, len(order) + 1),
+                    "City": np.asarray(stats.index)[order],
+                    "Date": dates[rows[order]],
+                    "Value": values[order],
+                }
+            )
+        )
+
+    return pd.concat(rankings, ignore_index=True)
 
 
 def generate_top_df(centres_df: pd.DataFrame) -> pd.DataFrame:
@@ -34,50 +116,16 @@ def generate_top_df(centres_df: pd.DataFrame) -> pd.DataFrame:
         -City with max delta of max temp
         -City with min temperature
         -City with max delta of max and min temp
+    See city_statistics for metrics definitions
 
     :param centres_df: pandas DataFrame with weather data for
     city centres
     :return: Smaller DataFrame with calculated overall statistics
     """
 
-    # max temp
-    max_temp_row = list(centres_df.iloc[centres_df["MaxTemp"].idxmax()][["City", "Date"]])
-
-    city_list = list(centres_df["City"].unique())
-    delta_dct = {}
-    for city in city_list:
-        min_ = centres_df[centres_df["City"] == city]["MaxTemp"].min()
-        max_ = centres_df[centres_df["City"] == city]["MaxTemp"].max()
-        delta = abs(max_ - min_)
-        delta_dct[delta] = city
-
-    max_delta_val = max(delta_dct.keys())
-    max_delta_city = delta_dct[max_delta_val]
-    # random data for this row to avoid nan in resulting df
-    max_delta_row = [max_delta_city, centres_df["Date"][0]]
-
-    # min temp
-    min_temp_row = list(centres_df.iloc[centres_df["MaxTemp"].idxmin()][["City", "Date"]])
-
-    # max min max delta
-    centres_df["Delta"] = centres_df["MaxTemp"] - centres_df["MinTemp"]
-    max_min_delta_row = centres_df.iloc[centres_df["MaxTemp"].idxmax()][["City", "Date"]]
-
-    # DataFrame building
-    all_rows = [max_temp_row, max_delta_row, min_temp_row, max_min_delta_row]
-    cities = [row[0] for row in all_rows]
-    dates = [row[1] for row in all_rows]
-    indexes = [
-        "City with max temperature",
-        "City with max delta of max temp",
-        "City with min temperature",
-        "City with max delta of max and min temp",
-    ]
-
-    data_dct = {"City": cities, "Date": dates}
-    result_df = pd.DataFrame(data_dct, index=indexes)
-
-    return result_df
+    top_df = generate_rankings(centres_df, top_n=1)
+
+    return pd.DataFrame({"City": top_df["City"].values, "Date": top_df["Date"].values}, index=top_df["Metric"].values)
 
 
 if __name__ == "__main__":
@@ -1,17 +1,111 @@
 # -*- coding: utf-8 -*-
 
-from typing import Iterator, List, Union
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 from zipfile import ZipFile
 
+import numpy as np
 import pandas as pd
 
+from src.processing import CSV_ENGINES
 
-def df_generator(path: str) -> Iterator:
+# Skip Id from csv
+HOTELS_COLUMNS = ["Name", "Country", "City", "Latitude", "Longitude"]
+# Few distinct values in many rows - categories store them as integer codes
+COMPACT_DTYPES = {"Country": "category", "City": "category"}
+# Reasons of dropping rows by df_cleaner in order of checking. Row gets the first failed one
+REJECT_REASONS = ["missing value", "non-numeric coordinate", "latitude out of range", "longitude out of range"]
+
+
+def arrow_table_to_df(table) -> pd.DataFrame:
+    """
+    Converts Arrow table of hotels csv file to DataFrame of the same dtypes
+    as pd.read_csv gives: coordinates are float64 if all of them are numbers
+    (object otherwise, to be coerced by df_cleaner), categories are sorted
+
+    :param table: pyarrow Table with HOTELS_COLUMNS, coordinates as strings.
+    It can't be used after conversion
+    :return: pandas DataFrame
+    """
+
+    import pyarrow as pa
+
+    for column in ["Latitude", "Longitude"]:
+        try:
+            numbers = table.column(column).cast(pa.float64())
+        except pa.ArrowInvalid:
+            continue
+        table = table.set_column(table.schema.get_field_index(column), column, numbers)
+
+    # Columns are converted one by one and buffers of table are freed on the way.
+    # Hotel names are mostly unique, hashing them to share equal string objects costs more than it saves
+    df = table.to_pandas(split_blocks=True, self_destruct=True, deduplicate_objects=False)
+    for column in df.columns:
+        if isinstance(df[column].dtype, pd.CategoricalDtype):
+            # Also shrinks int32 codes of Arrow dictionaries
+            df[column] = df[column].cat.set_categories(df[column].cat.categories.sort_values())
+
+    return df
+
+
+def read_hotels_csv(
+    file_csv: IO[bytes], chunksize: Optional[int] = None, compact: bool = True, engine: str = "pandas"
+) -> Iterator[pd.DataFrame]:
+    """
+    Reads HOTELS_COLUMNS of one csv file. pyarrow engine parses file
+    in several threads with schema fixed in advance, so types are not
+    inferred and unused columns are not converted at all
+
+    :param file_csv: Binary file object of csv file
+    :param chunksize: Max rows count of yielded DataFrames. File is read completely if not set
+    :param compact: Read Country and City as categorical columns
+    :param engine: One of CSV_ENGINES
+    :return: Generator of pandas dataframes
+    """
+
+    if engine not in CSV_ENGINES:
+        raise ValueError(f"Unknown csv engine: {engine}")
+
+    if engine == "pandas":
+        dtype = COMPACT_DTYPES if compact else None
+        if chunksize is None:
+            yield pd.read_csv(file_csv, usecols=HOTELS_COLUMNS, dtype=dtype)
+        else:
+            yield from pd.read_csv(file_csv, usecols=HOTELS_COLUMNS, dtype=dtype, chunksize=chunksize)
+        return
+
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+
+    text_type = pa.dictionary(pa.int32(), pa.string()) if compact else pa.string()
+    # Coordinates are parsed as numbers after reading: a non-numeric value would fail the whole file
+    column_types = {"Name": pa.string(), "Country": text_type, "City": text_type}
+    column_types.update({"Latitude": pa.string(), "Longitude": pa.string()})
+    convert_options = pa_csv.ConvertOptions(
+        column_types=column_types, include_columns=HOTELS_COLUMNS, strings_can_be_null=True
+    )
+
+    if chunksize is None:
+        yield arrow_table_to_df(pa_csv.read_csv(file_csv, convert_options=convert_options))
+        return
+
+    # Blocks of streaming reader are sized in bytes, so they are sliced to chunks of rows
+    for batch in pa_csv.open_csv(file_csv, convert_options=convert_options):
+        for start in range(0, batch.num_rows, chunksize):
+            yield arrow_table_to_df(pa.Table.from_batches([batch.slice(start, chunksize)]))
+
+
+def df_generator(path: str, chunksize: Optional[int] = None, compact: bool = True, engine: str = "pandas") -> Iterator:
     """
     Generator of dataframes for next steps of data processing
     Drops rows with Nan or incorrect values on the fly
 
     :param path: Path to zip file with csv files
+    :param chunksize: Max rows count of yielded DataFrames. Every csv file
+    is read completely if not set
+    :param compact: Read Country and City as categorical columns
+    :param engine: csv reader, one of CSV_ENGINES
     :return: Generator of pandas dataframes
     """
 
@@ -20,32 +114,274 @@ def df_generator(path: str) -> Iterator:
 
     for table in tables:
         with zip_src.open(table) as file_csv:
-            # Skip Id from csv
-            yield pd.read_csv(file_csv, usecols=["Name", "Country", "City", "Latitude", "Longitude"])
+            yield from read_hotels_csv(file_csv, chunksize, compact, engine)
+
+
+def read_and_clean_table(
+    path: str,
+    table: str,
+    compact: bool = True,
+    coordinates_dtype: str = "float64",
+    quarantine: bool = False,
+    engine: str = "pandas",
+) -> Tuple[Dict[str, np.ndarray], Optional[pd.DataFrame]]:
+    """
+    Reads one csv file from zip archive and cleans it with df_cleaner.
+    Opens archive by itself, so can be run in a separate process
+
+    :param path: Path to zip file with csv files
+    :param table: Name of csv file inside archive
+    :param compact: Read Country and City as categorical columns
+    :param coordinates_dtype: dtype of cleaned Latitude and Longitude
+    :param quarantine: Also return rejected rows
+    :param engine: csv reader, one of CSV_ENGINES
+    :return: Dict of cleaned column arrays - compact to pass between processes,
+    and DataFrame of rejected rows (None if not requested or there are no such rows)
+    """
 
+    rejected: Optional[List[pd.DataFrame]] = [] if quarantine else None
+    with ZipFile(path) as zip_src, zip_src.open(table) as file_csv:
+        df = df_cleaner(next(read_hotels_csv(file_csv, None, compact, engine)), coordinates_dtype, rejected)
 
-def df_cleaner(df: pd.DataFrame) -> pd.DataFrame:
+    return {column: df[column].values for column in df.columns}, rejected[0] if rejected else None
+
+
+def df_parallel_generator(
+    path: str,
+    workers: int,
+    compact: bool = True,
+    coordinates_dtype: str = "float64",
+    quarantine: Optional[List[pd.DataFrame]] = None,
+    engine: str = "pandas",
+) -> Iterator:
+    """
+    Generator of cleaned dataframes, parsed and cleaned in a process pool.
+    DataFrames are yielded in archive order, so results are the same as
+    of df_cleaner applied to df_generator output
+
+    :param path: Path to zip file with csv files
+    :param workers: Number of worker processes
+    :param compact: Read Country and City as categorical columns
+    :param coordinates_dtype: dtype of cleaned Latitude and Longitude
+    :param quarantine: List to append DataFrames of rejected rows to, see df_cleaner
+    :param engine: csv reader, one of CSV_ENGINES
+    :return: Generator of cleaned pandas dataframes
+    """
+
+    with ZipFile(path) as zip_src:
+        tables = zip_src.namelist()
+
+    with ProcessPoolExecutor(workers) as executor:
+        results = executor.map(
+            read_and_clean_table,
+            repeat(path),
+            tables,
+            repeat(compact),
+            repeat(coordinates_dtype),
+            repeat(quarantine is not None),
+            repeat(engine),
+        )
+        for columns, rejected in results:
+            if rejected is not None:
+                quarantine.append(rejected)
+            yield pd.DataFrame(columns)
+
+
+def coerce_coordinates(values: pd.Series) -> np.ndarray:
+    """
+    :param values: Latitude or Longitude column as read from csv
+    :return: Array of numbers, NaN in place of non-numeric values.
+    Columns parsed as numbers by read_csv are returned as is
+    """
+
+    if pd.api.types.is_numeric_dtype(values.dtype):
+        return values.values
+
+    return pd.to_numeric(values, errors="coerce").values
+
+
+def reject_codes(df: pd.DataFrame, latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+    """
+    Checks all rows of hotels DataFrame at once
+
+    :param df: Hotels DataFrame as read from csv
+    :param latitudes: Coerced Latitude column
+    :param longitudes: Coerced Longitude column
+    :return: int8 array of 1-based indexes of REJECT_REASONS, 0 for valid rows
+    """
+
+    missing = np.zeros(len(df), dtype=bool)
+    for column in df.columns:
+        missing |= pd.isna(df[column].values)
+    with np.errstate(invalid="ignore"):
+        not_numeric = np.isnan(latitudes) | np.isnan(longitudes)
+        bad_latitude = np.abs(latitudes) > 90.0
+        bad_longitude = np.abs(longitudes) > 180.0
+
+    # Later assignments win, so checks go in reverse order
+    codes = np.zeros(len(df), dtype="int8")
+    codes[bad_longitude] = 4
+    codes[bad_latitude] = 3
+    codes[not_numeric] = 2
+    codes[missing] = 1
+
+    return codes
+
+
+def df_cleaner(
+    df: pd.DataFrame, coordinates_dtype: str = "float64", quarantine: Optional[List[pd.DataFrame]] = None
+) -> pd.DataFrame:
     """
     Cleaner to drop invalid rows from hotels DataFrames
     Can detect wrong latitude/longitude values
-    Does not work inplace
+    Does not work inplace. All checks are combined into one mask,
+    only valid rows are copied
 
     :param df: Pandas dataframe to clear
+    :param coordinates_dtype: dtype of cleaned Latitude and Longitude.
+    float32 halves memory, but loses digits after ~5th decimal place
+    :param quarantine: List to append DataFrame of rejected rows to. Rows keep
+    their original values and get categorical Reason column (one of REJECT_REASONS)
     :return: Cleared DataFrame
     """
 
-    new_df = df.copy()
+    # Values like "abd176.2" become NaN
+    latitudes = coerce_coordinates(df["Latitude"])
+    longitudes = coerce_coordinates(df["Longitude"])
+    codes = reject_codes(df, latitudes, longitudes)
+    valid = codes == 0
 
-    # Drop rows, containing values like "abd176.2"
-    new_df.Latitude = pd.to_numeric(new_df.Latitude, errors="coerce")
-    new_df.Longitude = pd.to_numeric(new_df.Longitude, errors="coerce")
-    new_df.dropna(inplace=True)
+    if quarantine is not None and not valid.all():
+        reasons = pd.Categorical.from_codes(codes[~valid] - 1, REJECT_REASONS)
+        quarantine.append(df[~valid].assign(Reason=reasons))
 
-    # Drop invalid values of Longitude and Latitude
-    new_df.drop(new_df[(new_df.Latitude > 90.0) | (new_df.Latitude < -90.0)].index, inplace=True)
-    new_df.drop(new_df[(new_df.Longitude > 180.0) | (new_df.Longitude < -180.0)].index, inplace=True)
+    columns = {column: df[column].values[valid] for column in df.columns}
+    columns["Latitude"] = latitudes[valid]
+    columns["Longitude"] = longitudes[valid]
+    if coordinates_dtype != "float64":
+        columns["Latitude"] = columns["Latitude"].astype(coordinates_dtype)
+        columns["Longitude"] = columns["Longitude"].astype(coordinates_dtype)
 
-    return new_df
+    return pd.DataFrame(columns, index=df.index[valid])
+
+
+def save_quarantine(quarantine: List[pd.DataFrame], path: str) -> int:
+    """
+    Saves rejected rows of all DataFrames to csv file. Compression
+    is inferred from extension, e.g. rejected.csv.gz
+
+    :param quarantine: DataFrames of rejected rows, collected by df_cleaner
+    :param path: Path to csv file
+    :return: Number of saved rows
+    """
+
+    columns = HOTELS_COLUMNS + ["Reason"]
+    df_rejected = pd.concat(quarantine, ignore_index=True) if quarantine else pd.DataFrame(columns=columns)
+    df_rejected.to_csv(path, index=False)
+
+    return len(df_rejected)
+
+
+def concat_hotels(iterable: Union[List[pd.DataFrame], Iterator]) -> pd.DataFrame:
+    """
+    Concatenates DataFrames, keeping categorical columns categorical.
+    pd.concat turns categoricals with different categories into objects,
+    so categories are united (and sorted, to not depend on files order)
+    before concatenation
+
+    :param iterable: List of DataFrames or Generator/Iterator of DataFrames
+    :return: Concatenated DataFrame with reset index
+    """
+
+    frames = list(iterable)
+
+    if frames:
+        categorical_columns = [
+            column
+            for column in frames[0].columns
+            if all(isinstance(frame[column].dtype, pd.CategoricalDtype) for frame in frames)
+        ]
+        for column in categorical_columns:
+            categories = pd.Index(np.concatenate([frame[column].cat.categories for frame in frames]))
+            categories = categories.unique().sort_values()
+            frames = [frame.assign(**{column: frame[column].cat.set_categories(categories)}) for frame in frames]
+
+    return pd.concat(frames, sort=False, ignore_index=True)
+
+
+def drop_unused_categories(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Drops categories without rows from categorical columns of DataFrame.
+    Does not work inplace
+
+    :param df: pandas DataFrame
+    :return: DataFrame with only observed categories
+    """
+
+    categorical_columns = [column for column in df.columns if isinstance(df[column].dtype, pd.CategoricalDtype)]
+
+    return df.assign(**{column: df[column].cat.remove_unused_categories() for column in categorical_columns})
+
+
+def count_cities(iterable: Iterable[pd.DataFrame]) -> pd.Series:
+    """
+    Counts hotels of every city incrementally, so only one DataFrame
+    from iterable is held in memory at a time
+
+    :param iterable: List of DataFrames or Generator/Iterator of DataFrames
+    :return: pandas Series of hotels count indexed by (Country, City)
+    pairs in order of their first appearance
+    """
+
+    city_counts = pd.Series(
+        [], index=pd.MultiIndex.from_tuples([], names=["Country", "City"]), dtype="int64", name="Hotels"
+    )
+
+    for df in iterable:
+        chunk_counts = df.groupby(["Country", "City"], sort=False, observed=True).size()
+        # Categorical levels of chunks have different categories, concat would mix up their codes
+        chunk_counts.index = pd.MultiIndex.from_arrays(
+            [np.asarray(chunk_counts.index.get_level_values(level)) for level in range(2)], names=["Country", "City"]
+        )
+        city_counts = pd.concat([city_counts, chunk_counts]).groupby(level=[0, 1], sort=False, observed=True).sum()
+
+    return city_counts
+
+
+def pick_best_cities(city_counts: pd.Series) -> pd.Series:
+    """
+    For every country picks the city with the most hotels.
+    Ties are resolved in favour of the city met first in the data
+
+    :param city_counts: pandas Series of hotels count indexed by (Country, City)
+    pairs in order of their first appearance
+    :return: pandas Series of best city names indexed by Country
+    """
+
+    counts_df = city_counts.rename("Hotels").reset_index()
+    # idxmax returns the first of equal maximums - this is the tie-breaking rule
+    best_rows = counts_df.groupby("Country", sort=False, observed=True)["Hotels"].idxmax()
+    best_df = counts_df.loc[best_rows.values]
+
+    return pd.Series(np.asarray(best_df["City"]), index=np.asarray(best_df["Country"]), name="City")
+
+
+def filter_best_cities(df: pd.DataFrame, best_cities: pd.Series) -> pd.DataFrame:
+    """
+    Keeps rows of DataFrame, where city is the best one for its country
+
+    :param df: pandas DataFrame with hotels data
+    :param best_cities: pandas Series of best city names indexed by Country
+    :return: Filtered DataFrame
+    """
+
+    # Compare integer codes - cheap for both categorical and object columns
+    country_codes, countries = pd.factorize(df["Country"])
+    city_codes, cities = pd.factorize(df["City"])
+    best_city_codes = pd.Index(np.asarray(cities)).get_indexer(best_cities.reindex(np.asarray(countries)).values)
+    best_city_mask = (city_codes >= 0) & (city_codes == best_city_codes[country_codes])
+
+    return df[best_city_mask]
 
 
 def df_group_and_filter(iterable: Union[List[pd.DataFrame], Iterator]) -> pd.DataFrame:
@@ -59,28 +395,47 @@ def df_group_and_filter(iterable: Union[List[pd.DataFrame], Iterator]) -> pd.Dat
     """
 
     # Ignoring index is important. Unexpected filtering otherwise
-    df_complete = pd.concat(iterable, sort=False, ignore_index=True)
-
-    # Prepare auxiliary data
-    country_list = df_complete["Country"].unique()
-    country_city_mapping = {}
-    country_city_df = df_complete[["Country", "City"]]
-
-    # Find and map best cities to their countries
-    for country in country_list:
-        this_country_cities = country_city_df[country_city_df["Country"] == country]
-        best_city = (
-            this_country_cities.groupby("City", sort=False)["Country"].count().sort_values(ascending=False).index[0]
-        )
+    df_complete = concat_hotels(iterable)
 
-        country_city_mapping[country] = best_city
+    # Count hotels of every city in one pass, keeping order of appearance
+    best_cities = pick_best_cities(count_cities([df_complete]))
+    df_complete = filter_best_cities(df_complete, best_cities).reset_index(drop=True)
+    df_complete = drop_unused_categories(df_complete)
 
-    # Drop all, except best cities
-    for map_country, map_city in country_city_mapping.items():
-        df_complete.drop(
-            df_complete[(df_complete.Country == map_country) & (df_complete.City != map_city)].index, inplace=True
-        )
-    df_complete = df_complete.reset_index(drop=True)
+    return df_complete
+
+
+def df_stream_group_and_filter(
+    path: str,
+    chunksize: int,
+    compact: bool = True,
+    coordinates_dtype: str = "float64",
+    quarantine: Optional[List[pd.DataFrame]] = None,
+    engine: str = "pandas",
+) -> pd.DataFrame:
+    """
+    Streaming version of reading, cleaning and df_group_and_filter.
+    Archive is read twice by chunks: first pass counts hotels of every city,
+    second one keeps rows of best cities only. Memory usage is bounded by
+    one chunk and the resulting DataFrame
+
+    :param path: Path to zip file with csv files
+    :param chunksize: Max rows count of DataFrames read at once
+    :param compact: Read Country and City as categorical columns
+    :param coordinates_dtype: dtype of cleaned Latitude and Longitude
+    :param quarantine: List to append DataFrames of rejected rows to, see df_cleaner
+    :param engine: csv reader, one of CSV_ENGINES
+    :return: filtered concatenated DataFrame
+    """
+
+    city_counts = count_cities(df_cleaner(df) for df in df_generator(path, chunksize, compact, engine))
+    best_cities = pick_best_cities(city_counts)
+
+    best_chunks = (
+        filter_best_cities(df_cleaner(df, coordinates_dtype, quarantine), best_cities)
+        for df in df_generator(path, chunksize, compact, engine)
+    )
+    df_complete = drop_unused_categories(concat_hotels(best_chunks))
 
     return df_complete
 
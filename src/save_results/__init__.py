@@ -0,0 +1,4 @@
+# -*- coding: utf-8 -*-
+
+# Kept out of data_saving_utils, so CLI lists formats without importing pandas
+OUTPUT_FORMATS = ["csv", "parquet", "feather"]
@@ -1,14 +1,55 @@
 # -*- coding: utf-8 -*-
 
+import multiprocessing
+import os
 import pathlib
-from typing import Union
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Optional, Tuple, Union
 
+import numpy as np
 import pandas as pd
 
-from src.save_results.plotters import plot_max, plot_min
+from src.processing.city_index import CityIndex, build_city_index
+from src.processing.pre_process import drop_unused_categories
+from src.save_results import OUTPUT_FORMATS
 
 
-def generate_and_save_plots(centres_df: pd.DataFrame, hotels_df: pd.DataFrame, base_dir: Union[str, pathlib.Path]):
+def write_frame(df: pd.DataFrame, path: str, output_format: str = "csv"):
+    """
+    Writes DataFrame to file of given format. Parquet and Feather
+    require pyarrow
+
+    :param df: pandas DataFrame to write
+    :param path: Path to file without extension, extension is the format name
+    :param output_format: "csv", "parquet" or "feather"
+    """
+
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format: {output_format}")
+
+    if output_format == "csv":
+        df.to_csv(f"{path}.csv", index=False)
+        return
+
+    # Categories of other cities would be stored in every file otherwise
+    df = drop_unused_categories(df).reset_index(drop=True)
+    if output_format == "parquet":
+        df.to_parquet(f"{path}.parquet", index=False)
+    else:
+        df.to_feather(f"{path}.feather")
+
+
+def generate_and_save_plots(
+    centres_df: pd.DataFrame,
+    hotels_df: Optional[pd.DataFrame],
+    base_dir: Union[str, pathlib.Path],
+    hotels_index: Optional[CityIndex] = None,
+    centres_index: Optional[CityIndex] = None,
+    cities: Optional[List[str]] = None,
+    workers: int = 1,
+    style: str = "separate",
+    mp_context: Optional[str] = None,
+):
     """
     Generates plots of day minimum and day maximum temperature for every
     city centre in given DataFrame. Given directory to dump plots
@@ -17,30 +58,103 @@ def generate_and_save_plots(centres_df: pd.DataFrame, hotels_df: pd.DataFrame, b
     :param centres_df: pandas DataFrame, containing weather
     information about city centres
     :param hotels_df: pandas DataFrame, containing weather information about
-    cities, countries and hotels
+    cities, countries and hotels. Not used if hotels_index is given
     :param base_dir: path to previously created directory where created
     plots will be stored
+    :param hotels_index: CityIndex of hotels_df. Built if not given
+    :param centres_index: CityIndex of centres_df. Built if not given
+    :param cities: Cities to plot, all cities of centres_df if not given
+    :param workers: Number of processes to render plots in. Every process
+    gets only weather slice of a city
+    :param style: "separate" - min and max plots, "combined" - one plot with both
+    :param mp_context: Start method of processes ("fork", "spawn", "forkserver").
+    Default of the platform if not set. Forking is not safe while other threads run
     """
 
-    for city in centres_df["City"].unique():
-        plot_min(centres_df, hotels_df, city, base_dir)
-        plot_max(centres_df, hotels_df, city, base_dir)
+    if hotels_index is None:
+        hotels_index = build_city_index(hotels_df)
+    if centres_index is None:
+        centres_index = build_city_index(centres_df)
+    if cities is None:
+        cities = centres_index.cities
+    if len(cities) == 0:
+        return
 
+    # matplotlib is loaded only when there is something to plot
+    from src.save_results.plotters import PLOT_COLUMNS, plot_city
 
-def initialise_dir_structure(basedir: Union[str, pathlib.Path], hotels_df: pd.DataFrame):
+    # Every city is sliced once, both plots are drawn from the slice
+    city_slices = (
+        (centres_index.rows(centres_df, city)[PLOT_COLUMNS], city, hotels_index.countries[city]) for city in cities
+    )
+
+    if workers <= 1:
+        for city_centre_df, city, country in city_slices:
+            plot_city(city_centre_df, city, country, base_dir, style)
+        return
+
+    context = multiprocessing.get_context(mp_context)
+    with ProcessPoolExecutor(workers, mp_context=context) as executor:
+        futures = [
+            executor.submit(plot_city, city_centre_df, city, country, base_dir, style)
+            for city_centre_df, city, country in city_slices
+        ]
+        # Raise errors of workers
+        for future in futures:
+            future.result()
+
+
+def save_small_multiples(
+    centres_df: pd.DataFrame,
+    base_dir: Union[str, pathlib.Path],
+    centres_index: Optional[CityIndex] = None,
+    cities_per_sheet: int = 25,
+):
+    """
+    Saves min and max temperature of all cities as sheets of small plots
+    to base dir: temperatures_sheet_001.png, temperatures_sheet_002.png, ...
+
+    :param centres_df: pandas DataFrame, containing weather
+    information about city centres
+    :param base_dir: Directory to store all collected data
+    :param centres_index: CityIndex of centres_df. Built if not given
+    :param cities_per_sheet: Max number of cities on one sheet
+    """
+
+    from src.save_results.plotters import plot_small_multiples
+
+    if centres_index is None:
+        centres_index = build_city_index(centres_df)
+
+    cities = centres_index.cities
+    sheets = [cities[start:][:cities_per_sheet] for start in range(0, len(cities), cities_per_sheet)]
+    for sheet_num, sheet_cities in enumerate(sheets, start=1):
+        plot_small_multiples(
+            [centres_index.rows(centres_df, city) for city in sheet_cities],
+            sheet_cities,
+            f"{str(base_dir)}/temperatures_sheet_{sheet_num:03}.png",
+        )
+
+
+def initialise_dir_structure(
+    basedir: Union[str, pathlib.Path], hotels_df: Optional[pd.DataFrame], hotels_index: Optional[CityIndex] = None
+):
     """
     Initialises dir structure for collected data about hotels and
     city centers
 
     :param basedir: Directory to store all collected data
     :param hotels_df: DataFrame with info about cities, countries
-    and hotels
+    and hotels. Not used if hotels_index is given
+    :param hotels_index: CityIndex of hotels_df. Built if not given
     """
 
-    countries_list = list(hotels_df["Country"].unique())
+    if hotels_index is None:
+        hotels_index = build_city_index(hotels_df)
+
     countries_and_cities = {}
-    for country in countries_list:
-        countries_and_cities[country] = list(hotels_df[hotels_df["Country"] == country]["City"].unique())
+    for city, country in hotels_index.countries.items():
+        countries_and_cities.setdefault(country, []).append(city)
 
     countries_and_cities_paths = []
     for country, city_list in countries_and_cities.items():
@@ -52,56 +166,154 @@ def initialise_dir_structure(basedir: Union[str, pathlib.Path], hotels_df: pd.Da
         path.mkdir(parents=True, exist_ok=True)
 
 
-def slice_and_save_city_hotels_data(basedir: Union[str, pathlib.Path], hotels_df: pd.DataFrame, city: str):
+def hotels_file_chunks(
+    hotels_index: CityIndex, cities: List[str], rows_per_file: int = 100
+) -> Tuple[np.ndarray, List[Tuple[str, int, int, int]]]:
     """
-    Save hotels information for given City from hotels DataFrame to csv
-    files with max length of 100
+    Partitions hotels of given cities into files of max rows_per_file rows
+
+    :param hotels_index: CityIndex of hotels DataFrame
+    :param cities: Cities to partition
+    :param rows_per_file: Max rows count of one file
+    :return: Row positions of all cities, grouped by city, and list of
+    (city, file number, start, stop) chunks of these positions
+    """
+
+    city_positions = [hotels_index.positions[city] for city in cities]
+    sizes = np.array([len(positions) for positions in city_positions], dtype="int64")
+    city_starts = np.concatenate([[0], np.cumsum(sizes)[:-1]]) if len(sizes) else sizes
+
+    chunks = []
+    for city, city_start, size in zip(cities, city_starts.tolist(), sizes.tolist()):
+        file_starts = range(city_start, city_start + size, rows_per_file)
+        chunks += [
+            (city, file_num, start, min(start + rows_per_file, city_start + size))
+            for file_num, start in enumerate(file_starts, start=1)
+        ]
+
+    positions = np.concatenate(city_positions) if city_positions else np.array([], dtype="int64")
+
+    return positions, chunks
+
+
+def save_hotels_data(
+    basedir: Union[str, pathlib.Path],
+    hotels_df: pd.DataFrame,
+    hotels_index: Optional[CityIndex] = None,
+    cities: Optional[List[str]] = None,
+    rows_per_file: int = 100,
+    threads_count: int = 1,
+    output_format: str = "csv",
+):
+    """
+    Saves hotels information of all given cities to csv files with max
+    length of rows_per_file. Rows of all cities are gathered with one take
+    and converted to csv text at once, then the text is split into files
 
     :param basedir: Directory to store all collected data
     :param hotels_df: DataFrame with info about cities, countries
     and hotels
-    :param city: City from hotels_df (Capitalized)
+    :param hotels_index: CityIndex of hotels_df. Built if not given
+    :param cities: Cities to save, all cities of hotels_df if not given
+    :param rows_per_file: Max rows count of one file
+    :param threads_count: Number of threads to write files with
+    :param output_format: "csv" - files of rows_per_file rows, "parquet" or
+    "feather" - one <city>_hotels file per city
     """
 
-    # Pick city data from df
-    hotels_df = hotels_df[hotels_df["City"] == city]
-    country = hotels_df["Country"].unique()[0]
-    df_len = len(hotels_df)
+    if hotels_index is None:
+        hotels_index = build_city_index(hotels_df)
+    if cities is None:
+        cities = hotels_index.cities
+
+    if output_format != "csv":
+
+        def write_city(city: str):
+            path = f"{str(basedir)}/{hotels_index.countries[city]}/{city}/hotels/{city.lower()}_hotels"
+            write_frame(hotels_index.rows(hotels_df, city), path, output_format)
 
-    # Generate list of df slices starts and stops
-    if df_len > 99:
-        slice_lst = list(zip(list(range(0, df_len, 99)), range(99, df_len, 99)))
-        slice_lst = slice_lst + [(slice_lst[-1][1], df_len)]
+        if threads_count <= 1:
+            for city in cities:
+                write_city(city)
+        else:
+            with ThreadPoolExecutor(threads_count) as executor:
+                list(executor.map(write_city, cities))
+        return
+
+    positions, chunks = hotels_file_chunks(hotels_index, cities, rows_per_file)
+    cities_df = hotels_df.iloc[positions]
+
+    header = cities_df.head(0).to_csv(index=False)
+    lines = cities_df.to_csv(index=False, header=False).split(os.linesep)[:-1]
+    # Quoted values with line breaks take several lines - convert such chunks one by one
+    bulk = len(lines) == len(cities_df)
+
+    def write_chunk(chunk: Tuple[str, int, int, int]):
+        city, file_num, start, stop = chunk
+        path = f"{str(basedir)}/{hotels_index.countries[city]}/{city}/hotels/{city.lower()}_hotels_{file_num:03}.csv"
+        if not bulk:
+            cities_df.iloc[start:stop].to_csv(path, index=False, encoding="utf-8")
+            return
+        with open(path, "w", encoding="utf-8", newline="") as file_csv:
+            file_csv.write(header + os.linesep.join(lines[start:stop]) + os.linesep)
+
+    if threads_count <= 1:
+        for chunk in chunks:
+            write_chunk(chunk)
     else:
-        slice_lst = [(0, df_len)]
-
-    # Generate files
-    file_num = 1
-    for start, stop in slice_lst:
-        file_name = f"{city.lower()}_hotels_{file_num:03}.csv"
-        hotels_df.iloc[start:stop].to_csv(
-            f"{str(basedir)}/{country}/{city}/hotels/{file_name}", index=False, encoding="utf-8"
-        )
-        file_num += 1
+        with ThreadPoolExecutor(threads_count) as executor:
+            list(executor.map(write_chunk, chunks))
 
 
-def save_centre_data(basedir: Union[str, pathlib.Path], centres_df: pd.DataFrame, hotels_df: pd.DataFrame, city: str):
+def slice_and_save_city_hotels_data(
+    basedir: Union[str, pathlib.Path], hotels_df: pd.DataFrame, city: str, hotels_index: Optional[CityIndex] = None
+):
     """
-    Save centres information for given City from centres/weather DataFrame to csv
+    Save hotels information for given City from hotels DataFrame to csv
     files with max length of 100
 
+    :param basedir: Directory to store all collected data
+    :param hotels_df: DataFrame with info about cities, countries
+    and hotels
+    :param city: City from hotels_df (Capitalized)
+    :param hotels_index: CityIndex of hotels_df. Built if not given
+    """
+
+    save_hotels_data(basedir, hotels_df, hotels_index, [city])
+
+
+def save_centre_data(
+    basedir: Union[str, pathlib.Path],
+    centres_df: pd.DataFrame,
+    hotels_df: Optional[pd.DataFrame],
+    city: str,
+    hotels_index: Optional[CityIndex] = None,
+    centres_index: Optional[CityIndex] = None,
+    output_format: str = "csv",
+):
+    """
+    Save centres information for given City from centres/weather DataFrame to
+    center_weather_info file of given format
+
     :param basedir: Directory to store all collected data
     :param centres_df: DataFrame with info about cities centres weather
      data
     :param hotels_df: DataFrame with info about cities, countries
-     and hotels
+     and hotels. Not used if hotels_index is given
     :param city: City from hotels_df (Capitalized)
+    :param hotels_index: CityIndex of hotels_df. Built if not given
+    :param centres_index: CityIndex of centres_df. Built if not given
+    :param output_format: "csv", "parquet" or "feather"
     """
 
-    hotels_df = hotels_df[hotels_df["City"] == city]
-    country = hotels_df["Country"].unique()[0]
-    centres_df[centres_df["City"] == city].to_csv(
-        f"{str(basedir)}/{country}/{city}/center_weather_info.csv", index=False
+    if hotels_index is None:
+        hotels_index = build_city_index(hotels_df)
+    if centres_index is None:
+        centres_index = build_city_index(centres_df)
+
+    country = hotels_index.countries[city]
+    write_frame(
+        centres_index.rows(centres_df, city), f"{str(basedir)}/{country}/{city}/center_weather_info", output_format
     )
 
 
@@ -122,5 +334,16 @@ def save_general_statistics(basedir: Union[str, pathlib.Path], statistics_df: pd
     statistics_df.to_csv(f"{str(basedir)}/general_statistics.csv", encoding="utf-8")
 
 
+def save_rankings(basedir: Union[str, pathlib.Path], rankings_df: pd.DataFrame):
+    """
+    Saves top-N cities of every general statistics metric to csv file in base dir
+
+    :param basedir: Directory to store all collected data
+    :param rankings_df: DataFrame of Metric, Rank, City, Date and Value columns
+    """
+
+    rankings_df.to_csv(f"{str(basedir)}/rankings.csv", index=False, encoding="utf-8")
+
+
 if __name__ == "__main__":
     pass
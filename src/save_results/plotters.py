@@ -1,12 +1,194 @@
 # -*- coding: utf-8 -*-
 import pathlib
-from typing import Union
+from typing import Dict, Optional, Sequence, Union
 
-import matplotlib.pyplot as plt
 import pandas as pd
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 
+from src.processing.city_index import CityIndex, build_city_index
 
-def plot_min(centres_df: pd.DataFrame, hotels_df: pd.DataFrame, city: str, base_dir: Union[str, pathlib.Path]):
+# Only these columns of city weather are needed for plots
+PLOT_COLUMNS = ["Date", "MinTemp", "MaxTemp"]
+PLOT_STYLES = ["separate", "combined"]
+
+
+class TemperaturePlot:
+    """
+    Reusable figure template. Figure, axes, labels and grid are built once
+    with Figure API on Agg canvas, every render only swaps line data, title
+    and limits. Not thread-safe: use one template per thread or process
+    """
+
+    def __init__(self, colors: Sequence[str] = ("green",), labels: Optional[Sequence[str]] = None):
+        """
+        :param colors: Colors of lines, one line per color
+        :param labels: Legend labels of lines. No legend if not given
+        """
+
+        self.figure = Figure()
+        FigureCanvasAgg(self.figure)
+        self.axes = self.figure.subplots()
+        self.axes.set_xlabel("Date")
+        self.axes.set_ylabel("Temperature, Celsius")
+        self.axes.grid()
+        self.lines = [self.axes.plot([], [], linewidth=2, color=color)[0] for color in colors]
+        if labels is not None:
+            for line, label in zip(self.lines, labels):
+                line.set_label(label)
+            self.axes.legend()
+
+    def render(
+        self, dates_vector: pd.Series, temps_vectors: Sequence[pd.Series], title: str, path: Union[str, pathlib.Path]
+    ):
+        """
+        Renders temperature lines to png file
+
+        :param dates_vector: Dates of temperature values
+        :param temps_vectors: Temperature values of every line
+        :param title: Title of plot
+        :param path: Path to png file
+        """
+
+        # Dates converter is picked by the first data, template lines are created empty
+        self.axes.xaxis.update_units(list(dates_vector))
+        for line, temps_vector in zip(self.lines, temps_vectors):
+            line.set_data(list(dates_vector), list(temps_vector))
+
+        top = max(max(temps_vector) for temps_vector in temps_vectors)
+        bottom = min(min(temps_vector) for temps_vector in temps_vectors)
+        delta = (top - bottom) // 2  # for plots prettifying
+
+        self.axes.set_title(title)
+        self.axes.relim()
+        self.axes.autoscale_view()
+        self.axes.set_ylim(top=top + delta)
+        self.axes.set_ylim(bottom=bottom - delta)
+        for label in self.axes.get_xticklabels():
+            label.set_rotation(90)
+        self.figure.savefig(str(path))
+
+
+# Templates of current process, built on first use
+_templates: Dict[str, TemperaturePlot] = {}
+
+
+def get_template(style: str) -> TemperaturePlot:
+    """
+    :param style: "separate" - one line, "combined" - min and max lines with legend
+    :return: Template of current process for given style
+    """
+
+    if style not in _templates:
+        if style == "separate":
+            _templates[style] = TemperaturePlot()
+        elif style == "combined":
+            _templates[style] = TemperaturePlot(("tab:blue", "tab:red"), ("Min", "Max"))
+        else:
+            raise ValueError(f"Unknown plot style: {style}")
+
+    return _templates[style]
+
+
+def plot_temperatures(dates_vector: pd.Series, temps_vector: pd.Series, title: str, path: Union[str, pathlib.Path]):
+    """
+    Renders temperature plot to png file with "separate" template
+
+    :param dates_vector: Dates of temperature values
+    :param temps_vector: Temperature values
+    :param title: Title of plot
+    :param path: Path to png file
+    """
+
+    get_template("separate").render(dates_vector, [temps_vector], title, path)
+
+
+def plot_city(
+    city_centre_df: pd.DataFrame,
+    city: str,
+    country: str,
+    base_dir: Union[str, pathlib.Path],
+    style: str = "separate",
+):
+    """
+    Plots day minimum and day maximum temperature of one city. Gets only
+    weather slice of the city, so it is cheap to pass to another process
+
+    :param city_centre_df: pandas DataFrame with PLOT_COLUMNS of one city centre
+    :param city: City name (Capitalized)
+    :param country: Country of city
+    :param base_dir: path to previously created directory where created
+    plots will be stored
+    :param style: "separate" - min and max plots, "combined" - one plot with both
+    """
+
+    plots_dir = f"{str(base_dir)}/{country}/{city}/plots"
+    dates_vector = city_centre_df["Date"]
+
+    if style == "combined":
+        get_template(style).render(
+            dates_vector,
+            [city_centre_df["MinTemp"], city_centre_df["MaxTemp"]],
+            f"Min and max temperatures in centre of {city}",
+            f"{plots_dir}/{city.lower()}_temperatures.png",
+        )
+        return
+
+    plot_temperatures(
+        dates_vector,
+        city_centre_df["MinTemp"],
+        f"Min temperatures in centre of {city}",
+        f"{plots_dir}/{city.lower()}_min_temperatures.png",
+    )
+    plot_temperatures(
+        dates_vector,
+        city_centre_df["MaxTemp"],
+        f"Max temperatures in centre of {city}",
+        f"{plots_dir}/{city.lower()}_max_temperatures.png",
+    )
+
+
+def plot_small_multiples(
+    city_centre_dfs: Sequence[pd.DataFrame], cities: Sequence[str], path: Union[str, pathlib.Path], columns: int = 5
+):
+    """
+    Plots min and max temperature of several cities on one sheet, one small plot per city
+
+    :param city_centre_dfs: pandas DataFrames with PLOT_COLUMNS of every city centre
+    :param cities: City names
+    :param path: Path to png file
+    :param columns: Number of plots in a row
+    """
+
+    rows = max(1, -(-len(cities) // columns))
+    figure = Figure(figsize=(3 * columns, 2.5 * rows))
+    FigureCanvasAgg(figure)
+    axes_grid = figure.subplots(rows, columns, squeeze=False)
+
+    for axes, city_centre_df, city in zip(axes_grid.flat, city_centre_dfs, cities):
+        axes.plot(list(city_centre_df["Date"]), list(city_centre_df["MinTemp"]), linewidth=1, color="tab:blue")
+        axes.plot(list(city_centre_df["Date"]), list(city_centre_df["MaxTemp"]), linewidth=1, color="tab:red")
+        axes.set_title(city, fontsize=9)
+        axes.grid()
+        axes.tick_params(labelsize=6)
+        axes.tick_params(axis="x", labelrotation=90)
+
+    # Hide empty cells of the last row
+    for position in range(len(cities), rows * columns):
+        axes_grid.flat[position].set_visible(False)
+
+    figure.tight_layout()
+    figure.savefig(str(path))
+
+
+def plot_min(
+    centres_df: pd.DataFrame,
+    hotels_df: pd.DataFrame,
+    city: str,
+    base_dir: Union[str, pathlib.Path],
+    hotels_index: Optional[CityIndex] = None,
+    centres_index: Optional[CityIndex] = None,
+):
     """
     Plots information about day minimum temperature of
     given city
@@ -16,27 +198,34 @@ def plot_min(centres_df: pd.DataFrame, hotels_df: pd.DataFrame, city: str, base_
     cities, countries and hotels
     information about city centres
     :param city: City from hotels_df to plot (Capitalized)
+    :param hotels_index: CityIndex of hotels_df. Built if not given
+    :param centres_index: CityIndex of centres_df. Built if not given
     """
 
+    if hotels_index is None:
+        hotels_index = build_city_index(hotels_df)
+    if centres_index is None:
+        centres_index = build_city_index(centres_df)
+
     city_name = city
-    country = hotels_df[hotels_df["City"] == city]["Country"].unique()[0]
-    dates_vector = centres_df[centres_df["City"] == city]["Date"]
-    temps_vector = centres_df[centres_df["City"] == city]["MinTemp"]
-    delta = (max(temps_vector) - min(temps_vector)) // 2  # for plots prettifying
-
-    plt.plot(dates_vector, temps_vector, linewidth=2, color="green")
-    plt.xlabel("Date")
-    plt.ylabel("Temperature, Celsius")
-    plt.title(f"Min temperatures in centre of {city}")
-    plt.grid()
-    plt.ylim(top=max(temps_vector) + delta)
-    plt.ylim(bottom=min(temps_vector) - delta)
-    plt.xticks(rotation=90)
-    plt.savefig(str(base_dir) + f"/{country}/{city_name}/plots/{city_name.lower()}_min_temperatures.png")
-    plt.close()
-
-
-def plot_max(centres_df: pd.DataFrame, hotels_df: pd.DataFrame, city: str, base_dir: Union[str, pathlib.Path]):
+    country = hotels_index.countries[city]
+    city_centre_df = centres_index.rows(centres_df, city)
+    plot_temperatures(
+        city_centre_df["Date"],
+        city_centre_df["MinTemp"],
+        f"Min temperatures in centre of {city}",
+        str(base_dir) + f"/{country}/{city_name}/plots/{city_name.lower()}_min_temperatures.png",
+    )
+
+
+def plot_max(
+    centres_df: pd.DataFrame,
+    hotels_df: pd.DataFrame,
+    city: str,
+    base_dir: Union[str, pathlib.Path],
+    hotels_index: Optional[CityIndex] = None,
+    centres_index: Optional[CityIndex] = None,
+):
     """
     Plots information about day maximum temperature of
     given city
@@ -46,24 +235,24 @@ def plot_max(centres_df: pd.DataFrame, hotels_df: pd.DataFrame, city: str, base_
     :param hotels_df: pandas DataFrame, containing weather information about
     cities, countries and hotels
     :param city: City from hotels_df to plot (Capitalized)
+    :param hotels_index: CityIndex of hotels_df. Built if not given
+    :param centres_index: CityIndex of centres_df. Built if not given
     """
 
+    if hotels_index is None:
+        hotels_index = build_city_index(hotels_df)
+    if centres_index is None:
+        centres_index = build_city_index(centres_df)
+
     city_name = city
-    country = hotels_df[hotels_df["City"] == city]["Country"].unique()[0]
-    dates_vector = centres_df[centres_df["City"] == city]["Date"]
-    temps_vector = centres_df[centres_df["City"] == city]["MaxTemp"]
-    delta = (max(temps_vector) - min(temps_vector)) // 2  # for plots prettifying
-
-    plt.plot(dates_vector, temps_vector, linewidth=2, color="green")
-    plt.xlabel("Date")
-    plt.ylabel("Temperature, Celsius")
-    plt.title(f"Max temperatures in centre of {city}")
-    plt.grid()
-    plt.ylim(top=max(temps_vector) + delta)
-    plt.ylim(bottom=min(temps_vector) - delta)
-    plt.xticks(rotation=90)
-    plt.savefig(str(base_dir) + f"/{country}/{city_name}/plots/{city_name.lower()}_max_temperatures.png")
-    plt.close()
+    country = hotels_index.countries[city]
+    city_centre_df = centres_index.rows(centres_df, city)
+    plot_temperatures(
+        city_centre_df["Date"],
+        city_centre_df["MaxTemp"],
+        f"Max temperatures in centre of {city}",
+        str(base_dir) + f"/{country}/{city_name}/plots/{city_name.lower()}_max_temperatures.png",
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+
+class StageScheduler:
+    """
+    Runs pipeline stages as a dependency graph in a thread pool. Every stage
+    starts as soon as all stages it depends on are finished, so independent
+    (I/O-bound) stages overlap and total time is close to the longest chain.
+    Stage function gets results of its dependencies as keyword arguments,
+    named after them. Long stages can check cancelled event to stop early
+    when another stage failed or the run is interrupted
+    """
+
+    def __init__(self, max_workers: Optional[int] = None):
+        """
+        :param max_workers: Max stages running at once. One thread per stage if not set,
+        1 runs stages one by one
+        """
+
+        self.max_workers = max_workers
+        self.cancelled = threading.Event()
+        self._stages: Dict[str, Tuple[Callable[..., Any], Tuple[str, ...]]] = {}
+
+    def add(self, name: str, func: Callable[..., Any], deps: Iterable[str] = ()):
+        """
+        Adds stage. Dependencies have to be added before, so graph can't have cycles
+
+        :param name: Stage name, a valid Python identifier
+        :param func: Stage function, called with results of dependencies as keyword arguments
+        :param deps: Names of stages to wait for
+        """
+
+        deps = tuple(deps)
+        if name in self._stages:
+            raise ValueError(f"Stage {name} is already added")
+        unknown = [dep for dep in deps if dep not in self._stages]
+        if unknown:
+            raise ValueError(f"Stage {name} depends on unknown stages: {unknown}")
+
+        self._stages[name] = (func, deps)
+
+    def run(self) -> Dict[str, Any]:
+        """
+        Runs all stages. If a stage fails or the run is interrupted (KeyboardInterrupt),
+        stages not started yet are skipped, cancelled event is set and the error
+        is raised after running stages are finished
+
+        :return: Dict of results of every stage
+        """
+
+        results: Dict[str, Any] = {}
+        pending = dict(self._stages)
+        running: Dict[Future, str] = {}
+
+        with ThreadPoolExecutor(self.max_workers or max(len(pending), 1)) as executor:
+
+            def submit_ready():
+                for name, (func, deps) in list(pending.items()):
+                    if all(dep in results for dep in deps):
+                        del pending[name]
+                        running[executor.submit(func, **{dep: results[dep] for dep in deps})] = name
+
+            try:
+                submit_ready()
+                while running:
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    # Keep order of adding for stages finished at once
+                    for future in sorted(done, key=lambda future: list(self._stages).index(running[future])):
+                        results[running.pop(future)] = future.result()
+                    submit_ready()
+            except BaseException:
+                # Queued stages are not started, running ones are asked to stop and waited for on exit
+                self.cancelled.set()
+                for queued in running:
+                    queued.cancel()
+                raise
+
+        return results
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import monotonic
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from src.api_utils.async_geocoding import (
+    AsyncGeocoder,
+    NominatimProvider,
+    PositionstackProvider,
+    TokenBucket,
+)
+
+
+@pytest.fixture()
+def stub_server():
+    """
+    Local HTTP server, imitating positionstack and Nominatim reverse geocoding.
+    First request of coordinate "0,0" fails to check retries
+    """
+
+    requests_log = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = {key: values[0] for key, values in parse_qs(url.query).items()}
+            requests_log.append((url.path, query))
+
+            if url.path == "/v1/reverse":
+                coordinate = query["query"]
+                if coordinate == "0,0" and len([log for log in requests_log if log[1].get("query") == "0,0"]) == 1:
+                    self.send_response(500)
+                    self.end_headers()
+                    return
+                payload = {"data": [{"name": f"Hotel at {coordinate}", "country": "Nowhere", "label": None}]}
+            else:
+                payload = {"display_name": f"Place at {query['lat']},{query['lon']}"}
+
+            body = json.dumps(payload).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}", requests_log
+    server.shutdown()
+    server.server_close()
+
+
+def test_async_geocoder_positionstack(stub_server):
+    base_url, requests_log = stub_server
+    provider = PositionstackProvider(url=base_url + "/v1/reverse", key="test", rate=1000)
+    geocoder = AsyncGeocoder(provider, concurrency=4, backoff=0.01)
+
+    addresses = geocoder.geocode(["52.3375677,4.8178172", "0,0", "41.846704,-87.953952"])
+
+    assert addresses == [
+        "Hotel at 52.3375677,4.8178172, Nowhere",
+        "Hotel at 0,0, Nowhere",
+        "Hotel at 41.846704,-87.953952, Nowhere",
+    ]
+    assert len(requests_log) == 4  # one retry
+
+
+def test_async_geocoder_nominatim(stub_server):
+    base_url, requests_log = stub_server
+    geocoder = AsyncGeocoder(NominatimProvider(url=base_url + "/reverse", rate=1000))
+
+    assert geocoder.geocode(["52.3375677, 4.8178172"]) == ["Place at 52.3375677,4.8178172"]
+    assert requests_log[0][1]["accept-language"] == "en"
+
+
+def test_async_geocoder_gives_up():
+    provider = PositionstackProvider(url="http://127.0.0.1:9/unreachable", key="test", rate=1000)
+    geocoder = AsyncGeocoder(provider, max_retries=1, backoff=0.01, timeout=1)
+
+    assert geocoder.geocode(["52.3375677,4.8178172"]) == [None]
+
+
+def test_async_geocoder_reports_results(stub_server):
+    base_url, _ = stub_server
+    provider = PositionstackProvider(url=base_url + "/v1/reverse", key="test", rate=1000)
+    geocoder = AsyncGeocoder(provider, concurrency=4, backoff=0.01)
+    provider.parse = lambda info: info["data"][0]["missing field"] if "0,0" in info["data"][0]["name"] else "Address"
+    results = []
+
+    addresses = geocoder.geocode(["52.3375677,4.8178172", "0,0"], lambda *result: results.append(result))
+
+    results.sort(key=lambda result: result[0])
+
+    assert addresses == ["Address", None]
+    assert results[0] == (0, "Address", None)
+    # Unexpected error of one coordinate doesn't fail the others
+    assert isinstance(results[1][2], KeyError)
+
+
+def test_token_bucket_rate():
+    async def acquire_many():
+        bucket = TokenBucket(rate=50)
+        for _ in range(6):
+            await bucket.acquire()
+
+    start = monotonic()
+    asyncio.run(acquire_many())
+
+    assert monotonic() - start >= 5 / 50 * 0.9
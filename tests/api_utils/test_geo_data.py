@@ -2,7 +2,16 @@
 
 from unittest.mock import patch
 
-from src.api_utils.geodata_api import calc_centre, collect_geo_data
+import pandas as pd
+import pytest
+
+from src.api_utils.geocache import GeocodeCache
+from src.api_utils.geodata_api import (
+    calc_centre,
+    calc_centres,
+    collect_geo_data,
+    unique_coordinates,
+)
 from src.processing.pre_process import df_cleaner, df_generator, df_group_and_filter
 
 
@@ -27,3 +36,91 @@ def test_calc_centre(get_path):
     centroid = calc_centre(df_full[df_full["City"] == "Amsterdam"])
 
     assert centroid == [52.3375677, 4.8178172]
+
+
+def test_calc_centres_planar_matches_calc_centre(get_path):
+    data_frames_gen = df_generator(get_path + "/tests/test_data/hotels_test_data.zip")
+    df_full = df_group_and_filter([df_cleaner(df) for df in data_frames_gen])
+
+    centres = calc_centres(df_full[["City", "Latitude", "Longitude"]])
+
+    assert list(centres["City"]) == ["Oak Brook", "Amsterdam"]
+    assert list(centres.iloc[1][["Latitude", "Longitude"]]) == [52.3375677, 4.8178172]
+
+
+def test_calc_centres_spherical_antimeridian():
+    coordinates = pd.DataFrame({"City": ["Suva", "Suva"], "Latitude": [-18.0, -18.0], "Longitude": [179.0, -179.0]})
+
+    planar = calc_centres(coordinates, "planar")
+    spherical = calc_centres(coordinates, "spherical")
+
+    assert planar["Longitude"][0] == 0.0
+    assert abs(spherical["Longitude"][0]) == pytest.approx(180.0)
+    assert spherical["Latitude"][0] == pytest.approx(-18.0, abs=0.01)
+
+
+def test_collect_geo_data_deduplicates_coordinates(get_path):
+    data_frames_gen = df_generator(get_path + "/tests/test_data/hotels_test_data.zip")
+    df_full = df_group_and_filter([df_cleaner(df) for df in data_frames_gen])
+    requested = []
+
+    def counting_get_address_worker(coordinate):
+        requested.append(coordinate)
+        return f"Address of {coordinate}"
+
+    with patch("src.api_utils.geodata_api.get_address_worker_v2", counting_get_address_worker):
+        val = collect_geo_data(df_full[["Latitude", "Longitude"]])
+
+    assert len(val) == len(df_full) == 10
+    assert requested == ["41.846704,-87.953952", "52.3375677,4.8178172"]
+    assert val[-1] == "Address of 52.3375677,4.8178172"
+
+
+def test_unique_coordinates_rounding():
+    coordinates = pd.DataFrame({"Latitude": [52.33756771, 52.3375677, 41.8], "Longitude": [4.8178172, 4.8178172, 2.0]})
+
+    exact_codes, exact_first = unique_coordinates(coordinates)
+    rounded_codes, rounded_first = unique_coordinates(coordinates, precision=5)
+
+    assert list(exact_codes) == [0, 1, 2]
+    assert list(rounded_codes) == [0, 0, 1]
+    assert list(rounded_first) == [0, 2]
+
+
+def test_collect_geo_data_isolates_failures(get_path):
+    data_frames_gen = df_generator(get_path + "/tests/test_data/hotels_test_data.zip")
+    df_full = df_group_and_filter([df_cleaner(df) for df in data_frames_gen])
+    requested = []
+
+    def flaky_get_address_worker(coordinate):
+        requested.append(coordinate)
+        if coordinate.startswith("41.") and requested.count(coordinate) == 1:
+            raise AttributeError("'NoneType' object has no attribute 'address'")
+        return f"Address of {coordinate}"
+
+    with patch("src.api_utils.geodata_api.get_address_worker_v2", flaky_get_address_worker):
+        val = collect_geo_data(df_full[["Latitude", "Longitude"]])
+
+    assert val[0] == "Address of 41.846704,-87.953952"
+    assert val[-1] == "Address of 52.3375677,4.8178172"
+    assert sorted(requested) == ["41.846704,-87.953952", "41.846704,-87.953952", "52.3375677,4.8178172"]
+
+
+def test_collect_geo_data_resumes_from_checkpoint(get_path, tmp_path):
+    data_frames_gen = df_generator(get_path + "/tests/test_data/hotels_test_data.zip")
+    df_full = df_group_and_filter([df_cleaner(df) for df in data_frames_gen])
+    checkpoint = GeocodeCache(tmp_path / "checkpoint.sqlite", precision=7)
+    # Saved by interrupted run
+    checkpoint.store([41.846704], [-87.953952], ["Saved address"])
+    requested = []
+
+    def counting_get_address_worker(coordinate):
+        requested.append(coordinate)
+        return f"Address of {coordinate}"
+
+    with patch("src.api_utils.geodata_api.get_address_worker_v2", counting_get_address_worker):
+        val = collect_geo_data(df_full[["Latitude", "Longitude"]], checkpoint=checkpoint)
+
+    assert requested == ["52.3375677,4.8178172"]
+    assert val[0] == "Saved address"
+    assert checkpoint.lookup([52.3375677], [4.8178172]) == ["Address of 52.3375677,4.8178172"]
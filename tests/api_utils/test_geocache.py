@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+import json
+import pickle
+from unittest.mock import patch
+
+import pandas as pd
+import pytest
+
+from src.api_utils.geocache import GeocodeCache
+from src.api_utils.geodata_api import collect_geo_data
+
+
+def test_geocache_rounded_keys(tmp_path):
+    cache = GeocodeCache(tmp_path / "geocache.sqlite", precision=5)
+    cache.store([52.3375677], [4.8178172], ["Mercure Hotel Amsterdam West"])
+
+    addresses = cache.lookup([52.33756771, 52.3375677, 48.8550298], [4.81781719, 4.8178172, 2.3332104])
+
+    assert addresses == ["Mercure Hotel Amsterdam West", "Mercure Hotel Amsterdam West", None]
+    assert cache.stats() == {"hits": 2, "misses": 1, "hit_rate": 2 / 3}
+
+
+def test_geocache_precision_mismatch(tmp_path):
+    GeocodeCache(tmp_path / "geocache.sqlite", precision=5).close()
+
+    with pytest.raises(ValueError):
+        GeocodeCache(tmp_path / "geocache.sqlite", precision=3)
+
+
+def test_geocache_import_joblib_cache(tmp_path):
+    for worker, coordinate, address in [
+        ("get_address_worker_v2", "'52.3375677,4.8178172'", "positionstack address"),
+        ("get_address_worker", "array([52.3375677,  4.8178172])", "Nominatim address"),
+        ("get_address_worker", "array([48.8550298,  2.3332104])", "Paris address"),
+    ]:
+        entry_dir = tmp_path / "cache" / "src" / "api_utils" / "geodata_api" / worker / f"{abs(hash(address)):x}"
+        entry_dir.mkdir(parents=True)
+        (entry_dir / "metadata.json").write_text(json.dumps({"input_args": {"coordinate": coordinate}}))
+        (entry_dir / "output.pkl").write_bytes(pickle.dumps(address))
+
+    cache = GeocodeCache(tmp_path / "geocache.sqlite")
+
+    assert cache.import_joblib_cache(tmp_path / "cache") == 2
+    assert cache.lookup([52.3375677, 48.8550298], [4.8178172, 2.3332104]) == ["positionstack address", "Paris address"]
+
+
+def test_collect_geo_data_requests_only_cache_misses(tmp_path):
+    cache = GeocodeCache(tmp_path / "geocache.sqlite")
+    cache.store([52.3375677], [4.8178172], ["Cached address"])
+    requested = []
+
+    def fake_get_address_worker(coordinate):
+        requested.append(coordinate)
+        return "Requested address"
+
+    coordinates = pd.DataFrame({"Latitude": [52.3375677, 41.846704], "Longitude": [4.8178172, -87.953952]})
+    with patch("src.api_utils.geodata_api.get_address_worker_v2", fake_get_address_worker):
+        addresses = collect_geo_data(coordinates, cache=cache)
+
+    assert addresses == ["Cached address", "Requested address"]
+    assert requested == ["41.846704,-87.953952"]
+    assert cache.lookup([41.846704], [-87.953952]) == ["Requested address"]
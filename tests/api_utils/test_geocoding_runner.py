@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+import threading
+
+import numpy as np
+import pytest
+
+from src.api_utils.geocache import GeocodeCache
+from src.api_utils.geocoding_runner import GeocodingCancelled, GeocodingRunner
+
+COORDINATES = ["1.0,1.0", "2.0,2.0", "3.0,3.0", "4.0,4.0", "5.0,5.0"]
+
+
+def make_runner(stores=(), **kwargs) -> GeocodingRunner:
+    latitudes = np.array([1.0, 2.0, 3.0, 4.0, 5.0])
+    return GeocodingRunner(COORDINATES, latitudes, latitudes, stores, **kwargs)
+
+
+def test_failed_coordinates_are_retried():
+    attempts = []
+
+    def request(positions, on_result):
+        attempts.append(list(positions))
+        for position in reversed(positions):
+            if position == 1 and len(attempts) == 1:
+                on_result(position, None, ValueError("Broken JSON"))
+            else:
+                on_result(position, f"Address {position}", None)
+
+    runner = make_runner()
+
+    assert runner.run(request) == [f"Address {position}" for position in range(5)]
+    assert attempts == [[0, 1, 2, 3, 4], [1]]
+    assert runner.failed == []
+
+
+def test_failures_left_after_retries():
+    def request(positions, on_result):
+        for position in positions:
+            if position == 0:
+                on_result(position, None, RuntimeError())
+            else:
+                on_result(position, "Address", None)
+
+    runner = make_runner(retries=2)
+
+    assert runner.run(request) == [None] + ["Address"] * 4
+    assert runner.failed == [0]
+    assert runner.total == 7
+
+
+def test_interrupted_run_keeps_results(tmp_path):
+    checkpoint = GeocodeCache(tmp_path / "checkpoint.sqlite", precision=7)
+    stored_batches = []
+
+    class CountingStore:
+        def store(self, latitudes, longitudes, addresses):
+            stored_batches.append(list(addresses))
+
+    def request(positions, on_result):
+        for position in positions[:3]:
+            on_result(position, f"Address {position}", None)
+        raise KeyboardInterrupt()
+
+    runner = make_runner([checkpoint, CountingStore()], batch_size=2)
+    with pytest.raises(KeyboardInterrupt):
+        runner.run(request)
+
+    assert stored_batches == [["Address 0", "Address 1"], ["Address 2"]]
+    assert checkpoint.lookup([1.0, 3.0, 4.0], [1.0, 3.0, 4.0]) == ["Address 0", "Address 2", None]
+
+
+def test_cancelled_run_stops_on_next_result():
+    cancelled = threading.Event()
+    done = []
+
+    def request(positions, on_result):
+        for position in positions:
+            done.append(position)
+            if position == 2:
+                cancelled.set()
+            on_result(position, f"Address {position}", None)
+
+    runner = make_runner(cancelled=cancelled)
+    with pytest.raises(GeocodingCancelled):
+        runner.run(request)
+
+    assert done == [0, 1, 2]
+    assert runner.addresses[2] == "Address 2"
+
+
+def test_progress():
+    runner = make_runner()
+    runner.on_result(0, "Address", None)
+
+    assert runner.progress().startswith("Geocoding: 1/5 (20.0%)")
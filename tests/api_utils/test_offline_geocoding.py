@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+
+from unittest.mock import patch
+
+import pandas as pd
+
+from src.api_utils.geodata_api import collect_geo_data
+from src.api_utils.offline_geocoding import OfflineGeocoder, load_offline_geocoder
+
+
+def test_offline_geocoder_max_distance():
+    geocoder = OfflineGeocoder([52.3375677, 48.8550298], [4.8178172, 2.3332104], ["Amsterdam", "Paris"], 0.05)
+
+    # ~10 m from Amsterdam point, ~1 km from Paris point, antimeridian point
+    addresses = geocoder.lookup([52.3376577, 48.8640298, -16.5], [4.8178172, 2.3332104, 179.9])
+
+    assert addresses == ["Amsterdam", None, None]
+    assert (geocoder.hits, geocoder.misses) == (1, 2)
+
+
+def test_offline_geocoder_across_antimeridian():
+    geocoder = OfflineGeocoder([-16.5], [179.99999], ["Fiji"], 0.05)
+
+    assert geocoder.lookup([-16.5], [-179.99999]) == ["Fiji"]
+
+
+def test_load_offline_geocoder_csv(tmp_path):
+    gazetteer_path = tmp_path / "gazetteer.csv"
+    pd.DataFrame(
+        {"Latitude": [52.3375677, 48.8550298], "Longitude": [4.8178172, 2.3332104], "Address": ["Amsterdam", None]}
+    ).to_csv(gazetteer_path, index=False)
+
+    geocoder = load_offline_geocoder(gazetteer_path)
+
+    assert len(geocoder) == 1
+    assert geocoder.lookup([52.3375677], [4.8178172]) == ["Amsterdam"]
+
+
+def test_collect_geo_data_requests_only_offline_misses():
+    geocoder = OfflineGeocoder([52.3375677], [4.8178172], ["Offline address"])
+    requested = []
+
+    def fake_get_address_worker(coordinate):
+        requested.append(coordinate)
+        return "Requested address"
+
+    coordinates = pd.DataFrame({"Latitude": [52.3375677, 41.846704], "Longitude": [4.8178172, -87.953952]})
+    with patch("src.api_utils.geodata_api.get_address_worker_v2", fake_get_address_worker):
+        addresses = collect_geo_data(coordinates, offline=geocoder)
+
+    assert addresses == ["Offline address", "Requested address"]
+    assert requested == ["41.846704,-87.953952"]
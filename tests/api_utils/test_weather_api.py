@@ -1,8 +1,11 @@
 # -*- coding: utf-8 -*-
 
+import threading
+from time import sleep
 from unittest import mock
 
 from src.api_utils.weather_api import (
+    fetch_centres_weather,
     get_centre_current_forecast_weather,
     get_centre_historical_weather,
 )
@@ -26,3 +29,35 @@ def test_get_centre_historical_weather(api_get_hist_weather):
         result = get_centre_historical_weather(52.3375677, 4.8178172, "Amsterdam")
 
     assert list(result.keys()) == ["Date", "City", "Latitude", "Longitude", "DayTemp", "MinTemp", "MaxTemp"]
+
+
+def test_fetch_centres_weather_order_and_limits(api_get_weather, api_get_hist_weather):
+    lock = threading.Lock()
+    in_flight = {"historical": 0, "forecast": 0}
+    max_in_flight = {"historical": 0, "forecast": 0}
+
+    def track(endpoint, payload):
+        with lock:
+            in_flight[endpoint] += 1
+            max_in_flight[endpoint] = max(max_in_flight[endpoint], in_flight[endpoint])
+        sleep(0.01)
+        with lock:
+            in_flight[endpoint] -= 1
+        return payload
+
+    def fake_weather_api_worker(lat, lon):
+        return track("forecast", api_get_weather)
+
+    def fake_api_historical_worker(lat, lon, utc_time):
+        return track("historical", api_get_hist_weather)
+
+    cities = ["Amsterdam", "Paris", "Milan"]
+    with mock.patch("src.api_utils.weather_api.weather_api_worker", fake_weather_api_worker):
+        with mock.patch("src.api_utils.weather_api.weather_api_historical_worker", fake_api_historical_worker):
+            result = fetch_centres_weather(
+                [52.3, 48.8, 45.4], [4.8, 2.3, 9.1], cities, threads_count=8, limits={"historical": 3, "forecast": 1}
+            )
+
+    assert [df["City"].iloc[0] for df in result] == ["Amsterdam", "Amsterdam", "Paris", "Paris", "Milan", "Milan"]
+    assert [len(df) for df in result] == [5, 6] * 3
+    assert max_in_flight == {"historical": 3, "forecast": 1}
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+
+from unittest import mock
+
+from src.api_utils.weather_api import fetch_centres_weather
+from src.api_utils.weather_cache import WeatherCache
+
+
+def test_weather_cache_historical_is_permanent(tmp_path, freezer):
+    freezer.move_to("2022-01-25 12:00:00")
+    cache = WeatherCache(tmp_path / "weather.sqlite", forecast_ttl=3600)
+    cache.put("historical", 52.3376, 4.8178, {"hourly": []}, 1643026779)
+
+    freezer.move_to("2023-01-25 12:00:00")
+
+    # Same UTC day, coordinates rounded to the same key
+    assert cache.get("historical", 52.3401, 4.8199, 1643000000) == {"hourly": []}
+    assert cache.get("historical", 52.3376, 4.8178, 1643026779 + 24 * 60 * 60) is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5}
+
+
+def test_weather_cache_forecast_expires(tmp_path, freezer):
+    freezer.move_to("2022-01-25 12:00:00")
+    cache = WeatherCache(tmp_path / "weather.sqlite", forecast_ttl=3600)
+    cache.put("forecast", 52.3376, 4.8178, {"daily": []})
+
+    freezer.move_to("2022-01-25 12:59:00")
+    assert cache.get("forecast", 52.3376, 4.8178) == {"daily": []}
+
+    freezer.move_to("2022-01-25 13:01:00")
+    assert cache.get("forecast", 52.3376, 4.8178) is None
+
+
+def test_fetch_centres_weather_requests_only_cache_misses(tmp_path, freezer, api_get_weather, api_get_hist_weather):
+    freezer.move_to("2022-01-25 12:00:00")
+    requested = []
+
+    def fake_weather_api_worker(lat, lon):
+        requested.append("forecast")
+        return api_get_weather
+
+    def fake_api_historical_worker(lat, lon, utc_time):
+        requested.append("historical")
+        return api_get_hist_weather
+
+    cache = WeatherCache(tmp_path / "weather.sqlite")
+    with mock.patch("src.api_utils.weather_api.weather_api_worker", fake_weather_api_worker):
+        with mock.patch("src.api_utils.weather_api.weather_api_historical_worker", fake_api_historical_worker):
+            first = fetch_centres_weather([52.3376], [4.8178], ["Amsterdam"], cache=cache)
+            first_requested = list(requested)
+            second = fetch_centres_weather([52.3376], [4.8178], ["Amsterdam"], cache=cache)
+
+    assert sorted(first_requested) == ["forecast"] + ["historical"] * 5
+    assert requested == first_requested
+    assert [df.equals(other) for df, other in zip(first, second)] == [True, True]
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+
+from src.processing.city_index import build_city_index
+from src.processing.pre_process import df_cleaner, df_generator, df_group_and_filter
+
+
+def test_build_city_index(get_path):
+    data_frames = df_generator(get_path + "/tests/test_data/hotels_test_data.zip")
+    df_full = df_group_and_filter([df_cleaner(df) for df in data_frames])
+    city_index = build_city_index(df_full)
+
+    assert city_index.cities == ["Oak Brook", "Amsterdam"]
+    assert city_index.countries == {"Oak Brook": "US", "Amsterdam": "NL"}
+
+
+def test_city_index_rows(get_path):
+    data_frames = df_generator(get_path + "/tests/test_data/hotels_test_data.zip")
+    df_full = df_group_and_filter([df_cleaner(df) for df in data_frames])
+    city_index = build_city_index(df_full)
+
+    assert city_index.rows(df_full, "Amsterdam").equals(df_full[df_full["City"] == "Amsterdam"])
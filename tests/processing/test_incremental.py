@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+from zipfile import ZipFile
+
+import pandas as pd
+
+from src.processing.city_index import build_city_index
+from src.processing.incremental import (
+    archive_fingerprint,
+    hotels_fingerprints,
+    load_manifest,
+    reuse_addresses,
+    save_manifest,
+)
+from src.processing.pre_process import df_cleaner, df_generator, df_group_and_filter
+
+
+def test_archive_fingerprint(get_path):
+    path = get_path + "/tests/test_data/hotels_test_data.zip"
+    fingerprint = archive_fingerprint(path)
+
+    with ZipFile(path) as zip_src:
+        assert list(fingerprint) == zip_src.namelist()
+    assert all(isinstance(crc, int) for crc in fingerprint.values())
+
+
+def test_hotels_fingerprints_change_only_for_changed_city(get_path):
+    data_frames = df_generator(get_path + "/tests/test_data/hotels_test_data.zip")
+    df_full = df_group_and_filter([df_cleaner(df) for df in data_frames])
+    city_index = build_city_index(df_full)
+    before = hotels_fingerprints(df_full, city_index)
+
+    df_changed = df_full.copy()
+    df_changed.loc[city_index.positions["Amsterdam"][0], "Latitude"] += 0.001
+    after = hotels_fingerprints(df_changed, city_index)
+
+    assert before["Oak Brook"] == after["Oak Brook"]
+    assert before["Amsterdam"] != after["Amsterdam"]
+
+
+def test_reuse_addresses(get_path):
+    data_frames = df_generator(get_path + "/tests/test_data/hotels_test_data.zip")
+    previous_df = df_group_and_filter([df_cleaner(df) for df in data_frames])
+    previous_df["Address"] = [f"Address {i}" for i in range(len(previous_df))]
+    previous_index = build_city_index(previous_df)
+
+    # Current data has cities in other order, rows of every city are the same
+    previous_hotels = previous_df.drop(columns="Address")
+    df_full = pd.concat(
+        [previous_index.rows(previous_hotels, "Amsterdam"), previous_index.rows(previous_hotels, "Oak Brook")],
+        ignore_index=True,
+    )
+    city_index = build_city_index(df_full)
+    reused = reuse_addresses(df_full, city_index, previous_df, previous_index, ["Amsterdam"])
+
+    amsterdam_rows = (df_full["City"] == "Amsterdam").values
+    assert (reused == amsterdam_rows).all()
+    assert df_full.loc[~amsterdam_rows, "Address"].isna().all()
+    assert list(df_full.loc[amsterdam_rows, "Address"]) == list(
+        previous_index.rows(previous_df, "Amsterdam")["Address"]
+    )
+
+
+def test_manifest_round_trip(tmp_path):
+    assert load_manifest(tmp_path) == {}
+
+    manifest = {"archive": {"hotels_1.csv": 123}, "options": {}, "cities": {"Paris": {"country": "FR"}}}
+    save_manifest(tmp_path, manifest)
+
+    assert load_manifest(tmp_path) == manifest
@@ -1,9 +1,16 @@
 # -*- coding: utf-8 -*-
+import datetime
 import json
 from unittest.mock import patch
 
+import pandas as pd
+
 from src.processing.enriching import enrich_with_weather_data
-from src.processing.post_process import generate_centres_df, generate_top_df
+from src.processing.post_process import (
+    generate_centres_df,
+    generate_rankings,
+    generate_top_df,
+)
 from src.processing.pre_process import df_cleaner, df_generator, df_group_and_filter
 
 
@@ -42,3 +49,65 @@ def test_generate_top_df(get_path):
         "City with min temperature",
         "City with max delta of max and min temp",
     ]
+
+
+def make_weather_df() -> pd.DataFrame:
+    dates = [datetime.date(2022, 1, 24), datetime.date(2022, 1, 25)]
+
+    return pd.DataFrame(
+        {
+            "Date": dates * 3,
+            "City": ["Paris", "Paris", "Milan", "Milan", "Vienna", "Vienna"],
+            "MinTemp": [1.0, -3.0, 2.0, 4.0, 0.0, -3.0],
+            "MaxTemp": [5.0, 9.0, 9.0, 6.0, 8.0, 2.0],
+        }
+    )
+
+
+def test_generate_top_df_metrics_and_ties():
+    weather_df = make_weather_df()
+    weather_copy = weather_df.copy()
+
+    top = generate_top_df(weather_df)
+
+    # Paris and Milan share max temperature and min temperature is shared by Paris and Vienna -
+    # city with the earlier row wins
+    first_day, second_day = datetime.date(2022, 1, 24), datetime.date(2022, 1, 25)
+    assert top.to_dict("list") == {
+        "City": ["Paris", "Vienna", "Paris", "Paris"],
+        "Date": [second_day, first_day, second_day, second_day],
+    }
+    assert weather_df.equals(weather_copy)
+
+
+def test_generate_top_df_metric_definitions():
+    first_day, second_day = datetime.date(2022, 1, 24), datetime.date(2022, 1, 25)
+    weather_df = pd.DataFrame(
+        {
+            "Date": [first_day, second_day] * 3,
+            "City": ["Rome", "Rome", "Oslo", "Oslo", "Bern", "Bern"],
+            "MinTemp": [0.0, 4.0, 9.0, 5.0, -5.0, 2.0],
+            "MaxTemp": [1.0, 5.0, 10.0, 6.0, 3.0, 3.0],
+        }
+    )
+
+    top = generate_top_df(weather_df)
+
+    # Rome and Oslo share delta of max temp, Rome reached its max earlier. Bern has min of MinTemp
+    # and max of MaxTemp - MinTemp
+    assert top.to_dict("list") == {
+        "City": ["Oslo", "Rome", "Bern", "Bern"],
+        "Date": [first_day, second_day, first_day, first_day],
+    }
+
+
+def test_generate_rankings_top_n():
+    rankings = generate_rankings(make_weather_df(), top_n=2)
+
+    max_temp = rankings[rankings["Metric"] == "City with max temperature"]
+    assert list(max_temp["City"]) == ["Paris", "Milan"]
+    assert list(max_temp["Rank"]) == [1, 2]
+
+    max_temp_delta = rankings[rankings["Metric"] == "City with max delta of max temp"]
+    assert list(max_temp_delta["City"]) == ["Vienna", "Paris"]
+    assert list(max_temp_delta["Value"]) == [6.0, 4.0]
@@ -1,8 +1,20 @@
 # -*- coding: utf-8 -*-
 
+import numpy as np
+import pandas as pd
 import pytest
 
-from src.processing.pre_process import df_cleaner, df_generator, df_group_and_filter
+from src.processing.pre_process import (
+    REJECT_REASONS,
+    concat_hotels,
+    count_cities,
+    df_cleaner,
+    df_generator,
+    df_group_and_filter,
+    df_parallel_generator,
+    df_stream_group_and_filter,
+    save_quarantine,
+)
 
 
 def test_df_generator_read_csv(get_path):
@@ -31,3 +43,166 @@ def test_df_group_and_filter(get_path):
     df_full = df_group_and_filter([df_cleaner(df) for df in data_frames])
 
     assert df_full["City"].values[0] == "Oak Brook"
+
+
+def test_df_group_and_filter_single_city_per_country(get_path):
+    data_frames = df_generator(get_path + "/tests/test_data/hotels_test_data.zip")
+    df_full = df_group_and_filter([df_cleaner(df) for df in data_frames])
+
+    assert (df_full.groupby("Country")["City"].nunique() == 1).all()
+    assert list(df_full.index) == list(range(len(df_full)))
+
+
+def test_df_group_and_filter_tie_picks_first_city():
+    df = pd.DataFrame(
+        {
+            "Name": ["a", "b", "c", "d", "e"],
+            "Country": ["US", "US", "NL", "US", "NL"],
+            "City": ["Boston", "Austin", "Amsterdam", "Austin", "Utrecht"],
+            "Latitude": [1.0, 2.0, 3.0, 4.0, 5.0],
+            "Longitude": [1.0, 2.0, 3.0, 4.0, 5.0],
+        }
+    )
+    df_full = df_group_and_filter([df])
+
+    assert list(df_full["City"]) == ["Austin", "Amsterdam", "Austin"]
+
+
+def test_df_generator_chunks(get_path):
+    data_frames = df_generator(get_path + "/tests/test_data/hotels_test_data.zip", chunksize=2)
+    assert max(len(df) for df in data_frames) == 2
+
+
+def test_df_stream_group_and_filter(get_path):
+    path = get_path + "/tests/test_data/hotels_test_data.zip"
+    df_full = df_group_and_filter([df_cleaner(df) for df in df_generator(path)])
+    df_streamed = df_stream_group_and_filter(path, chunksize=2)
+
+    pd.testing.assert_frame_equal(df_streamed, df_full)
+
+
+def test_count_cities_incremental(get_path):
+    path = get_path + "/tests/test_data/hotels_test_data.zip"
+    counts = count_cities(df_cleaner(df) for df in df_generator(path, chunksize=3))
+
+    assert counts[("US", "Oak Brook")] == 7
+    assert counts[("NL", "Amsterdam")] == 3
+
+
+def test_df_parallel_generator(get_path):
+    path = get_path + "/tests/test_data/hotels_test_data.zip"
+    df_full = df_group_and_filter([df_cleaner(df) for df in df_generator(path)])
+    df_parallel = df_group_and_filter(df_parallel_generator(path, workers=2))
+
+    pd.testing.assert_frame_equal(df_parallel, df_full)
+
+
+def test_df_group_and_filter_compact_dtypes(get_path):
+    data_frames = df_generator(get_path + "/tests/test_data/hotels_test_data.zip")
+    df_full = df_group_and_filter([df_cleaner(df, coordinates_dtype="float32") for df in data_frames])
+
+    assert df_full["City"].dtype == "category"
+    assert list(df_full["City"].cat.categories) == ["Amsterdam", "Oak Brook"]
+    assert df_full["Latitude"].dtype == "float32"
+
+
+def test_df_generator_no_compact_dtypes(get_path):
+    data_frames = df_generator(get_path + "/tests/test_data/hotels_test_data.zip", compact=False)
+    assert next(data_frames)["City"].dtype == object
+
+
+def test_count_cities_categorical_chunks():
+    # Chunks have different categories, so the same code means different cities
+    chunks = [
+        pd.DataFrame({"Country": ["IT", "NL"], "City": ["Milan", "Amsterdam"]}).astype("category"),
+        pd.DataFrame({"Country": ["NL", "IT", "NL"], "City": ["Amsterdam", "Bari", "Bari"]}).astype("category"),
+        pd.DataFrame({"Country": ["IT"], "City": ["Bari"]}).astype("category"),
+    ]
+    counts = count_cities(chunks)
+
+    assert counts.to_dict() == {("IT", "Milan"): 1, ("NL", "Amsterdam"): 2, ("IT", "Bari"): 2, ("NL", "Bari"): 1}
+
+
+def test_df_cleaner_quarantine():
+    df = pd.DataFrame(
+        {
+            "Name": ["a", None, "c", "d", "e", "f"],
+            "Country": ["US"] * 6,
+            "City": ["Boston"] * 6,
+            "Latitude": ["1.5", "2.0", "abd3.0", "91.0", "-4.0", "abd"],
+            "Longitude": ["1.0", "2.0", "3.0", "4.0", "-180.5", "500"],
+        }
+    )
+    quarantine = []
+    df_clear = df_cleaner(df, quarantine=quarantine)
+
+    assert list(df_clear.index) == [0]
+    assert df_clear["Latitude"].dtype == np.float64
+    assert list(quarantine[0]["Name"].fillna("")) == ["", "c", "d", "e", "f"]
+    assert list(quarantine[0]["Reason"]) == [
+        "missing value",
+        "non-numeric coordinate",
+        "latitude out of range",
+        "longitude out of range",
+        "non-numeric coordinate",
+    ]
+    assert list(quarantine[0]["Reason"].cat.categories) == REJECT_REASONS
+
+
+def test_df_cleaner_numeric_columns():
+    df = pd.DataFrame(
+        {
+            "Name": ["a", "b", "c"],
+            "Country": ["US"] * 3,
+            "City": ["Boston"] * 3,
+            "Latitude": [1.0, np.nan, 95.0],
+            "Longitude": [1, 2, 3],
+        }
+    )
+    quarantine = []
+    df_clear = df_cleaner(df, coordinates_dtype="float32", quarantine=quarantine)
+
+    assert list(df_clear["Longitude"]) == [1.0]
+    assert df_clear["Longitude"].dtype == np.float32
+    assert list(quarantine[0]["Reason"]) == ["missing value", "latitude out of range"]
+    # Source DataFrame is not changed
+    assert df["Longitude"].dtype == np.int64
+
+
+def test_quarantine_of_all_modes(get_path, tmp_path):
+    path = get_path + "/tests/test_data/hotels_test_data.zip"
+    serial, streamed, parallel = [], [], []
+    [df_cleaner(df, quarantine=serial) for df in df_generator(path)]
+    df_stream_group_and_filter(path, chunksize=2, quarantine=streamed)
+    df_group_and_filter(df_parallel_generator(path, workers=2, quarantine=parallel))
+
+    rejected_count = save_quarantine(serial, str(tmp_path / "rejected.csv.gz"))
+    df_rejected = pd.read_csv(tmp_path / "rejected.csv.gz")
+
+    assert rejected_count == len(df_rejected) > 0
+    assert list(df_rejected.columns) == ["Name", "Country", "City", "Latitude", "Longitude", "Reason"]
+    assert sum(map(len, streamed)) == sum(map(len, parallel)) == rejected_count
+
+
+@pytest.mark.parametrize("compact", [True, False])
+def test_df_generator_pyarrow_engine(get_path, compact):
+    path = get_path + "/tests/test_data/hotels_test_data.zip"
+
+    for df_pandas, df_arrow in zip(
+        df_generator(path, compact=compact), df_generator(path, compact=compact, engine="pyarrow")
+    ):
+        pd.testing.assert_frame_equal(df_arrow, df_pandas)
+
+
+def test_df_generator_pyarrow_engine_chunks(get_path):
+    path = get_path + "/tests/test_data/hotels_test_data.zip"
+    df_pandas = concat_hotels(df_generator(path, chunksize=2))
+    chunks = list(df_generator(path, chunksize=2, engine="pyarrow"))
+
+    assert max(len(df) for df in chunks) == 2
+    pd.testing.assert_frame_equal(concat_hotels(chunks), df_pandas)
+
+
+def test_df_generator_unknown_engine(get_path):
+    with pytest.raises(ValueError):
+        next(df_generator(get_path + "/tests/test_data/hotels_test_data.zip", engine="polars"))
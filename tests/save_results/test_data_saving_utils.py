@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+import pandas as pd
+import pytest
+
+from src.processing.city_index import build_city_index
+from src.save_results.data_saving_utils import (
+    initialise_dir_structure,
+    save_hotels_data,
+)
+
+
+def make_hotels_df() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "Name": [f"Hotel {i}" for i in range(250)] + ["Hotel, with comma", "Hotel\\nwith line break"],
+            "Country": ["NL"] * 250 + ["US"] * 2,
+            "City": ["Amsterdam"] * 250 + ["Oak Brook"] * 2,
+            "Latitude": [52.3375677 + i / 1000 for i in range(252)],
+            "Longitude": [4.8178172] * 252,
+            "Address": [f"Address {i}" for i in range(251)] + [None],
+        }
+    )
+
+
+def read_city_files(path):
+    return [pd.read_csv(file_path, float_precision="round_trip") for file_path in sorted(path.glob("*.csv"))]
+
+
+def test_save_hotels_data_100_rows_per_file(tmp_path):
+    hotels_df = make_hotels_df().iloc[:251]
+    index = build_city_index(hotels_df)
+    initialise_dir_structure(tmp_path, hotels_df, index)
+
+    save_hotels_data(tmp_path, hotels_df, index)
+
+    amsterdam_files = read_city_files(tmp_path / "NL" / "Amsterdam" / "hotels")
+    assert [len(df) for df in amsterdam_files] == [100, 100, 50]
+    assert pd.concat(amsterdam_files, ignore_index=True).equals(hotels_df.iloc[:250].reset_index(drop=True))
+    assert [path.name for path in (tmp_path / "US" / "Oak Brook" / "hotels").glob("*.csv")] == [
+        "oak brook_hotels_001.csv"
+    ]
+
+
+def test_save_hotels_data_same_as_to_csv(tmp_path):
+    hotels_df = make_hotels_df()
+    hotels_df.loc[251, "Name"] = "Hotel\nwith line break"
+    index = build_city_index(hotels_df)
+
+    for threads_count in [1, 3]:
+        initialise_dir_structure(tmp_path / str(threads_count), hotels_df, index)
+        save_hotels_data(tmp_path / str(threads_count), hotels_df, index, threads_count=threads_count)
+
+    # Bulk conversion and fallback to per-file conversion give the same files
+    for threads_count in [1, 3]:
+        city_dir = tmp_path / str(threads_count) / "US" / "Oak Brook" / "hotels"
+        hotels_df.iloc[250:].to_csv(tmp_path / "expected.csv", index=False, encoding="utf-8")
+        assert (city_dir / "oak brook_hotels_001.csv").read_bytes() == (tmp_path / "expected.csv").read_bytes()
+
+        city_dir = tmp_path / str(threads_count) / "NL" / "Amsterdam" / "hotels"
+        hotels_df.iloc[200:250].to_csv(tmp_path / "expected.csv", index=False, encoding="utf-8")
+        assert (city_dir / "amsterdam_hotels_003.csv").read_bytes() == (tmp_path / "expected.csv").read_bytes()
+
+
+@pytest.mark.parametrize("output_format", ["parquet", "feather"])
+def test_save_hotels_data_columnar(tmp_path, output_format):
+    hotels_df = make_hotels_df().astype({"Country": "category", "City": "category"})
+    index = build_city_index(hotels_df)
+    initialise_dir_structure(tmp_path, hotels_df, index)
+
+    save_hotels_data(tmp_path, hotels_df, index, output_format=output_format)
+
+    read_frame = pd.read_parquet if output_format == "parquet" else pd.read_feather
+    amsterdam_df = read_frame(tmp_path / "NL" / "Amsterdam" / "hotels" / f"amsterdam_hotels.{output_format}")
+    assert amsterdam_df.drop(columns=["Country", "City"]).equals(
+        hotels_df.iloc[:250].drop(columns=["Country", "City"]).reset_index(drop=True)
+    )
+    assert list(amsterdam_df["City"].cat.categories) == ["Amsterdam"]
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+import datetime
+
+import pandas as pd
+
+from src.processing.city_index import build_city_index
+from src.save_results.data_saving_utils import (
+    generate_and_save_plots,
+    initialise_dir_structure,
+    save_small_multiples,
+)
+from src.save_results.plotters import TemperaturePlot
+
+
+def make_weather_df() -> pd.DataFrame:
+    dates = [datetime.date(2022, 1, 20) + datetime.timedelta(day) for day in range(11)]
+
+    return pd.DataFrame(
+        {
+            "Date": dates * 2,
+            "City": ["Amsterdam"] * 11 + ["Oak Brook"] * 11,
+            "Country": ["NL"] * 11 + ["US"] * 11,
+            "MinTemp": [float(i % 4) for i in range(22)],
+            "MaxTemp": [float(i % 5 + 5) for i in range(22)],
+        }
+    )
+
+
+def test_parallel_plots_are_the_same_as_serial(tmp_path):
+    weather_df = make_weather_df()
+    index = build_city_index(weather_df)
+
+    for workers in [1, 2]:
+        initialise_dir_structure(tmp_path / str(workers), weather_df, index)
+        generate_and_save_plots(weather_df, weather_df, tmp_path / str(workers), index, index, workers=workers)
+
+    serial_plots = sorted((tmp_path / "1").rglob("*.png"))
+    parallel_plots = sorted((tmp_path / "2").rglob("*.png"))
+
+    assert [path.name for path in serial_plots] == [
+        "amsterdam_max_temperatures.png",
+        "amsterdam_min_temperatures.png",
+        "oak brook_max_temperatures.png",
+        "oak brook_min_temperatures.png",
+    ]
+    assert [path.read_bytes() for path in serial_plots] == [path.read_bytes() for path in parallel_plots]
+
+
+def test_plots_only_given_cities(tmp_path):
+    weather_df = make_weather_df()
+    index = build_city_index(weather_df)
+    initialise_dir_structure(tmp_path, weather_df, index)
+
+    generate_and_save_plots(weather_df, weather_df, tmp_path, index, index, cities=["Oak Brook"])
+
+    assert sorted(path.name for path in tmp_path.rglob("*.png")) == [
+        "oak brook_max_temperatures.png",
+        "oak brook_min_temperatures.png",
+    ]
+
+
+def test_template_render_does_not_depend_on_previous_city(tmp_path):
+    weather_df = make_weather_df()
+    amsterdam_df = weather_df[weather_df["City"] == "Amsterdam"]
+    oak_brook_df = weather_df[weather_df["City"] == "Oak Brook"].iloc[3:]
+
+    template = TemperaturePlot()
+    template.render(amsterdam_df["Date"], [amsterdam_df["MinTemp"]], "Amsterdam", tmp_path / "amsterdam.png")
+    template.render(oak_brook_df["Date"], [oak_brook_df["MaxTemp"]], "Oak Brook", tmp_path / "reused.png")
+    TemperaturePlot().render(oak_brook_df["Date"], [oak_brook_df["MaxTemp"]], "Oak Brook", tmp_path / "fresh.png")
+
+    assert (tmp_path / "reused.png").read_bytes() == (tmp_path / "fresh.png").read_bytes()
+
+
+def test_combined_plots_and_small_multiples(tmp_path):
+    weather_df = make_weather_df()
+    index = build_city_index(weather_df)
+    initialise_dir_structure(tmp_path, weather_df, index)
+
+    generate_and_save_plots(weather_df, weather_df, tmp_path, index, index, style="combined")
+    save_small_multiples(weather_df, tmp_path, index, cities_per_sheet=1)
+
+    assert sorted(path.name for path in tmp_path.rglob("*.png")) == [
+        "amsterdam_temperatures.png",
+        "oak brook_temperatures.png",
+        "temperatures_sheet_001.png",
+        "temperatures_sheet_002.png",
+    ]
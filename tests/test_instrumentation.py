@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+
+import json
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.instrumentation import ApiStats, RunReport, peak_rss_mb
+
+
+def test_stages_accumulate():
+    report = RunReport(api_stats=ApiStats())
+
+    for _ in range(2):
+        with report.stage("clean") as stage:
+            stage.rows = (stage.rows or 0) + 10
+            sum(range(10**5))
+    with report.stage("plotting", rows=3):
+        pass
+
+    assert list(report.stages) == ["clean", "plotting"]
+    assert report.stages["clean"].rows == 20
+    assert report.stages["plotting"].rows == 3
+    assert report.stages["clean"].wall_s > 0
+    assert report.stages["clean"].cpu_s >= 0
+    assert report.stages["clean"].peak_rss_growth_mb >= 0
+    assert not report.stages["clean"].overlapped
+    assert "overlapped" not in report.summary()
+
+
+@pytest.mark.skipif(peak_rss_mb() is None, reason="resource module is not available")
+def test_stage_reports_peak_rss_growth():
+    report = RunReport(api_stats=ApiStats())
+
+    # Allocating as much as the peak so far raises it for sure
+    with report.stage("allocate"):
+        np.ones(int(peak_rss_mb() * 2**20) // 8)
+    with report.stage("noop"):
+        pass
+
+    assert report.stages["allocate"].peak_rss_growth_mb > 0
+    assert report.stages["noop"].peak_rss_growth_mb == 0
+
+
+def test_concurrent_stages_count_own_cpu():
+    report = RunReport(api_stats=ApiStats())
+    busy_started = threading.Event()
+
+    def busy():
+        with report.stage("busy"):
+            busy_started.set()
+            deadline = time.perf_counter() + 0.3
+            while time.perf_counter() < deadline:
+                pass
+
+    thread = threading.Thread(target=busy)
+    thread.start()
+    busy_started.wait()
+    with report.stage("waiting"):
+        thread.join()
+
+    assert report.stages["busy"].cpu_s > 0.1
+    assert report.stages["waiting"].cpu_s < 0.05
+    # Memory of overlapping stages can't be told apart
+    assert report.stages["busy"].overlapped and report.stages["waiting"].overlapped
+    assert report.to_dict()["stages"][0]["overlapped"]
+    assert "* stage overlapped other stages" in report.summary()
+
+
+def spin(seconds: float):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def test_concurrent_stage_gets_no_cpu_of_other_stage_pool():
+    report = RunReport(api_stats=ApiStats())
+    pool_started = threading.Event()
+
+    def pool_stage():
+        with report.stage("plotting", children=True):
+            pool_started.set()
+            with ProcessPoolExecutor(2) as executor:
+                list(executor.map(spin, [0.3, 0.3]))
+
+    thread = threading.Thread(target=pool_stage)
+    thread.start()
+    pool_started.wait()
+    with report.stage("waiting"):
+        thread.join()
+
+    assert report.stages["plotting"].cpu_s > 0.3
+    assert report.stages["waiting"].cpu_s < 0.05
+
+
+def test_timed_iter_counts_rows():
+    report = RunReport(api_stats=ApiStats())
+    dfs = [pd.DataFrame({"a": range(3)}), pd.DataFrame({"a": range(4)})]
+
+    assert [len(df) for df in report.timed_iter("ingest", dfs)] == [3, 4]
+    assert report.stages["ingest"].rows == 7
+
+
+def test_api_stats():
+    api_stats = ApiStats()
+
+    for _ in range(3):
+        with api_stats.timer("weather_forecast"):
+            pass
+    with pytest.raises(ValueError):
+        with api_stats.timer("weather_forecast"):
+            raise ValueError()
+    assert api_stats.timed("geocoding", lambda x: x * 2)(2) == 4
+
+    summary = api_stats.summary()
+    assert summary["weather_forecast"]["calls"] == 4
+    assert summary["weather_forecast"]["errors"] == 1
+    assert summary["geocoding"]["calls"] == 1
+    assert summary["weather_forecast"]["p50_s"] <= summary["weather_forecast"]["p99_s"]
+
+
+def test_report_save_and_summary(tmp_path):
+    api_stats = ApiStats()
+    with api_stats.timer("geocoding"):
+        pass
+    report = RunReport(api_stats=api_stats)
+    with report.stage("weather", rows=12):
+        pass
+    report.caches["weather"] = {"hits": 3, "misses": 1, "hit_rate": 0.75}
+
+    report.save(tmp_path / "report.json")
+    saved = json.loads((tmp_path / "report.json").read_text())
+
+    assert saved["stages"][0]["name"] == "weather"
+    assert saved["stages"][0]["rows"] == 12
+    assert saved["stages"][0]["rows_per_s"] > 0
+    assert saved["api"]["geocoding"]["calls"] == 1
+    assert saved["caches"]["weather"]["hit_rate"] == 0.75
+
+    summary = report.summary()
+    assert "weather" in summary
+    assert "API geocoding: 1 calls" in summary
+    assert "hit rate 75.0%" in summary
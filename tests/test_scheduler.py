@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+import threading
+from time import sleep
+
+import pytest
+
+from src.scheduler import StageScheduler
+
+
+def test_results_passed_to_dependents():
+    scheduler = StageScheduler()
+    scheduler.add("hotels", lambda: 2)
+    scheduler.add("weather", lambda: 3)
+    scheduler.add("plots", lambda hotels, weather: hotels * weather, ["hotels", "weather"])
+
+    assert scheduler.run() == {"hotels": 2, "weather": 3, "plots": 6}
+
+
+def test_independent_stages_overlap():
+    # Fails with BrokenBarrierError if stages don't run at once
+    both_started = threading.Barrier(2, timeout=5)
+
+    def request_api():
+        both_started.wait()
+        sleep(0.2)
+
+    scheduler = StageScheduler()
+    scheduler.add("geocoding", request_api)
+    scheduler.add("weather", request_api)
+
+    scheduler.run()
+
+
+def test_sequential_order():
+    order = []
+    scheduler = StageScheduler(max_workers=1)
+    scheduler.add("geocoding", lambda: order.append("geocoding"))
+    scheduler.add("weather", lambda: order.append("weather"))
+    scheduler.add("plotting", lambda weather: order.append("plotting"), ["weather"])
+
+    scheduler.run()
+
+    assert order == ["geocoding", "weather", "plotting"]
+
+
+def test_failed_stage_stops_dependents():
+    ran = []
+
+    def fail():
+        raise RuntimeError("API is down")
+
+    scheduler = StageScheduler()
+    scheduler.add("weather", fail)
+    scheduler.add("plotting", lambda weather: ran.append("plotting"), ["weather"])
+
+    with pytest.raises(RuntimeError, match="API is down"):
+        scheduler.run()
+    assert ran == []
+
+
+def test_failed_stage_cancels_running_ones():
+    def fail():
+        raise RuntimeError("API is down")
+
+    scheduler = StageScheduler()
+    # Would wait for 5 seconds if cancelled event isn't set
+    scheduler.add("geocoding", lambda: scheduler.cancelled.wait(5))
+    scheduler.add("weather", fail)
+
+    with pytest.raises(RuntimeError, match="API is down"):
+        scheduler.run()
+    assert scheduler.cancelled.is_set()
+
+
+def test_unknown_dependency():
+    scheduler = StageScheduler()
+    scheduler.add("weather", lambda: None)
+
+    with pytest.raises(ValueError):
+        scheduler.add("plotting", lambda geocoding: None, ["geocoding"])
+    with pytest.raises(ValueError):
+        scheduler.add("weather", lambda: None)
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+
+import subprocess
+import sys
+
+from click.testing import CliRunner
+
+import weather_app
+from src.service_utils import project_root
+
+# Loaded by pipeline stages when they run, never on CLI startup
+HEAVY_MODULES = ["pandas", "numpy", "matplotlib", "scipy", "pyarrow", "requests", "geopy", "joblib", "dotenv"]
+# Cumulative import time of weather_app, seconds. It is ~0.1s, eager imports took ~1.7s
+IMPORT_TIME_BUDGET = 0.5
+
+
+def run_python(*args: str) -> subprocess.CompletedProcess:
+    # Fresh interpreter - modules imported by other tests don't count
+    return subprocess.run([sys.executable, *args], cwd=project_root(), capture_output=True, text=True, check=True)
+
+
+def test_no_heavy_modules_on_startup():
+    result = run_python("-c", "import sys, weather_app; print(' '.join(sys.modules))")
+    loaded = set(result.stdout.split())
+
+    assert [module for module in HEAVY_MODULES if module in loaded] == []
+
+
+def test_import_time_budget():
+    result = run_python("-X", "importtime", "-c", "import weather_app")
+    # Lines are "import time: self [us] | cumulative | module"
+    weather_app_line = [line for line in result.stderr.splitlines() if line.endswith("| weather_app")][-1]
+    cumulative_time = int(weather_app_line.split("|")[1]) / 10**6
+
+    assert cumulative_time < IMPORT_TIME_BUDGET
+
+
+def test_help():
+    result = CliRunner().invoke(weather_app.main, ["--help"])
+
+    assert result.exit_code == 0
+    assert "--output_format [csv|parquet|feather]" in result.output
+    assert "--geo_provider [nominatim|positionstack]" in result.output
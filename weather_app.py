@@ -5,16 +5,14 @@ from pathlib import Path
 
 import click
 
-from src.processing.enriching import enrich_with_geo_data, enrich_with_weather_data
-from src.processing.post_process import generate_centres_df, generate_top_df
-from src.processing.pre_process import df_cleaner, df_generator, df_group_and_filter
-from src.save_results.data_saving_utils import (
-    generate_and_save_plots,
-    initialise_dir_structure,
-    save_centre_data,
-    save_general_statistics,
-    slice_and_save_city_hotels_data,
-)
+# Only light modules are imported on startup, so --help and option errors are fast.
+# Stages import their data processing, API clients, caches and plotters when they run
+from src.api_utils.async_geocoding import PROVIDERS
+from src.api_utils.weather_cache import DEFAULT_FORECAST_TTL
+from src.instrumentation import RunReport
+from src.processing import CSV_ENGINES
+from src.save_results import OUTPUT_FORMATS
+from src.scheduler import StageScheduler
 
 logging.basicConfig(level=logging.INFO)
 
@@ -23,7 +21,167 @@ logging.basicConfig(level=logging.INFO)
 @click.option("--data_path", help="Path to zip archive with hotels data. Relative paths is allowed")
 @click.option("--output_path", help="Path to dir, where output data will be stored. Relative paths is allowed")
 @click.option("--threads_count", default=10, help="Number threads to call geo-API with.")
-def main(data_path, output_path, threads_count):
+@click.option(
+    "--chunksize",
+    default=None,
+    type=int,
+    help="Stream archive by chunks of given rows count to bound memory usage. Files are read whole if not set.",
+)
+@click.option(
+    "--workers",
+    default=1,
+    help="Number of processes to parse and clean archive files with. Not used in streaming mode.",
+)
+@click.option(
+    "--csv_engine",
+    default="pandas",
+    type=click.Choice(CSV_ENGINES),
+    help="Reader of archive csv files. pyarrow parses every file in several threads with a fixed schema.",
+)
+@click.option(
+    "--compact_dtypes/--no_compact_dtypes",
+    default=True,
+    help="Store Country and City as categorical columns. Enabled by default.",
+)
+@click.option(
+    "--float32_coordinates",
+    is_flag=True,
+    help="Store coordinates as float32. Saves memory, but rounds coordinates to ~6 significant digits.",
+)
+@click.option(
+    "--quarantine_path",
+    default=None,
+    help="Path to csv file to save rows, dropped by cleaning, with the reason of rejection. "
+    "Compressed if ends with .gz, .bz2, .zip or .xz.",
+)
+@click.option(
+    "--centre_method",
+    default="planar",
+    type=click.Choice(["planar", "spherical"]),
+    help="City centre calculation: plain average of coordinates or mean of 3D unit vectors (antimeridian-safe).",
+)
+@click.option(
+    "--geocache_path",
+    default=None,
+    help="Path to SQLite geocoding cache file. Created if not exists. joblib cache in src/cache is used if not set.",
+)
+@click.option(
+    "--geocache_precision", default=5, help="Decimal places to round coordinates to for geocoding cache keys."
+)
+@click.option(
+    "--geocache_import",
+    default=None,
+    help="joblib geocoding cache dir or zip (e.g. data/cached_geocoding.zip) to import into SQLite cache before run.",
+)
+@click.option(
+    "--dedup_precision",
+    default=None,
+    type=int,
+    help="Round coordinates to given decimal places before geocoding deduplication. Exact match if not set.",
+)
+@click.option(
+    "--geo_engine",
+    default="threads",
+    type=click.Choice(["threads", "async"]),
+    help="Geocoding engine: threads of joblib-cached worker or asyncio client with rate limiting and retries.",
+)
+@click.option(
+    "--geo_provider",
+    default="positionstack",
+    type=click.Choice(sorted(PROVIDERS)),
+    help="Geocoding API of async engine.",
+)
+@click.option("--geo_rate", default=None, type=float, help="Max geocoding requests per second of async engine.")
+@click.option(
+    "--gazetteer",
+    default=None,
+    help="Offline geocoding source: csv (Latitude, Longitude, Address), SQLite geocoding cache or joblib cache "
+    "dir/zip. Nearest known address is used, API is requested only on miss.",
+)
+@click.option("--gazetteer_max_km", default=0.05, help="Max distance to the nearest gazetteer address, km.")
+@click.option(
+    "--geocoding_retries", default=1, help="Rounds of requesting coordinates again, whose geocoding requests failed."
+)
+@click.option(
+    "--geocoding_batch",
+    default=100,
+    help="Geocoding results are saved to cache and checkpoint by batches of this size. Interrupted run resumes "
+    "from the checkpoint in output dir.",
+)
+@click.option("--weather_threads", default=10, help="Size of thread pool, shared by weather requests of all cities.")
+@click.option(
+    "--weather_cache_path",
+    default=None,
+    help="Path to SQLite weather cache file. Historical responses are kept forever, forecast ones expire.",
+)
+@click.option("--weather_cache_ttl", default=DEFAULT_FORECAST_TTL, help="Lifetime of cached forecasts, seconds.")
+@click.option(
+    "--incremental",
+    is_flag=True,
+    help="Reuse results of the previous run in output dir: skip reading unchanged archive, geocoding of unchanged "
+    "cities and saving of cities with unchanged hotels and weather data.",
+)
+@click.option("--plot_workers", default=1, help="Number of processes to render plots in.")
+@click.option(
+    "--plot_style",
+    default="separate",
+    type=click.Choice(["separate", "combined"]),
+    help="Separate min and max temperature plots or one combined plot per city.",
+)
+@click.option("--plot_sheets", is_flag=True, help="Also save sheets of small min/max plots of all cities.")
+@click.option("--save_threads", default=1, help="Number of threads to write hotels csv files with.")
+@click.option(
+    "--output_format",
+    default="csv",
+    type=click.Choice(OUTPUT_FORMATS),
+    help="Format of hotels and centre weather files. parquet and feather write one hotels file per city.",
+)
+@click.option("--rankings_top_n", default=0, help="Save top N cities of every statistics metric to rankings.csv.")
+@click.option(
+    "--sequential_stages",
+    is_flag=True,
+    help="Run pipeline stages one by one instead of overlapping geocoding, weather requests and saving.",
+)
+@click.option(
+    "--run_report",
+    default=None,
+    help="Path to JSON report of run: time, memory and rows of every stage, API latency and cache hit rates.",
+)
+def main(
+    data_path,
+    output_path,
+    threads_count,
+    chunksize,
+    workers,
+    csv_engine,
+    compact_dtypes,
+    float32_coordinates,
+    quarantine_path,
+    centre_method,
+    geocache_path,
+    geocache_precision,
+    geocache_import,
+    dedup_precision,
+    geo_engine,
+    geo_provider,
+    geo_rate,
+    gazetteer,
+    gazetteer_max_km,
+    geocoding_retries,
+    geocoding_batch,
+    weather_threads,
+    weather_cache_path,
+    weather_cache_ttl,
+    incremental,
+    plot_workers,
+    plot_style,
+    plot_sheets,
+    save_threads,
+    output_format,
+    rankings_top_n,
+    sequential_stages,
+    run_report,
+):
     """
     Project main pipeline
 
@@ -31,46 +189,337 @@ def main(data_path, output_path, threads_count):
     :param output_path: Path to dir, where output data will be stored
     """
 
+    from src.processing.city_index import build_city_index
+    from src.processing.incremental import (
+        archive_fingerprint,
+        hotels_fingerprints,
+        load_hotels_snapshot,
+        load_manifest,
+        remove_city_outputs,
+        reuse_addresses,
+        save_hotels_snapshot,
+        save_manifest,
+        weather_fingerprints,
+    )
+    from src.processing.post_process import generate_centres_df
+    from src.processing.pre_process import (
+        df_cleaner,
+        df_generator,
+        df_group_and_filter,
+        df_parallel_generator,
+        df_stream_group_and_filter,
+        save_quarantine,
+    )
+
     # Specify data paths
     if not Path(data_path).is_absolute():
         data_path = str(Path().cwd() / data_path)
     if not Path(output_path).is_absolute():
         output_path = str(Path().cwd() / output_path)
+    if geocache_import is not None and geocache_path is None:
+        raise click.UsageError("--geocache_import requires --geocache_path")
+
+    # Previous run results are reused only if they were got with the same options
+    coordinates_dtype = "float32" if float32_coordinates else "float64"
+    manifest = load_manifest(output_path) if incremental else {}
+    archive = archive_fingerprint(data_path)
+    options = {
+        "compact_dtypes": compact_dtypes,
+        "coordinates_dtype": coordinates_dtype,
+        "centre_method": centre_method,
+        "dedup_precision": dedup_precision,
+        "gazetteer": gazetteer,
+        "gazetteer_max_km": gazetteer_max_km,
+    }
+    previous_df = load_hotels_snapshot(output_path) if manifest.get("options") == options else None
+    previous_cities = manifest.get("cities", {}) if previous_df is not None else {}
+
+    report = RunReport()
+    quarantine = [] if quarantine_path is not None else None
 
     # Forming tables from local data
     logging.info("Collecting data from .zip ...")
-    data_frames_gen = df_generator(data_path)
-    df_hotels = df_group_and_filter([df_cleaner(df) for df in data_frames_gen])
-    centre_info = generate_centres_df(df_hotels)
+    if previous_df is not None and manifest.get("archive") == archive:
+        logging.info("Archive is unchanged, hotels data of the previous run is used")
+        with report.stage("ingest", rows=len(previous_df)):
+            df_hotels = previous_df.drop(columns="Address")
+        # Rejected rows of the same archive are saved by the previous run
+        quarantine = None
+    elif chunksize is not None or workers > 1:
+        # Reading, cleaning and filtering are fused in streaming and parallel modes
+        with report.stage("ingest", children=chunksize is None) as stage:
+            if chunksize is not None:
+                df_hotels = df_stream_group_and_filter(
+                    data_path, chunksize, compact_dtypes, coordinates_dtype, quarantine, csv_engine
+                )
+            else:
+                df_hotels = df_group_and_filter(
+                    df_parallel_generator(data_path, workers, compact_dtypes, coordinates_dtype, quarantine, csv_engine)
+                )
+            stage.rows = len(df_hotels)
+    else:
+        cleaned_dfs = []
+        for df in report.timed_iter("ingest", df_generator(data_path, compact=compact_dtypes, engine=csv_engine)):
+            with report.stage("clean") as stage:
+                cleaned_dfs.append(df_cleaner(df, coordinates_dtype, quarantine))
+                stage.rows = (stage.rows or 0) + len(cleaned_dfs[-1])
+        with report.stage("group_filter") as stage:
+            df_hotels = df_group_and_filter(cleaned_dfs)
+            stage.rows = len(df_hotels)
+    if quarantine is not None:
+        rejected_count = save_quarantine(quarantine, quarantine_path)
+        logging.info(f"{rejected_count} rejected rows are saved to {quarantine_path}")
+    logging.info(f"Hotels data: {len(df_hotels)} rows, {df_hotels.memory_usage(deep=True).sum() / 2 ** 20:.2f} MB")
+    with report.stage("centres") as stage:
+        hotels_index = build_city_index(df_hotels)
+        centre_info = generate_centres_df(df_hotels, centre_method)
+        stage.rows = len(centre_info)
     logging.info("Done!")
 
-    # Enriching from external APIs
-    logging.info("Collecting geodata from API ...")
+    # Inputs of every city are compared with the previous run before enrichment
+    with report.stage("fingerprints"):
+        hotels_inputs = hotels_fingerprints(df_hotels, hotels_index)
+        if incremental:
+            previous_index = build_city_index(previous_df) if previous_df is not None else None
+            unchanged_cities = [
+                city
+                for city, fingerprint in hotels_inputs.items()
+                if previous_cities.get(city, {}).get("hotels") == fingerprint
+                and previous_index.rows(previous_df, city)["Address"].notna().all()
+            ]
+        else:
+            unchanged_cities = []
 
-    enrich_with_geo_data(df_hotels, threads_count)
-    logging.info("Done!")
-    logging.info("Collecting weather data from API ...")
-    df_weather = enrich_with_weather_data(centre_info)
-    logging.info("Done!")
+    # Stages below run as a dependency graph: geocoding overlaps weather requests and everything
+    # depending only on weather. Geocoding returns addresses, df_hotels gets them in hotels_save,
+    # the only other stage using df_hotels. Other stages get hotels_index
+    def geocoding():
+        logging.info("Collecting geodata from API ...")
+        with report.stage("geocoding") as stage:
+            df_geo = df_hotels[["Latitude", "Longitude"]].copy()
+            if incremental:
+                # Copy addresses of cities with unchanged inputs and complete addresses
+                reused = reuse_addresses(df_geo, hotels_index, previous_df, previous_index, unchanged_cities)
+                logging.info(
+                    f"Geocoding skipped for {len(unchanged_cities)} unchanged cities of {len(hotels_index.cities)}"
+                )
+                stage.rows = int((~reused).sum())
+            else:
+                reused = None
+                stage.rows = len(df_geo)
+            # Nothing to geocode - geocoders and caches are not even loaded. None if there are no addresses
+            if stage.rows == 0:
+                return df_geo.get("Address")
 
-    # Create directories for storing output
-    logging.info("Collecting and saving collected info ...")
-    initialise_dir_structure(output_path, df_hotels)
+            from src.api_utils.async_geocoding import AsyncGeocoder
+            from src.api_utils.geocache import GeocodeCache
+            from src.api_utils.geocoding_runner import (
+                CHECKPOINT_NAME,
+                CHECKPOINT_PRECISION,
+            )
+            from src.processing.enriching import enrich_with_geo_data
 
-    # Save collected hotels data and weather data for every city
-    for city in df_hotels["City"].unique():
-        slice_and_save_city_hotels_data(output_path, df_hotels, city)
-        save_centre_data(output_path, df_weather, df_hotels, city)
+            geocache = None
+            if geocache_path is not None:
+                geocache = GeocodeCache(geocache_path, geocache_precision)
+                if geocache_import is not None:
+                    geocache.import_joblib_cache(geocache_import)
 
-    # Generate general statistics generation and save
-    top_df = generate_top_df(df_weather)
-    save_general_statistics(output_path, top_df)
-    logging.info("Done!")
+            geocoder = None
+            if geo_engine == "async":
+                provider = PROVIDERS[geo_provider]() if geo_rate is None else PROVIDERS[geo_provider](rate=geo_rate)
+                geocoder = AsyncGeocoder(provider, concurrency=threads_count)
+
+            offline = None
+            if gazetteer is not None:
+                from src.api_utils.offline_geocoding import load_offline_geocoder
+
+                offline = load_offline_geocoder(gazetteer, gazetteer_max_km)
+
+            # Requested addresses are saved here as they come, so an interrupted run resumes
+            Path(output_path).mkdir(parents=True, exist_ok=True)
+            checkpoint = GeocodeCache(Path(output_path) / CHECKPOINT_NAME, CHECKPOINT_PRECISION)
+            geo_options = {
+                "cache": geocache,
+                "dedup_precision": dedup_precision,
+                "geocoder": geocoder,
+                "offline": offline,
+                "checkpoint": checkpoint,
+                "batch_size": geocoding_batch,
+                "retries": geocoding_retries,
+                # Set if another stage fails or run is interrupted
+                "cancelled": scheduler.cancelled,
+            }
+
+            if reused is not None:
+                df_changed = df_geo[~reused].copy()
+                enrich_with_geo_data(df_changed, threads_count, **geo_options)
+                df_geo.loc[~reused, "Address"] = df_changed["Address"].values
+            else:
+                enrich_with_geo_data(df_geo, threads_count, **geo_options)
+            checkpoint.close()
+            if offline is not None:
+                report.caches["gazetteer"] = offline.stats()
+            if geocache is not None:
+                report.caches["geocoding"] = geocache.stats()
+                logging.info(f"Geocoding cache stats: {geocache.stats()}")
+                geocache.close()
+        logging.info("Geodata collected")
+
+        return df_geo["Address"]
+
+    def weather():
+        logging.info("Collecting weather data from API ...")
+        with report.stage("weather") as stage:
+            from src.api_utils.weather_cache import WeatherCache
+            from src.processing.enriching import enrich_with_weather_data
+
+            weather_cache = None
+            if weather_cache_path is not None:
+                weather_cache = WeatherCache(weather_cache_path, forecast_ttl=weather_cache_ttl)
+            df_weather = enrich_with_weather_data(centre_info, weather_threads, weather_cache)
+            if weather_cache is not None:
+                report.caches["weather"] = weather_cache.stats()
+                logging.info(f"Weather cache stats: {weather_cache.stats()}")
+                weather_cache.close()
+            weather_index = build_city_index(df_weather)
+            stage.rows = len(df_weather)
+        logging.info("Weather data collected")
+
+        return df_weather, weather_index
+
+    def plan(weather):
+        # Cities with unchanged hotels and weather data have the same output files
+        df_weather, weather_index = weather
+        weather_data = weather_fingerprints(df_weather, weather_index)
+        changed_cities = [
+            city
+            for city in hotels_index.cities
+            if city not in unchanged_cities
+            or previous_cities[city].get("weather") != weather_data.get(city)
+            or not Path(output_path, hotels_index.countries[city], city).exists()
+        ]
+        if incremental:
+            logging.info(f"Saving skipped for {len(hotels_index.cities) - len(changed_cities)} unchanged cities")
+            # Drop outputs of removed cities and old files of rewritten ones (city could have less files now)
+            previous_countries = {city: info["country"] for city, info in previous_cities.items()}
+            stale_cities = set(previous_countries) - set(hotels_index.cities)
+            remove_city_outputs(output_path, previous_countries, stale_cities.union(changed_cities))
+
+        return changed_cities, weather_data
+
+    def dir_init(plan):
+        # Create directories for storing output
+        with report.stage("dir_init"):
+            from src.save_results.data_saving_utils import initialise_dir_structure
 
-    logging.info("Generating and saving plots ...")
-    generate_and_save_plots(df_weather, df_hotels, output_path)
+            initialise_dir_structure(output_path, None, hotels_index)
+
+    def hotels_save(geocoding, plan, dir_init):
+        addresses, (changed_cities, _) = geocoding, plan
+        if addresses is not None:
+            df_hotels["Address"] = addresses
+        with report.stage("hotels_save") as stage:
+            from src.save_results.data_saving_utils import save_hotels_data
+
+            save_hotels_data(
+                output_path,
+                df_hotels,
+                hotels_index,
+                changed_cities,
+                threads_count=save_threads,
+                output_format=output_format,
+            )
+            stage.rows = sum(len(hotels_index.positions[city]) for city in changed_cities)
+        logging.info("Hotels data saved")
+
+    def weather_save(weather, plan, dir_init):
+        (df_weather, weather_index), (changed_cities, _) = weather, plan
+        with report.stage("weather_save") as stage:
+            from src.save_results.data_saving_utils import save_centre_data
+
+            for city in changed_cities:
+                save_centre_data(output_path, df_weather, None, city, hotels_index, weather_index, output_format)
+            stage.rows = len(changed_cities)
+
+    def statistics(weather, dir_init):
+        df_weather, _ = weather
+        with report.stage("statistics") as stage:
+            from src.processing.post_process import generate_rankings, generate_top_df
+            from src.save_results.data_saving_utils import (
+                save_general_statistics,
+                save_rankings,
+            )
+
+            top_df = generate_top_df(df_weather)
+            save_general_statistics(output_path, top_df)
+            if rankings_top_n > 0:
+                save_rankings(output_path, generate_rankings(df_weather, rankings_top_n))
+            stage.rows = len(top_df)
+        logging.info("Statistics saved")
+
+    def plotting(weather, plan, dir_init):
+        (df_weather, weather_index), (changed_cities, _) = weather, plan
+        logging.info("Generating and saving plots ...")
+        with report.stage("plotting", children=plot_workers > 1) as stage:
+            from src.save_results.data_saving_utils import (
+                generate_and_save_plots,
+                save_small_multiples,
+            )
+
+            # Processes are forked while request threads run - start them clean instead
+            generate_and_save_plots(
+                df_weather,
+                None,
+                output_path,
+                hotels_index,
+                weather_index,
+                changed_cities,
+                plot_workers,
+                plot_style,
+                mp_context=None if sequential_stages else "spawn",
+            )
+            if plot_sheets:
+                save_small_multiples(df_weather, output_path, weather_index)
+            stage.rows = len(changed_cities)
+        logging.info("Plots saved")
+
+    scheduler = StageScheduler(max_workers=1 if sequential_stages else None)
+    scheduler.add("geocoding", geocoding)
+    scheduler.add("weather", weather)
+    scheduler.add("plan", plan, ["weather"])
+    scheduler.add("dir_init", dir_init, ["plan"])
+    scheduler.add("hotels_save", hotels_save, ["geocoding", "plan", "dir_init"])
+    scheduler.add("weather_save", weather_save, ["weather", "plan", "dir_init"])
+    scheduler.add("statistics", statistics, ["weather", "dir_init"])
+    scheduler.add("plotting", plotting, ["weather", "plan", "dir_init"])
+    results = scheduler.run()
+    _, weather_data = results["plan"]
     logging.info("Done!")
 
+    if incremental:
+        save_hotels_snapshot(output_path, df_hotels)
+        cities_manifest = {
+            city: {
+                "country": str(hotels_index.countries[city]),
+                "hotels": hotels_inputs[city],
+                "weather": weather_data.get(city),
+            }
+            for city in hotels_index.cities
+        }
+        save_manifest(output_path, {"archive": archive, "options": options, "cities": cities_manifest})
+
+    # The run is complete, nothing to resume
+    from src.api_utils.geocoding_runner import CHECKPOINT_NAME
+
+    checkpoint_path = Path(output_path) / CHECKPOINT_NAME
+    if checkpoint_path.exists():
+        checkpoint_path.unlink()
+
+    logging.info(f"Run summary:\n{report.summary()}")
+    if run_report is not None:
+        report.save(run_report)
+
 
 if __name__ == "__main__":
     main()